@@ -0,0 +1,1858 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server 性能基准测试
+
+用法:
+    python benchmark.py codec [--max-size 10485760]
+    python benchmark.py http [--requests 100] [--concurrency 10] [--latency 0.005]
+    python benchmark.py concurrency [--calls 20] [--latency 0.5]
+    python benchmark.py backends --jar plantuml.jar [--server URL] [--renders 20]
+    python benchmark.py pool --jar plantuml.jar [--renders 200] [--workers 1 2 4 8]
+    python benchmark.py memory [--payload-mb 128] [--limit-mb 16]
+    python benchmark.py startup [--runs 10] [--server uml_mcp_server.py]
+    python benchmark.py logging [--calls 2000] [--source-kb 100]
+    python benchmark.py coalesce [--calls 20] [--latency 0.2]
+    python benchmark.py resilience
+    python benchmark.py balance [--endpoints 1 2 4] [--renders 400] [--capacity 2] [--balance least-outstanding]
+    python benchmark.py post [--max-url 8192] [--renders 10]
+    python benchmark.py sessions [--edits 40] [--latency 0.05]
+    python benchmark.py lint [--iterations 2000]
+    python benchmark.py markdown [--size-mb 1 8 32] [--diagrams 48]
+    python benchmark.py docs [--files 500] [--diagrams 3] [--latency 0.05] [--jobs 8]
+    python benchmark.py mermaid [--lines 10000]
+    python benchmark.py gallery [--files 400] [--diagrams 3] [--latency 0.02] [--jobs 8]
+    python benchmark.py watch [--latency 0.05] [--debounce 150]
+    python benchmark.py suite [--output bench.json] [--compare baseline.json] [--error-rate 0.02]
+"""
+
+import argparse
+import asyncio
+import atexit
+import base64
+import collections
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import re
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import plantuml_client
+from plantuml_codec import plantuml_encode
+from render_backends import HttpBackend, LocalPoolBackend, LocalServerBackend
+from resilience import CircuitOpenError, RetryPolicy
+from markdown_diagrams import iter_diagram_blocks
+from mermaid_compiler import clear_cache, compile_mermaid
+from logging_setup import SourcePreview, create_handlers, start_queued_logging
+from startup_profile import import_times, measure_startup
+from uml_lint import lint
+
+# 编码器基准测试的输入大小：1KB 到 10MB
+CODEC_SIZES = [1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+
+# GET/POST 渲染基准测试的源码大小：1KB 到 1MB
+POST_SIZES = [1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024]
+
+
+def legacy_plantuml_encode(text):
+    """
+    旧版逐字符编码实现（zlib头 + if/elif 映射 + 字符串拼接），原样保留仅用于对比
+    """
+    compressed = zlib.compress(text.encode('utf-8'))
+    standard_b64 = base64.b64encode(compressed).decode('ascii')
+    result = ""
+    for c in standard_b64:
+        if c == 'A': result += '0'
+        elif c == 'B': result += '1'
+        elif c == 'C': result += '2'
+        elif c == 'D': result += '3'
+        elif c == 'E': result += '4'
+        elif c == 'F': result += '5'
+        elif c == 'G': result += '6'
+        elif c == 'H': result += '7'
+        elif c == 'I': result += '8'
+        elif c == 'J': result += '9'
+        elif c == 'K': result += 'A'
+        elif c == 'L': result += 'B'
+        elif c == 'M': result += 'C'
+        elif c == 'N': result += 'D'
+        elif c == 'O': result += 'E'
+        elif c == 'P': result += 'F'
+        elif c == 'Q': result += 'G'
+        elif c == 'R': result += 'H'
+        elif c == 'S': result += 'I'
+        elif c == 'T': result += 'J'
+        elif c == 'U': result += 'K'
+        elif c == 'V': result += 'L'
+        elif c == 'W': result += 'M'
+        elif c == 'X': result += 'N'
+        elif c == 'Y': result += 'O'
+        elif c == 'Z': result += 'P'
+        elif c == 'a': result += 'Q'
+        elif c == 'b': result += 'R'
+        elif c == 'c': result += 'S'
+        elif c == 'd': result += 'T'
+        elif c == 'e': result += 'U'
+        elif c == 'f': result += 'V'
+        elif c == 'g': result += 'W'
+        elif c == 'h': result += 'X'
+        elif c == 'i': result += 'Y'
+        elif c == 'j': result += 'Z'
+        elif c == 'k': result += 'a'
+        elif c == 'l': result += 'b'
+        elif c == 'm': result += 'c'
+        elif c == 'n': result += 'd'
+        elif c == 'o': result += 'e'
+        elif c == 'p': result += 'f'
+        elif c == 'q': result += 'g'
+        elif c == 'r': result += 'h'
+        elif c == 's': result += 'i'
+        elif c == 't': result += 'j'
+        elif c == 'u': result += 'k'
+        elif c == 'v': result += 'l'
+        elif c == 'w': result += 'm'
+        elif c == 'x': result += 'n'
+        elif c == 'y': result += 'o'
+        elif c == 'z': result += 'p'
+        elif c == '0': result += 'q'
+        elif c == '1': result += 'r'
+        elif c == '2': result += 's'
+        elif c == '3': result += 't'
+        elif c == '4': result += 'u'
+        elif c == '5': result += 'v'
+        elif c == '6': result += 'w'
+        elif c == '7': result += 'x'
+        elif c == '8': result += 'y'
+        elif c == '9': result += 'z'
+        elif c == '+': result += '-'
+        elif c == '/': result += '_'
+        elif c == '=': pass  # 忽略填充字符
+        else: result += c
+    
+    return result
+
+
+def synthetic_class_diagram(size, seed=0):
+    """
+    生成大约 size 字节的合成类图源码
+    """
+    rng = random.Random(seed)
+    parts = ["@startuml\n"]
+    total = len(parts[0])
+    index = 0
+    while total < size:
+        block = (
+            f"class Class{index} {{\n"
+            f"  -String field{rng.randint(0, 10 ** 6)}\n"
+            f"  -int count{rng.randint(0, 10 ** 6)}\n"
+            f"  +method{rng.randint(0, 10 ** 6)}(arg: Type{rng.randint(0, 999)})\n"
+            f"}}\n"
+            f"Class{index} --> Class{rng.randint(0, index + 1)}\n"
+        )
+        parts.append(block)
+        total += len(block)
+        index += 1
+    parts.append("@enduml\n")
+    return "".join(parts)
+
+
+def random_text(rng, length):
+    """
+    生成包含多字节字符的随机文本，用于往返校验
+    """
+    alphabet = "abcxyzABC019 {}->:\n\t\"'类图序列é€😀"
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def _best_of(func, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_codec(args):
+    """
+    对比新旧编码器在 1KB 到 max_size 输入上的耗时（往返校验见 tests/test_plantuml_codec.py）
+    """
+    print(f"{'size':>10} {'legacy (ms)':>12} {'table (ms)':>12} {'speedup':>8}")
+    for size in CODEC_SIZES:
+        if size > args.max_size:
+            break
+        text = synthetic_class_diagram(size)
+        repeat = 5 if size <= 1024 * 1024 else 1
+        legacy = _best_of(legacy_plantuml_encode, text, repeat)
+        table = _best_of(plantuml_encode, text, repeat)
+        print(f"{size:>10} {legacy * 1000:>12.2f} {table * 1000:>12.2f} {legacy / table:>7.1f}x")
+
+
+# 服务桩返回的各格式文件头
+STUB_SIGNATURES = {
+    "png": b"\x89PNG\r\n\x1a\n",
+    "svg": b"<svg xmlns=\"http://www.w3.org/2000/svg\">",
+    "txt": b"+--+\n",
+    "eps": b"%!PS-Adobe-3.0 EPSF-3.0\n",
+}
+
+
+class StubRendererHandler(BaseHTTPRequestHandler):
+    """
+    本地PlantUML渲染服务桩：按配置延迟后返回固定大小的负载，Content-Type 与请求的格式一致
+
+    可以通过 StubRenderer.inject() 为接下来的请求注入故障：返回指定状态码、额外延迟或直接断开连接。
+    请求行超过 max_url 个字符的GET请求返回414；POST {server}/{fmt} 的请求体视为PlantUML源码。
+    error_rate 大于0时，每个请求以该概率返回500（随机数种子固定，结果可复现）。
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        if self.server.max_url and len(self.requestline) > self.server.max_url:
+            with self.server.lock:
+                self.server.rejected += 1
+            self.send_error(414)
+            return
+        self._render()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        source = self.rfile.read(length)
+        with self.server.lock:
+            self.server.posts += 1
+            self.server.post_bytes += len(source)
+        self._render()
+
+    def _render(self):
+        with self.server.lock:
+            self.server.requests += 1
+            fault = self.server.faults.popleft() if self.server.faults else None
+        if self.server.latency:
+            # capacity 限制同时渲染的请求数，模拟单个渲染服务的处理能力
+            with self.server.slots:
+                time.sleep(self.server.latency)
+        status = self.server.status
+        if self.server.error_rate:
+            with self.server.lock:
+                if self.server.rng.random() < self.server.error_rate:
+                    status = 500
+        if fault is not None:
+            kind, value = fault
+            if kind == "delay":
+                time.sleep(value)
+            elif kind == "status":
+                status = value
+            elif kind == "drop":
+                # 不返回任何响应直接断开连接
+                self.close_connection = True
+                return
+        if status != 200:
+            self.send_error(status)
+            return
+        fmt = self.path.rstrip("/").split("/")[-2] if self.path.count("/") >= 2 else "png"
+        if fmt not in STUB_SIGNATURES:
+            fmt = "png"
+        signature = STUB_SIGNATURES[fmt]
+        size = max(self.server.payload_size, len(signature))
+        self.send_response(200)
+        self.send_header("Content-Type", plantuml_client.FORMAT_CONTENT_TYPES[fmt][0])
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        # 按块复用同一个缓冲区写出负载，服务桩本身不随负载大小占用内存
+        try:
+            self.wfile.write(signature)
+            remaining = size - len(signature)
+            chunk = memoryview(self.server.chunk)
+            while remaining > 0:
+                n = min(remaining, len(chunk))
+                self.wfile.write(chunk[:n])
+                remaining -= n
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前放弃了响应（例如大小超过上限）
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubRenderer(ThreadingHTTPServer):
+    """
+    在后台线程中运行的本地渲染服务桩
+
+    用法:
+        with StubRenderer(latency=0.01) as stub:
+            url = stub.url + "/png/..."
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, payload_size=4096, capacity=0, max_url=0, error_rate=0.0, seed=0):
+        super().__init__(("127.0.0.1", 0), StubRendererHandler)
+        self.max_url = max_url
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.latency = latency
+        self.slots = threading.BoundedSemaphore(capacity) if capacity > 0 else contextlib.nullcontext()
+        self.payload_size = payload_size
+        self.status = 200
+        self.faults = collections.deque()
+        self.chunk = b"\0" * 64 * 1024
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.rejected = 0
+        self.posts = 0
+        self.post_bytes = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/plantuml"
+
+    def inject(self, kind, value=None, count=1):
+        """
+        为接下来的 count 个请求注入故障
+
+        Args:
+            kind: status（返回 value 状态码）、delay（额外延迟 value 秒）或 drop（断开连接）
+        """
+        with self.lock:
+            self.faults.extend([(kind, value)] * count)
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = 0
+            self.rejected = 0
+            self.posts = 0
+            self.post_bytes = 0
+            self.faults.clear()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _run_requests(fetch, urls, concurrency):
+    def timed(url):
+        start = time.perf_counter()
+        fetch(url)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        latencies = [timed(url) for url in urls]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, urls))
+    return latencies, time.perf_counter() - start
+
+
+def bench_http(args):
+    """
+    对比每次新建连接的 requests.get 与共享连接池的单次渲染延迟
+    """
+    import requests
+
+    def unpooled(url):
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        return response.content
+
+    def pooled(url):
+        return plantuml_client.fetch_image(url)[0]
+
+    with StubRenderer(latency=args.latency) as stub:
+        urls = [f"{stub.url}/png/{plantuml_encode(f'A -> B: {i}')}" for i in range(args.requests)]
+        print(f"{'client':>10} {'conc':>5} {'mean (ms)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'total (s)':>10} {'conns':>6}")
+        for concurrency in (1, args.concurrency):
+            for name, fetch in (("requests", unpooled), ("pooled", pooled)):
+                plantuml_client.close_clients()
+                fetch(urls[0])
+                stub.reset_counters()
+                latencies, total = _run_requests(fetch, urls, concurrency)
+                print(f"{name:>10} {concurrency:>5} {statistics.mean(latencies) * 1000:>10.2f} "
+                      f"{_percentile(latencies, 50) * 1000:>9.2f} {_percentile(latencies, 95) * 1000:>9.2f} "
+                      f"{total:>10.3f} {stub.connections:>6}")
+    plantuml_client.close_clients()
+
+
+def _load_server(renderer_url):
+    """
+    指向本地渲染服务桩并禁用磁盘缓存后导入MCP服务器模块
+    """
+    os.environ["PLANTUML_SERVER"] = renderer_url
+    os.environ["UML_CACHE_DIR"] = ""
+    import uml_mcp_server
+    return uml_mcp_server
+
+
+def bench_concurrency(args):
+    """
+    并发调用N个MCP工具，校验总耗时接近最慢的单次渲染而不是所有渲染之和
+    """
+    import tempfile
+
+    with StubRenderer(latency=args.latency) as stub, tempfile.TemporaryDirectory() as output_dir:
+        server = _load_server(stub.url)
+
+        async def call(i):
+            start = time.perf_counter()
+            await server.mcp.call_tool("generate_class_diagram", {
+                "code": f"class Concurrent{i}",
+                "output_dir": output_dir,
+            })
+            return time.perf_counter() - start
+
+        async def run():
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(call(i) for i in range(args.calls)))
+            total = time.perf_counter() - start
+            await plantuml_client.aclose_clients()
+            return latencies, total
+
+        latencies, total = asyncio.run(run())
+
+    slowest = max(latencies)
+    print(f"并发调用数: {args.calls}")
+    print(f"最慢单次渲染: {slowest * 1000:.1f} ms")
+    print(f"各次渲染耗时之和: {sum(latencies) * 1000:.1f} ms")
+    print(f"总耗时: {total * 1000:.1f} ms")
+    if stub.requests != args.calls:
+        raise AssertionError(f"渲染服务桩收到 {stub.requests} 个请求，预期 {args.calls} 个")
+    if total > slowest * 1.5:
+        raise AssertionError("总耗时明显超过最慢的单次渲染，工具调用没有并发执行")
+    print("并发校验通过")
+
+
+def _print_latencies(label, latencies):
+    print(f"{label:>24} {len(latencies):>6} {statistics.mean(latencies) * 1000:>10.1f} "
+          f"{_percentile(latencies, 50) * 1000:>9.1f} {_percentile(latencies, 95) * 1000:>9.1f}")
+
+
+def _timed_renders(backend, diagrams):
+    latencies = []
+    for diagram in diagrams:
+        start = time.perf_counter()
+        backend.render(plantuml_encode(diagram), "png")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_backends(args):
+    """
+    对比每次启动JVM、常驻JVM（本地picoweb）和HTTP后端的渲染延迟
+    """
+    diagrams = [f"@startuml\nclass Bench{i}\nBench{i} --> Other{i}\n@enduml" for i in range(args.renders)]
+    print(f"{'backend':>24} {'n':>6} {'mean (ms)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+
+    if os.path.isfile(args.jar):
+        cold = []
+        for diagram in diagrams[:args.cold_renders]:
+            start = time.perf_counter()
+            subprocess.run([args.java, "-Djava.awt.headless=true", "-jar", args.jar, "-tpng", "-pipe"],
+                           input=diagram.encode("utf-8"), stdout=subprocess.DEVNULL, check=True)
+            cold.append(time.perf_counter() - start)
+        _print_latencies("local cold (jar -pipe)", cold)
+
+        backend = LocalServerBackend(args.jar, java=args.java)
+        try:
+            start = time.perf_counter()
+            backend.render(plantuml_encode("@startuml\nA -> B\n@enduml"), "png")
+            _print_latencies("local first (startup)", [time.perf_counter() - start])
+            _print_latencies("local warm (picoweb)", _timed_renders(backend, diagrams))
+        finally:
+            backend.close()
+    else:
+        print(f"未找到plantuml.jar（{args.jar}），跳过本地后端")
+
+    _print_latencies("http", _timed_renders(HttpBackend(args.server), diagrams))
+    plantuml_client.close_clients()
+
+
+def bench_pool(args):
+    """
+    统计本地渲染进程池在不同进程数下每秒渲染的图表数
+    """
+    if not os.path.isfile(args.jar):
+        print(f"未找到plantuml.jar（{args.jar}）")
+        return
+    encoded = [plantuml_encode(synthetic_class_diagram(args.size, seed=i)) for i in range(args.renders)]
+    print(f"{'workers':>8} {'renders':>8} {'total (s)':>10} {'diagrams/s':>11}")
+    for workers in args.workers:
+        pool = LocalPoolBackend(args.jar, workers=workers, java=args.java, health_interval=0)
+        try:
+            pool.start()
+            pool.render(encoded[0], "png")
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers * 2) as executor:
+                list(executor.map(pool.render, encoded))
+            total = time.perf_counter() - start
+        finally:
+            pool.close()
+        print(f"{workers:>8} {args.renders:>8} {total:>10.2f} {args.renders / total:>11.1f}")
+    plantuml_client.close_clients()
+
+
+def bench_memory(args):
+    """
+    渲染超大图像时校验Python堆内存峰值有上限，与图像大小无关
+    """
+    import tempfile
+
+    payload = args.payload_mb * 1024 * 1024
+    limit = args.limit_mb * 1024 * 1024
+    with StubRenderer(payload_size=payload) as stub, tempfile.TemporaryDirectory() as output_dir:
+        server = _load_server(stub.url)
+
+        def sync_render(i):
+            return server.generate_uml_image(f"@startuml\nclass Huge{i}\n@enduml", "class", output_dir)
+
+        async def async_render(i):
+            result = await server.generate_uml_image_async(f"@startuml\nclass Huge{i}\n@enduml", "class", output_dir)
+            await plantuml_client.aclose_clients()
+            return result
+
+        sync_render(-1)
+        print(f"{'mode':>6} {'payload (MB)':>13} {'written (MB)':>13} {'peak heap (MB)':>15}")
+        for mode, run in (("sync", sync_render), ("async", lambda i: asyncio.run(async_render(i)))):
+            tracemalloc.start()
+            result = run(0 if mode == "sync" else 1)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if result.get("error"):
+                raise AssertionError(f"渲染失败: {result['error']}")
+            written = os.path.getsize(result["local_path"])
+            print(f"{mode:>6} {args.payload_mb:>13} {written / 1024 / 1024:>13.1f} {peak / 1024 / 1024:>15.2f}")
+            if written != payload:
+                raise AssertionError(f"写入 {written} 字节，预期 {payload} 字节")
+            if peak > limit:
+                raise AssertionError(f"内存峰值 {peak} 字节超过上限 {limit} 字节")
+    plantuml_client.close_clients()
+    print("内存上限校验通过")
+
+
+# 服务器启动时不应导入的模块，只有第一次渲染才需要
+LAZY_MODULES = ("render_backends", "plantuml_client")
+
+
+def bench_startup(args):
+    """
+    测量冷启动的服务器进程从启动到响应 initialize 和 tools/list 的时间
+    """
+    server_path = os.path.abspath(args.server)
+    loaded = {name for name, _, _, _ in import_times(server_path)}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        raise AssertionError(f"启动时导入了应延迟加载的模块: {', '.join(eager)}")
+
+    measure_startup(server_path)  # 预热，生成字节码缓存
+    initialize, tools_list = [], []
+    for _ in range(args.runs):
+        startup = measure_startup(server_path)
+        initialize.append(startup["initialize_ms"] / 1000)
+        tools_list.append(startup["tools_list_ms"] / 1000)
+
+    print(f"{'phase':>24} {'runs':>6} {'mean (ms)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    _print_latencies("initialize", initialize)
+    _print_latencies("tools/list", tools_list)
+    print("延迟加载校验通过")
+
+
+def bench_coalesce(args):
+    """
+    校验N个并发的相同渲染只调用一次渲染后端，且错误会传递给每一个等待者
+    """
+    import tempfile
+
+    # 错误用例统计后端请求数，关闭重试以免一次渲染产生多次请求
+    os.environ["UML_RETRY_ATTEMPTS"] = "1"
+    with StubRenderer(latency=args.latency) as stub, tempfile.TemporaryDirectory() as output_dir:
+        server = _load_server(stub.url)
+        code = "@startuml\nclass Coalesced\n@enduml"
+
+        async def run(code):
+            calls = [server.generate_uml_image_async(code, "class", output_dir) for _ in range(args.calls)]
+            # 另外几个相同的调用从线程池中走同步路径
+            threads = [asyncio.to_thread(server.generate_uml_image, code, "class", output_dir) for _ in range(4)]
+            results = await asyncio.gather(*calls, *threads)
+            await plantuml_client.aclose_clients()
+            return results
+
+        print(f"{'case':>8} {'calls':>6} {'backend requests':>17} {'coalesced':>10} {'errors':>7}")
+        for case, status in (("success", 200), ("error", 500)):
+            stub.status = status
+            stub.reset_counters()
+            server.render_cache.clear()
+            results = asyncio.run(run(f"{code}\n' {case}"))
+            coalesced = sum(1 for r in results if r["artifacts"][0]["coalesced"])
+            errors = sum(1 for r in results if r.get("error"))
+            print(f"{case:>8} {len(results):>6} {stub.requests:>17} {coalesced:>10} {errors:>7}")
+            if stub.requests != 1:
+                raise AssertionError(f"{len(results)} 个相同的并发调用产生了 {stub.requests} 次后端渲染，预期 1 次")
+            if status == 200 and coalesced != len(results) - 1:
+                raise AssertionError(f"合并了 {coalesced} 个调用，预期 {len(results) - 1} 个")
+            if status == 200 and errors:
+                raise AssertionError(f"{errors} 个调用失败: {results[0].get('error')}")
+            if status != 200 and errors != len(results):
+                raise AssertionError(f"只有 {errors} 个调用收到错误，预期全部 {len(results)} 个")
+            paths = {r["local_path"] for r in results}
+            if status == 200 and (len(paths) != 1 or not os.path.exists(paths.pop())):
+                raise AssertionError("合并的调用没有得到同一个输出文件")
+    plantuml_client.close_clients()
+    print("请求合并校验通过")
+
+
+def _edited_versions(edits, seed=0):
+    """
+    模拟智能体逐步修改类图：大约一半的修改只改动空白或注释
+
+    Returns:
+        list: (源码, 是否有语义变化)
+    """
+    rng = random.Random(seed)
+    classes = ["class User {\n  +name: String\n}"]
+    versions = []
+    for step in range(edits):
+        cosmetic = step > 0 and rng.random() < 0.5
+        if not cosmetic:
+            index = len(classes)
+            classes.append(f"class Model{index} {{\n  +field{index}: int\n}}\nModel{index} --> User : uses")
+        body = "\n".join(classes)
+        if cosmetic:
+            # 只调整缩进、空行和注释
+            body = f"' 第 {step} 次修改\n" + body.replace("\n  +", "\n\t+") + "\n\n/' 草稿 '/"
+        versions.append((f"@startuml\n{body}\n@enduml", not cosmetic))
+    return versions
+
+
+def bench_sessions(args):
+    """
+    同一个图表的连续修改：只改动空白或注释时跳过渲染，其余修改返回结构差异
+    """
+    import tempfile
+
+    with StubRenderer(latency=args.latency) as stub, tempfile.TemporaryDirectory() as output_dir:
+        server = _load_server(stub.url)
+        versions = _edited_versions(args.edits)
+
+        async def run():
+            results = []
+            for code, _ in versions:
+                start = time.perf_counter()
+                text = await server.generate_class_diagram(code, output_dir, name="model")
+                results.append((json.loads(text), time.perf_counter() - start))
+            await plantuml_client.aclose_clients()
+            return results
+
+        results = asyncio.run(run())
+        requests = stub.requests
+
+    semantic = sum(1 for _, changed in versions if changed)
+    skipped = [elapsed for result, elapsed in results if result["session"]["unchanged"]]
+    rendered = [elapsed for result, elapsed in results if not result["session"]["unchanged"]]
+    print(f"{len(versions)} 次修改，其中 {semantic} 次有语义变化；渲染服务收到 {requests} 次请求")
+    print(f"{'path':>10} {'calls':>6} {'mean (ms)':>10}")
+    for label, samples in (("rendered", rendered), ("unchanged", skipped)):
+        if samples:
+            print(f"{label:>10} {len(samples):>6} {statistics.mean(samples) * 1000:>10.2f}")
+    last_diff = next(result["session"]["diff"] for result, _ in reversed(results) if not result["session"]["unchanged"])
+    print(f"最后一次语义修改的结构差异: {json.dumps(last_diff, ensure_ascii=False)}")
+
+    if requests != semantic:
+        raise AssertionError(f"渲染了 {requests} 次，预期只渲染 {semantic} 次有语义变化的版本")
+
+
+def bench_lint(args):
+    """
+    语法预检查的耗时：单次检查远小于1毫秒（误报和漏报见 tests/test_uml_lint.py）
+    """
+    from tests.test_uml_lint import LINT_VALID
+
+    print(f"{'diagram':>10} {'lines':>6} {'lint (us)':>10}")
+    samples = list(LINT_VALID.items()) + [("class", synthetic_class_diagram(size)) for size in (4 * 1024, 16 * 1024)]
+    for diagram_type, code in samples:
+        elapsed = _best_of(lambda text: [lint(text, diagram_type) for _ in range(args.iterations)], code, 3)
+        per_call = elapsed / args.iterations
+        lines = code.count("\n") + 1
+        print(f"{diagram_type:>10} {lines:>6} {per_call * 1e6:>10.1f}")
+        if lines <= 100 and per_call > 0.001:
+            raise AssertionError(f"{lines} 行的图表检查耗时 {per_call * 1000:.2f} ms，超过1毫秒")
+
+
+def legacy_extract_all(markdown_file):
+    """
+    旧版提取方式（整体读入 + DOTALL 非贪婪正则）改为返回所有匹配，仅用于对比
+    """
+    with open(markdown_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return [match.group(0)[10:-3].strip() for match in re.finditer(r'```mermaid\n.*?```', content, re.DOTALL)]
+
+
+def synthetic_markdown(size, diagrams, seed=0):
+    """
+    生成约 size 字节的Markdown：正文段落、python代码块、均匀分布的 diagrams 个mermaid图，
+    以及一个在 ````markdown 中作为示例出现、不应被提取的mermaid块
+
+    Returns:
+        tuple: (Markdown文本, 每个图的 (开始行号, 结束行号))
+    """
+    rng = random.Random(seed)
+    kinds = ("sequenceDiagram\n    A->>B: request\n    B-->>A: response",
+             "classDiagram\n    class Order\n    Order --> Customer",
+             "flowchart LR\n    start --> finish")
+    lines = ["# Architecture", "", "````markdown", "```mermaid", "graph TD", "```", "````", ""]
+    ranges = []
+    per_section = max(1, size // (diagrams + 1))
+    for i in range(diagrams + 1):
+        written = 0
+        while written < per_section:
+            if rng.random() < 0.1:
+                block = ["```python", f"value = {rng.randrange(10 ** 6)}", "```", ""]
+            else:
+                block = [random_text(rng, 70).replace("\n", " ") for _ in range(4)] + [""]
+            lines.extend(block)
+            written += sum(len(line) + 1 for line in block)
+        if i < diagrams:
+            body = (kinds[i % len(kinds)] + f"\n    %% diagram {i}").split("\n")
+            start = len(lines) + 1
+            lines.extend(["```mermaid"] + body + ["```", ""])
+            ranges.append((start, start + len(body) + 1))
+    return "\n".join(lines) + "\n", ranges
+
+
+def bench_markdown(args):
+    """
+    Markdown图表提取：流式扫描找出所有图表且行号正确，对比旧版整体读入 + 正则的耗时和内存
+    """
+    import tempfile
+
+    print(f"{'size (MB)':>9} {'blocks':>7} {'legacy (ms)':>12} {'legacy heap':>12} "
+          f"{'scan (ms)':>10} {'scan heap':>10} {'scan MB/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.size_mb:
+            text, ranges = synthetic_markdown(int(size_mb * 1024 * 1024), args.diagrams)
+            path = os.path.join(tmp, f"doc_{size_mb}.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            size = os.path.getsize(path)
+
+            blocks = list(iter_diagram_blocks(path))
+            found = [(block.start_line, block.end_line) for block in blocks]
+            if found != ranges:
+                raise AssertionError(f"提取到 {len(found)} 个图表，预期 {len(ranges)} 个，或行号不符")
+            legacy = legacy_extract_all(path)
+            if len(legacy) == len(ranges):
+                raise AssertionError("旧版正则应当把 ````markdown 中的示例误当作图表")
+
+            measured = []
+            for extract in (legacy_extract_all, lambda p: list(iter_diagram_blocks(p))):
+                elapsed = _best_of(extract, path, 3)
+                tracemalloc.start()
+                extract(path)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                measured.append((elapsed, peak))
+            (legacy_time, legacy_peak), (scan_time, scan_peak) = measured
+            print(f"{size_mb:>9} {len(blocks):>7} {legacy_time * 1000:>12.1f} {legacy_peak / 2 ** 20:>10.1f}MB "
+                  f"{scan_time * 1000:>10.1f} {scan_peak / 2 ** 20:>8.1f}MB {size / 2 ** 20 / scan_time:>10.0f}")
+            if size >= 4 * 1024 * 1024 and scan_peak > size / 4:
+                raise AssertionError(f"流式扫描的内存峰值 {scan_peak} 字节，文件只有 {size} 字节")
+
+    unclosed = "```mermaid\nsequenceDiagram\nA->>B: hi\n\n" + "text\n" * 1000 + "```mermaid\nclassDiagram\n```\n"
+    with tempfile.NamedTemporaryFile("w", suffix=".md", delete=False, encoding="utf-8") as f:
+        f.write(unclosed)
+    try:
+        kinds = [block.kind for block in iter_diagram_blocks(f.name)]
+    finally:
+        os.unlink(f.name)
+    # 第一个块在第二个围栏处结束，内容是 sequenceDiagram 和正文；第二个围栏之后的 classDiagram 不是图表
+    if kinds != ["sequenceDiagram"]:
+        raise AssertionError(f"未结束围栏的处理不符合CommonMark: {kinds}")
+    print("Markdown图表提取校验通过")
+
+
+def _write_docs_tree(root, files, diagrams):
+    """
+    生成 files 个Markdown文件，分布在若干子目录中，每个文件包含 diagrams 个互不相同的mermaid图
+    """
+    for i in range(files):
+        path = os.path.join(root, f"section{i % 10}", f"page{i}.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        parts = [f"# Page {i}", ""]
+        for j in range(diagrams):
+            parts += ["Some prose before the diagram.", "", "```mermaid", "sequenceDiagram",
+                      f"    Client{i}->>Service{j}: request {i}.{j}", f"    Service{j}-->>Client{i}: response",
+                      "```", ""]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(parts))
+
+
+def bench_docs(args):
+    """
+    文档目录的增量构建：首次全部渲染，之后只渲染内容变化的图，并删除不再引用的图；
+    每个图渲染原图和缩略图两个图像
+    """
+    import tempfile
+
+    with StubRenderer(latency=args.latency, payload_size=1024) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["PLANTUML_SERVER"] = stub.url
+        import generate_diagram
+
+        docs, output = os.path.join(tmp, "docs"), os.path.join(tmp, "output")
+        _write_docs_tree(docs, args.files, args.diagrams)
+        total = args.files * args.diagrams
+
+        def build(label, renders, pruned):
+            stub.reset_counters()
+            with contextlib.redirect_stdout(None):
+                began = time.perf_counter()
+                stats = generate_diagram.build_tree(docs, output, jobs=args.jobs)
+                elapsed = time.perf_counter() - began
+            print(f"{label:>22} {elapsed:>9.2f} {stats['scanned']:>8} {stats['rendered']:>9} "
+                  f"{stub.requests:>9} {stats['pruned']:>7}")
+            if stats["failed"] or stats["rendered"] != renders or stub.requests != renders or stats["pruned"] != pruned:
+                raise AssertionError(f"{label}: 预期渲染 {renders} 个、删除 {pruned} 个，实际 {stats}，请求 {stub.requests} 次")
+            return elapsed
+
+        print(f"{'build':>22} {'time (s)':>9} {'scanned':>8} {'rendered':>9} {'requests':>9} {'pruned':>7}")
+        full = build("full", total * 2, 0)
+        build("no change", 0, 0)
+
+        edited = os.path.join(docs, "section3", "page3.md")
+        with open(edited, encoding="utf-8") as f:
+            text = f.read()
+        with open(edited, "w", encoding="utf-8") as f:
+            f.write(text.replace("request 3.0", "request 3.0 (edited)", 1))
+        incremental = build("one-line edit", 2, 2)
+
+        os.remove(os.path.join(docs, "section4", "page4.md"))
+        build("file removed", 0, args.diagrams * 2)
+
+        images = sum(name.endswith(".png") for _, _, files in os.walk(output) for name in files)
+        if images != (total - args.diagrams) * 2:
+            raise AssertionError(f"输出目录中有 {images} 个图像，预期 {(total - args.diagrams) * 2} 个")
+    print(f"一行修改后的重新构建耗时 {incremental:.2f} 秒，是完整构建（{full:.2f} 秒）的 {incremental / full:.1%}")
+
+
+def bench_gallery(args):
+    """
+    画廊页面：上千个图表的页面大小和生成耗时、渲染过程中的增量写入、不依赖CDN、
+    图像延迟加载、内容不变时不重写，以及小SVG内联时 id 不冲突
+    """
+    import tempfile
+    import diagram_gallery
+
+    with StubRenderer(latency=args.latency, payload_size=1024) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["PLANTUML_SERVER"] = stub.url
+        import generate_diagram
+
+        docs, output = os.path.join(tmp, "docs"), os.path.join(tmp, "output")
+        _write_docs_tree(docs, args.files, args.diagrams)
+        total = args.files * args.diagrams
+        page = os.path.join(output, "index.html")
+
+        # 构建过程中读取页面，记录已渲染的图表数
+        progress = set()
+        done = threading.Event()
+
+        def sample():
+            while not done.is_set():
+                try:
+                    with open(page, encoding="utf-8") as f:
+                        found = re.search(r"<p>(\d+) / (\d+) diagramme", f.read())
+                except FileNotFoundError:
+                    found = None
+                if found:
+                    progress.add(int(found.group(1)))
+                time.sleep(0.02)
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        try:
+            with contextlib.redirect_stdout(None):
+                began = time.perf_counter()
+                generate_diagram.build_tree(docs, output, jobs=args.jobs)
+                build = time.perf_counter() - began
+        finally:
+            done.set()
+            sampler.join()
+
+        with open(page, encoding="utf-8") as f:
+            content = f.read()
+        figures = content.count("<figure ")
+        images = re.findall(r"<img [^>]*>", content)
+        if figures != total or f"<p>{total} / {total} diagramme" not in content:
+            raise AssertionError(f"页面中有 {figures} 个图表，预期 {total} 个且全部渲染完成")
+        if "<script" in content or "http://" in content or "https://" in content:
+            raise AssertionError("页面引用了外部资源或脚本")
+        if len(images) != total * 2 or any('loading="lazy"' not in image for image in images):
+            raise AssertionError("每个图表应有一个缩略图和一个原尺寸图像，且都延迟加载")
+        if not any(0 < count < total for count in progress):
+            raise AssertionError(f"构建过程中没有看到部分完成的页面: {sorted(progress)}")
+
+        gallery = diagram_gallery.Gallery(output)
+        manifest = generate_diagram.load_manifest(os.path.join(output, generate_diagram.MANIFEST_NAME))
+        for rel_path, entry in manifest["files"].items():
+            for block in entry["blocks"]:
+                gallery.add(f"{rel_path}:{block['start_line']}", rel_path, block["start_line"], block["kind"],
+                            block["output"], block["thumbnail"])
+        render = _best_of(lambda _: gallery.render(), None, 5)
+
+        mtime = os.stat(page).st_mtime_ns
+        with contextlib.redirect_stdout(None):
+            generate_diagram.build_tree(docs, output, jobs=args.jobs)
+        if os.stat(page).st_mtime_ns != mtime:
+            raise AssertionError("内容未变化时重写了画廊页面")
+
+        viewer = generate_diagram.create_html_viewer
+        with contextlib.redirect_stdout(None):
+            legacy = os.path.getsize(viewer(os.path.join(tmp, "legacy.png"), "sequenceDiagram\n    A->>B: hi", "legacy"))
+
+    print(f"{'diagrams':>9} {'build (s)':>10} {'page (KB)':>10} {'render (ms)':>12} {'partial pages':>14}")
+    print(f"{total:>9} {build:>10.2f} {len(content) / 1024:>10.1f} {render * 1000:>12.1f} "
+          f"{sum(0 < count < total for count in progress):>14}")
+    print(f"旧版每个图表一个页面（{legacy / 1024:.1f} KB，另加CDN上的mermaid.js），共 {total} 个页面")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        svg = '<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg"><defs><filter id="f1"/></defs>' \
+              '<rect filter="url(#f1)"/></svg>'
+        for name, content in (("a.svg", svg), ("b.svg", svg), ("large.svg", svg + " " * diagram_gallery.INLINE_SVG_LIMIT)):
+            with open(os.path.join(tmp, name), "w", encoding="utf-8") as f:
+                f.write(content)
+            with open(os.path.join(tmp, name[:-4] + ".png"), "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR" + struct.pack(">II", 640, 480))
+        gallery = diagram_gallery.Gallery(tmp)
+        for name in ("a", "b", "large"):
+            gallery.add(name, "doc.md", 1, "sequence", f"{name}.png", svg=f"{name}.svg")
+        content = gallery.render()
+        if content.count("<svg") != 2 or "<?xml" in content:
+            raise AssertionError("只有不超过 INLINE_SVG_LIMIT 的SVG应当内联，且去掉XML声明")
+        ids = re.findall(r'id="([^"]+)"', content)
+        if len(set(id_ for id_ in ids if id_.endswith("f1"))) != 2 or 'url(#d0-f1)' not in content:
+            raise AssertionError(f"内联SVG的 id 没有加上前缀: {ids}")
+        if 'width="640" height="480"' not in content:
+            raise AssertionError("较大SVG的缩略图应为带宽高的 <img>")
+
+
+def bench_watch(args):
+    """
+    --watch 模式：保存到新图像的延迟、连续保存的防抖、未修改的图不重新渲染、空闲时的CPU占用，
+    分别检查 inotify 和轮询两种监视器
+    """
+    import tempfile
+
+    with StubRenderer(latency=args.latency, payload_size=1024) as stub:
+        os.environ["PLANTUML_SERVER"] = stub.url
+        import generate_diagram
+
+        print(f"{'watcher':>8} {'edit (ms)':>10} {'burst renders':>15} {'idle cpu (ms/s)':>16}")
+        for polling in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                source, output = os.path.join(tmp, "design.md"), os.path.join(tmp, "output")
+                diagrams = [f"sequenceDiagram\n    A->>B: request {i}\n    B-->>A: response {i}\n" for i in range(3)]
+
+                def save(edit=None):
+                    if edit:
+                        diagrams[0] = diagrams[0].replace("request 0", f"request 0 ({edit})", 1)
+                    with open(source, "w", encoding="utf-8") as f:
+                        f.write("# Design\n\n" + "".join(f"```mermaid\n{text}```\n\n" for text in diagrams))
+
+                def wait_requests(count, timeout=5.0):
+                    deadline = time.monotonic() + timeout
+                    while stub.requests < count and time.monotonic() < deadline:
+                        time.sleep(0.002)
+                    return stub.requests >= count
+
+                def gallery_mtime():
+                    try:
+                        return os.stat(gallery).st_mtime_ns
+                    except FileNotFoundError:
+                        return None
+
+                def images_mtime(base_name):
+                    # 文件模式的图像名只精确到分钟，同一分钟内的修改会覆盖同名图像
+                    return max(os.stat(os.path.join(output, name)).st_mtime_ns for name in os.listdir(output)
+                               if name.endswith((f"_{base_name}.png", f"_{base_name}_thumb.png")))
+
+                save()
+                gallery = os.path.join(output, "diagram_gallery.html")
+                watch_args = argparse.Namespace(source=source, output=output, type="sequence", name="diagram",
+                                                all=True, jobs=None, manifest=None, poll=polling, svg=False,
+                                                viewer=False, debounce=args.debounce)
+                stop = threading.Event()
+                stub.reset_counters()
+                with contextlib.redirect_stdout(None):
+                    thread = threading.Thread(target=generate_diagram.watch_source, args=(watch_args, stop))
+                    thread.start()
+                    try:
+                        # 每个图渲染原图和缩略图
+                        if not wait_requests(6):
+                            raise AssertionError(f"首次渲染只发出了 {stub.requests} 个请求")
+                        time.sleep(0.3)
+                        written, rendered = gallery_mtime(), images_mtime("diagram_1")
+
+                        # 内容不变的保存：不渲染，也不重写画廊
+                        stub.reset_counters()
+                        save()
+                        time.sleep(args.debounce / 1000 + 1.2)
+                        if stub.requests or gallery_mtime() != written:
+                            raise AssertionError(f"内容未变化，却发出了 {stub.requests} 个请求或重写了画廊")
+
+                        # 一次保存：只重新渲染修改过的图，到原图和缩略图都写入为止计时
+                        stub.reset_counters()
+                        began = time.perf_counter()
+                        save("edit")
+                        deadline = time.monotonic() + 5.0
+                        while (stub.requests < 2 or images_mtime("diagram_1") == rendered) and time.monotonic() < deadline:
+                            time.sleep(0.002)
+                        edit = time.perf_counter() - began
+                        time.sleep(args.debounce / 1000 + 0.6)
+                        if stub.requests != 2:
+                            raise AssertionError(f"只修改了一个图，却发出了 {stub.requests} 个请求")
+
+                        # 连续保存：防抖后合并为一次渲染
+                        stub.reset_counters()
+                        for i in range(5):
+                            save(f"burst {i}")
+                            time.sleep(args.debounce / 1000 / 5)
+                        time.sleep(args.debounce / 1000 + 1.2)
+                        burst = stub.requests // 2
+                        if burst != 1:
+                            raise AssertionError(f"5次连续保存发出了 {stub.requests} 个请求，预期 2 个")
+
+                        # 空闲：不消耗CPU
+                        cpu = time.process_time()
+                        time.sleep(args.idle)
+                        idle = (time.process_time() - cpu) / args.idle
+                    finally:
+                        stop.set()
+                        thread.join()
+            name = "polling" if polling else "inotify"
+            print(f"{name:>8} {edit * 1000:>10.1f} {burst:>15} {idle * 1000:>16.2f}")
+            if edit >= 1.0:
+                raise AssertionError(f"{name}: 保存到新图像耗时 {edit:.2f} 秒，超过1秒")
+            if idle > 0.02:
+                raise AssertionError(f"{name}: 空闲时每秒消耗 {idle * 1000:.1f} ms CPU")
+
+
+# 旧版逐行子串判断的 Mermaid 转换实现（generate_diagram.py），原样保留仅用于对比
+def legacy_convert_sequence_diagram(mermaid_code):
+    """
+    Convertit un diagramme de séquence Mermaid en PlantUML
+    """
+    plantuml_code = "@startuml\ntitle Diagramme de séquence\n\n"
+    
+    lines = mermaid_code.strip().split('\n')
+    
+    for line in lines:
+        # Ignorer la ligne sequenceDiagram
+        if line.strip() == "sequenceDiagram":
+            continue
+        # Conserver autonumber
+        elif line.strip() == "autonumber":
+            plantuml_code += "autonumber\n"
+        # Traiter les définitions de participants
+        elif "participant" in line:
+            plantuml_code += line + "\n"
+        # Traiter les flèches de séquence
+        elif "->" in line or "->>" in line:
+            plantuml_code += line.replace("->>", "->") + "\n"
+        # Traiter les notes
+        elif "Note over" in line:
+            plantuml_code += line + "\n"
+        # Ajouter les autres lignes qui ne nécessitent pas de conversion
+        elif line.strip():
+            plantuml_code += line + "\n"
+    
+    plantuml_code += "@enduml"
+    return plantuml_code
+
+
+def legacy_convert_flowchart_diagram(mermaid_code):
+    """
+    Convertit un diagramme flowchart Mermaid en PlantUML
+    """
+    plantuml_code = "@startuml\n"
+    
+    # Transformation basique - à améliorer pour une meilleure conversion
+    plantuml_code += "title Diagramme de flux\n\n"
+    plantuml_code += "' Converti depuis Mermaid flowchart\n"
+    plantuml_code += "' Note: La conversion directe peut nécessiter des ajustements manuels\n\n"
+    
+    lines = mermaid_code.strip().split('\n')
+    for line in lines:
+        if "flowchart" in line or "graph" in line:
+            if "TB" in line:
+                plantuml_code += "top to bottom direction\n"
+            elif "LR" in line:
+                plantuml_code += "left to right direction\n"
+        elif "-->" in line:
+            plantuml_code += line.replace("-->", "->") + "\n"
+        elif "subgraph" in line:
+            package_name = line.split("subgraph")[1].strip()
+            plantuml_code += f"package {package_name} {{\n"
+        elif "end" == line.strip():
+            plantuml_code += "}\n"
+        elif line.strip():
+            plantuml_code += line + "\n"
+    
+    plantuml_code += "@enduml"
+    return plantuml_code
+
+
+def legacy_convert_class_diagram(mermaid_code):
+    """
+    Convertit un diagramme de classe Mermaid en PlantUML
+    """
+    plantuml_code = "@startuml\ntitle Diagramme de classe\n\n"
+    
+    lines = mermaid_code.strip().split('\n')
+    for line in lines:
+        if "classDiagram" in line:
+            continue
+        elif "class" in line and "{" in line:
+            plantuml_code += line.replace("{", " {") + "\n"
+        elif "-->" in line:
+            plantuml_code += line.replace("-->", "-->") + "\n"
+        elif line.strip():
+            plantuml_code += line + "\n"
+    
+    plantuml_code += "@enduml"
+    return plantuml_code
+
+
+LEGACY_CONVERTERS = {
+    "sequence": legacy_convert_sequence_diagram,
+    "flowchart": legacy_convert_flowchart_diagram,
+    "class": legacy_convert_class_diagram,
+}
+
+# (Mermaid代码, 输出中应包含的行, 诊断信息 (行号, 严重程度))
+MERMAID_CASES = [
+    ("sequenceDiagram\n  participant A as Alice\n  A->>+Bob: hi<br>there\n  Bob-->>-A: ok",
+     ['participant "Alice" as A', "A -> Bob ++ : hi\\nthere", "Bob --> A -- : ok"], []),
+    # 旧版把含有 "->" 的注释文本当作消息，把 participant 子串出现在消息中的行当作声明
+    ("sequenceDiagram\n  Note over A,B: a -> b\n  A->>B: new participant",
+     ["note over A, B : a -> b", "A -> B : new participant"], []),
+    ("sequenceDiagram\n  alt ok\n    A->>B: x\n  else\n    A-xB: y\n  end\n  else\n  loop forever",
+     ["alt ok", "else", "A ->x B : y", "end"], [(7, "error"), (8, "error")]),
+    ("flowchart LR\n  A[Start] -->|yes| B{Ok?}\n  B -- no --> C((Stop)) & D\n  subgraph s1 [Group]\n    D -.-> E\n  end",
+     ["left to right direction", 'rectangle "Start" as A', 'hexagon "Ok?" as B', 'usecase "Stop" as C',
+      'rectangle "Group" as s1 {', "A --> B : yes", "B --> C : no", "B --> D : no", "D ..> E"], []),
+    ("flowchart TD\n  A --> \n  classDef x fill:#f00\n  A ==> B",
+     ["A -[bold]-> B"], [(2, "error"), (3, "warning")]),
+    ("classDiagram\n  class Animal {\n    <<interface>>\n    +move(int distance) bool\n  }\n"
+     "  Animal <|-- Dog\n  Dog \"1\" *-- \"4\" Leg : has\n  Dog : +bark()$\n  Dog ?? Cat",
+     ["interface Animal {", "+move(int distance) : bool", "{static} +bark()", "Animal <|-- Dog",
+      'Dog "1" *-- "4" Leg : has'], [(9, "error")]),
+]
+
+
+def synthetic_mermaid(kind, lines, seed=0):
+    """
+    生成约 lines 行的Mermaid代码，包含各类图表的常见语句
+    """
+    rng = random.Random(seed)
+    out = {"sequence": ["sequenceDiagram", "  autonumber"], "flowchart": ["flowchart LR"],
+           "class": ["classDiagram"]}[kind]
+    i = 0
+    while len(out) < lines:
+        i += 1
+        if kind == "sequence":
+            a, b = f"P{rng.randrange(50)}", f"P{rng.randrange(50)}"
+            if i % 50 == 0:
+                out += [f"  alt case {i}", f"    {a}->>+{b}: request {i}", "  else", f"    {a}-x{b}: fail", "  end"]
+            elif i % 20 == 0:
+                out.append(f"  Note over {a},{b}: step {i} -> next")
+            else:
+                out.append(f"  {a}{rng.choice(['->>', '-->>', '-)', '->'])}{b}: message {i}")
+        elif kind == "flowchart":
+            if i % 100 == 0:
+                out += [f"  subgraph group{i} [Group {i}]", f"    N{i}a --> N{i}b", "  end"]
+            else:
+                out.append(f"  N{i}[Step {i}] -->|go {i}| C{i}{{Check {i}}} -.-> N{rng.randrange(i + 1)}")
+        else:
+            out += [f"  class C{i} {{", f"    +int field{i}", f"    +method{i}(List~int~ xs) bool", "  }",
+                    f"  C{rng.randrange(i)} <|-- C{i}" if i > 1 else f"  C{i} : +extra()",
+                    f'  C{i} "1" *-- "many" C{rng.randrange(i) + 1} : owns']
+    return "\n".join(out)
+
+
+def bench_mermaid(args):
+    """
+    Mermaid编译器：样例的输出和诊断信息正确，耗时随行数线性增长，缓存命中几乎不耗时
+    """
+    for code, expected, diagnostics in MERMAID_CASES:
+        result = compile_mermaid(code)
+        output = [line.strip() for line in result.plantuml.split("\n")]
+        missing = [line for line in expected if line not in output]
+        found = [(item["line"], item["severity"]) for item in result.diagnostics]
+        if missing or found != diagnostics:
+            raise AssertionError(f"{code!r}\n缺少: {missing}\n诊断: {found}，预期 {diagnostics}\n{result.plantuml}")
+    print(f"{len(MERMAID_CASES)} 个转换样例通过")
+
+    def cold(text):
+        clear_cache()
+        return compile_mermaid(text)
+
+    print(f"{'kind':>10} {'lines':>7} {'legacy (ms)':>12} {'compile (ms)':>13} {'cached (us)':>12}")
+    for kind, legacy_convert in LEGACY_CONVERTERS.items():
+        timings = {}
+        for lines in (args.lines // 4, args.lines):
+            code = synthetic_mermaid(kind, lines)
+            legacy = _best_of(legacy_convert, code, 3)
+            elapsed = _best_of(cold, code, 3)
+            cached = _best_of(compile_mermaid, code, 3)
+            timings[lines] = elapsed
+            print(f"{kind:>10} {lines:>7} {legacy * 1000:>12.1f} {elapsed * 1000:>13.1f} {cached * 1e6:>12.1f}")
+            result = compile_mermaid(code)
+            if result.diagnostics:
+                raise AssertionError(f"合成的{kind}图产生了诊断信息: {result.diagnostics[:3]}")
+            errors = [issue for issue in lint(result.plantuml, None if kind == "flowchart" else kind)
+                      if issue["severity"] == "error"]
+            if errors:
+                raise AssertionError(f"{kind}图的编译结果没有通过语法预检查: {errors[:3]}")
+        small, large = sorted(timings)
+        if timings[large] / timings[small] > (large / small) * 2:
+            raise AssertionError(f"{kind}图的编译耗时没有线性增长: {timings}")
+    print("Mermaid编译器校验通过")
+
+
+# 基准测试套件的工具调用和默认规模
+SUITE_TOOLS = ("generate_uml", "generate_uml_from_code")
+SUITE_SIZES = [1024, 16 * 1024, 64 * 1024]
+SUITE_CONCURRENCY = [1, 8, 32]
+SUITE_ENCODER_SIZES = [1024, 16 * 1024, 256 * 1024, 1024 * 1024]
+
+
+def _rss_mb():
+    """
+    返回 (当前RSS, 峰值RSS)，单位MB；当前RSS只在Linux上可用
+    """
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上 ru_maxrss 的单位是KB，macOS 上是字节
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        with open("/proc/self/statm") as f:
+            current_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        current_mb = None
+    return current_mb, peak_mb
+
+
+def _latency_summary(latencies, elapsed):
+    """
+    延迟分位数（毫秒）和吞吐量
+    """
+    return {
+        "latency_ms": {
+            "p50": _percentile(latencies, 50) * 1000,
+            "p95": _percentile(latencies, 95) * 1000,
+            "p99": _percentile(latencies, 99) * 1000,
+            "mean": statistics.mean(latencies) * 1000,
+            "max": max(latencies) * 1000,
+        },
+        "throughput_per_s": len(latencies) / elapsed if elapsed > 0 else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _suite_encoder(args):
+    results = []
+    for size in SUITE_ENCODER_SIZES:
+        if size > args.max_size:
+            break
+        text = synthetic_class_diagram(size)
+        repeat = max(3, min(200, (256 * 1024 * 10) // size))
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            began = time.perf_counter()
+            plantuml_encode(text)
+            latencies.append(time.perf_counter() - began)
+        summary = _latency_summary(latencies, time.perf_counter() - start)
+        summary["mb_per_s"] = size * len(latencies) / (1024 * 1024) / sum(latencies)
+        results.append({"scenario": "encoder", "size": size, "count": repeat, "errors": 0, **summary})
+    return results
+
+
+def _suite_tools(args, server, output_dir):
+    results = []
+    counter = iter(range(10 ** 9))
+
+    async def call(tool, code):
+        began = time.perf_counter()
+        if tool == "generate_uml":
+            text = await server.generate_uml("class", code, output_dir)
+        else:
+            text = await server.generate_uml_from_code(code, output_dir)
+        return time.perf_counter() - began, bool(json.loads(text).get("error"))
+
+    async def run(tool, template, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            # 每次调用使用不同的类名，避免命中渲染缓存或图表会话
+            code = template.replace("@startuml\n", f"@startuml\nclass Bench{next(counter)}\n", 1)
+            async with semaphore:
+                return await call(tool, code)
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(limited() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        await plantuml_client.aclose_clients()
+        return outcomes, elapsed
+
+    for tool in SUITE_TOOLS:
+        for size in args.sizes:
+            template = synthetic_class_diagram(size)
+            for concurrency in args.concurrency:
+                outcomes, elapsed = asyncio.run(run(tool, template, concurrency))
+                current, peak = _rss_mb()
+                results.append({
+                    "scenario": tool, "size": size, "concurrency": concurrency,
+                    "count": len(outcomes), "errors": sum(1 for _, failed in outcomes if failed),
+                    **_latency_summary([latency for latency, _ in outcomes], elapsed),
+                    "rss_mb": current, "peak_rss_mb": peak,
+                })
+    return results
+
+
+def _result_key(result):
+    return (result["scenario"], result["size"], result.get("concurrency"))
+
+
+def _compare(results, baseline_path, tolerance):
+    """
+    与之前保存的结果比较p95延迟和吞吐量
+
+    Returns:
+        int: 发现超过 tolerance 的退化时为1，否则为0
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {_result_key(result): result for result in json.load(f)["results"]}
+    regressions = 0
+    print(f"\n与 {baseline_path} 比较（容差 {tolerance:.0%}）:")
+    print(f"{'scenario':>24} {'size':>8} {'conc':>5} {'p95 old':>9} {'p95 new':>9} {'tput old':>9} {'tput new':>9}")
+    for result in results:
+        old = baseline.get(_result_key(result))
+        if old is None:
+            continue
+        p95_old, p95_new = old["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        tput_old, tput_new = old["throughput_per_s"], result["throughput_per_s"]
+        regressed = p95_new > p95_old * (1 + tolerance) or (tput_old and tput_new < tput_old * (1 - tolerance))
+        regressions += bool(regressed)
+        print(f"{result['scenario']:>24} {result['size']:>8} {result.get('concurrency') or '-':>5} "
+              f"{p95_old:>9.2f} {p95_new:>9.2f} {tput_old:>9.1f} {tput_new:>9.1f}{'  退化' if regressed else ''}")
+    print(f"{regressions} 个场景退化" if regressions else "没有发现退化")
+    return 1 if regressions else 0
+
+
+def bench_suite(args):
+    """
+    渲染流水线基准测试套件：编码器，以及 generate_uml 和 generate_uml_from_code 在
+    不同图表大小和并发数下的延迟分位数、吞吐量和RSS，结果写入JSON以便在提交之间比较
+    """
+    import tempfile
+
+    # 失败率只体现在结果的 errors 中，不让重试退避拉长测量时间
+    os.environ["UML_RETRY_ATTEMPTS"] = "1"
+    os.environ["UML_BREAKER_THRESHOLD"] = "0"
+    with StubRenderer(latency=args.latency, payload_size=args.payload_size, error_rate=args.error_rate,
+                      seed=args.seed) as stub, tempfile.TemporaryDirectory() as output_dir:
+        server = _load_server(stub.url)
+        logging.disable(logging.CRITICAL)
+        try:
+            results = _suite_encoder(args) + _suite_tools(args, server, output_dir)
+        finally:
+            logging.disable(logging.NOTSET)
+    plantuml_client.close_clients()
+
+    print(f"{'scenario':>24} {'size':>8} {'conc':>5} {'count':>6} {'errors':>6} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'per s':>9} {'rss MB':>7}")
+    for result in results:
+        latency = result["latency_ms"]
+        rss = result.get("rss_mb")
+        print(f"{result['scenario']:>24} {result['size']:>8} {result.get('concurrency') or '-':>5} "
+              f"{result['count']:>6} {result['errors']:>6} {latency['p50']:>9.2f} {latency['p95']:>9.2f} "
+              f"{latency['p99']:>9.2f} {result['throughput_per_s']:>9.1f} "
+              f"{f'{rss:.1f}' if rss is not None else '-':>7}")
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "stub": {"latency": args.latency, "payload_size": args.payload_size,
+                     "error_rate": args.error_rate, "seed": args.seed},
+            "requests": args.requests,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    if args.compare:
+        return _compare(results, args.compare, args.tolerance)
+    return 0
+
+
+def _render_with(backend, encoded, path, mode):
+    """
+    以同步或异步方式渲染到文件，返回 (结果或异常, 耗时秒数)
+    """
+    async def render_async():
+        try:
+            return await backend.render_to_file_async(encoded, "png", path)
+        finally:
+            await plantuml_client.aclose_clients()
+
+    start = time.perf_counter()
+    try:
+        if mode == "sync":
+            result = backend.render_to_file(encoded, "png", path)
+        else:
+            result = asyncio.run(render_async())
+    except Exception as e:
+        result = e
+    return result, time.perf_counter() - start
+
+
+def bench_resilience(args):
+    """
+    对注入故障的本地渲染服务桩校验超时、重试、熔断和对冲请求
+    """
+    import tempfile
+
+    encoded = plantuml_encode("@startuml\nclass Resilient\n@enduml")
+    retry = RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.05)
+    failures = []
+
+    def check(name, mode, passed, detail):
+        print(f"{name:<28} {mode:>6}  {'ok' if passed else 'FAIL':<4}  {detail}")
+        if not passed:
+            failures.append(f"{name} ({mode})")
+
+    with StubRenderer() as stub, tempfile.TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "resilient.png")
+        for mode in ("sync", "async"):
+            stub.status = 200
+
+            # 5xx 和断开连接会重试，4xx 不会
+            for name, fault, value, expected_requests, succeeds in (
+                    ("retry on 503", "status", 503, 3, True),
+                    ("retry on dropped connection", "drop", None, 2, True),
+                    ("no retry on 400", "status", 400, 1, False)):
+                stub.reset_counters()
+                stub.inject(fault, value, count=2 if fault == "status" and succeeds else 1)
+                result, _ = _render_with(HttpBackend(stub.url, retry=retry), encoded, path, mode)
+                check(name, mode, isinstance(result, int) == succeeds and stub.requests == expected_requests,
+                      f"requests={stub.requests} result={result!r}")
+
+            # 读取超时后重试，不等待慢请求结束
+            stub.reset_counters()
+            stub.inject("delay", 1.0)
+            result, elapsed = _render_with(HttpBackend(stub.url, timeout=0.2, retry=retry), encoded, path, mode)
+            check("retry after read timeout", mode, isinstance(result, int) and stub.requests == 2 and elapsed < 0.9,
+                  f"requests={stub.requests} elapsed={elapsed * 1000:.0f}ms")
+
+            # 连续失败后熔断，熔断期间不再请求服务，冷却后试探成功即恢复
+            stub.reset_counters()
+            stub.status = 500
+            backend = HttpBackend(stub.url, failure_threshold=3, reset_timeout=0.3)
+            results = [_render_with(backend, encoded, path, mode) for _ in range(6)]
+            rejected = [elapsed for result, elapsed in results if isinstance(result, CircuitOpenError)]
+            check("circuit opens", mode, stub.requests == 3 and len(rejected) == 3 and max(rejected) < 0.05,
+                  f"requests={stub.requests} rejected={len(rejected)} state={backend.nodes[0].breaker.state}")
+            time.sleep(0.35)
+            stub.status = 200
+            result, _ = _render_with(backend, encoded, path, mode)
+            check("circuit recovers", mode, isinstance(result, int) and backend.nodes[0].breaker.state == "closed",
+                  f"requests={stub.requests} state={backend.nodes[0].breaker.state}")
+
+            # 第一个请求很慢时由对冲请求胜出
+            stub.reset_counters()
+            stub.inject("delay", 2.0)
+            backend = HttpBackend(stub.url, hedge_delay=0.05)
+            result, elapsed = _render_with(backend, encoded, path, mode)
+            stats = backend.stats()
+            check("hedged request wins", mode,
+                  isinstance(result, int) and elapsed < 0.5 and stats["hedged"] == 1 and stats["hedge_wins"] == 1,
+                  f"requests={stub.requests} elapsed={elapsed * 1000:.0f}ms hedge_wins={stats['hedge_wins']}")
+
+        # 落败的请求结束后不应留下临时文件
+        time.sleep(2.2)
+        leftovers = [name for name in os.listdir(output_dir) if name != "resilient.png"]
+        check("no leftover temp files", "both", not leftovers, f"files={leftovers}")
+    plantuml_client.close_clients()
+
+    if failures:
+        raise AssertionError(f"容错校验失败: {', '.join(failures)}")
+    print("容错校验通过")
+
+
+def _balanced_run(backend, renders, concurrency, offset=0):
+    encoded = [plantuml_encode(f"@startuml\nclass Balanced{offset + i}\n@enduml") for i in range(renders)]
+
+    def render(item):
+        try:
+            backend.render(item, "png")
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        succeeded = sum(executor.map(render, encoded))
+    return succeeded, time.perf_counter() - start
+
+
+def bench_balance(args):
+    """
+    多个渲染服务之间的负载均衡：吞吐量随节点数的变化，以及故障节点的摘除与恢复
+    """
+    print(f"每个服务桩: 延迟 {args.latency * 1000:.0f} ms，最多同时处理 {args.capacity} 个请求，"
+          f"单节点吞吐上限约 {args.capacity / args.latency:.0f} req/s")
+    print(f"{'endpoints':>10} {'renders':>8} {'time (s)':>9} {'renders/s':>10}  requests per endpoint")
+    throughput = {}
+    for count in args.endpoints:
+        stubs = [StubRenderer(latency=args.latency, capacity=args.capacity).__enter__() for _ in range(count)]
+        try:
+            backend = HttpBackend([stub.url for stub in stubs], balance=args.balance)
+            succeeded, total = _balanced_run(backend, args.renders, args.concurrency)
+            if succeeded != args.renders:
+                raise AssertionError(f"{args.renders - succeeded} 个渲染失败")
+            throughput[count] = args.renders / total
+            print(f"{count:>10} {args.renders:>8} {total:>9.2f} {throughput[count]:>10.1f}  "
+                  f"{[stub.requests for stub in stubs]}")
+        finally:
+            for stub in stubs:
+                stub.__exit__(None, None, None)
+            plantuml_client.close_clients()
+
+    # 一个节点持续返回500：被摘除后请求转到其他节点，恢复后重新加入
+    stubs = [StubRenderer(latency=args.latency, capacity=args.capacity).__enter__() for _ in range(3)]
+    try:
+        backend = HttpBackend([stub.url for stub in stubs], balance=args.balance,
+                              retry=RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.01),
+                              failure_threshold=3, reset_timeout=2.0)
+        stubs[0].status = 500
+        succeeded, _ = _balanced_run(backend, 60, args.concurrency, offset=args.renders)
+        first = backend.stats()["endpoints"][0]
+        succeeded_after, _ = _balanced_run(backend, 60, args.concurrency, offset=args.renders + 60)
+        ejected = backend.stats()["endpoints"][0]
+        print(f"故障节点: 摘除前收到 {first['requests']} 个请求（并发在途），摘除后 "
+              f"{ejected['requests'] - first['requests']} 个，状态 {ejected['state']}，"
+              f"成功渲染 {succeeded + succeeded_after}/120")
+        if succeeded + succeeded_after != 120 or ejected["state"] != "open" or ejected["requests"] != first["requests"]:
+            raise AssertionError("故障节点没有被摘除或请求没有转到其他节点")
+
+        stubs[0].status = 200
+        time.sleep(2.1)
+        _balanced_run(backend, 60, args.concurrency, offset=args.renders + 120)
+        readmitted = backend.stats()["endpoints"][0]
+        print(f"恢复后: 请求 {readmitted['requests']} 次，状态 {readmitted['state']}")
+        if readmitted["state"] != "closed" or readmitted["requests"] <= ejected["requests"] + 1:
+            raise AssertionError("恢复的节点没有重新加入")
+    finally:
+        for stub in stubs:
+            stub.__exit__(None, None, None)
+        plantuml_client.close_clients()
+
+    if len(throughput) > 1:
+        smallest, largest = min(throughput), max(throughput)
+        scaling = throughput[largest] / throughput[smallest]
+        print(f"{largest} 个节点的吞吐量是 {smallest} 个节点的 {scaling:.2f} 倍")
+        if scaling < 0.7 * largest / smallest:
+            raise AssertionError("吞吐量没有随节点数扩展")
+    print("负载均衡校验通过")
+
+
+def _render_success(backend, encoded, source, renders):
+    succeeded = 0
+    # 预期中的414会记录错误日志，这里只统计成功率
+    logging.disable(logging.ERROR)
+    try:
+        for _ in range(renders):
+            try:
+                backend.render(encoded, "png", source=source)
+                succeeded += 1
+            except Exception:
+                pass
+    finally:
+        logging.disable(logging.NOTSET)
+    return succeeded
+
+
+def bench_post(args):
+    """
+    1KB 到 1MB 的图表：编码耗时、编码后长度，以及只用GET和自动切换POST时的渲染成功率
+    """
+    with StubRenderer(max_url=args.max_url) as stub:
+        get_only = HttpBackend(stub.url, post_threshold=0)
+        auto = HttpBackend(stub.url, post_threshold=args.threshold)
+        print(f"服务桩请求行上限 {args.max_url} 个字符，超过 {args.threshold} 个字符的编码结果改用POST")
+        print(f"{'size':>9} {'encode (ms)':>12} {'encoded':>9} {'GET ok':>8} {'auto ok':>8} {'method':>7}")
+        for size in POST_SIZES:
+            if size > args.max_size:
+                break
+            source = synthetic_class_diagram(size)
+            encode_s = _best_of(plantuml_encode, source, 3)
+            encoded = plantuml_encode(source)
+            get_ok = _render_success(get_only, encoded, None, args.renders)
+            auto_ok = _render_success(auto, encoded, source, args.renders)
+            method = "POST" if auto.uses_post(encoded, source) else "GET"
+            print(f"{size:>9} {encode_s * 1000:>12.2f} {len(encoded):>9} "
+                  f"{get_ok * 100 / args.renders:>7.0f}% {auto_ok * 100 / args.renders:>7.0f}% {method:>7}")
+            if auto_ok != args.renders:
+                raise AssertionError(f"{size} 字节的图表自动切换后仍然渲染失败")
+            if len(stub.url) + len(encoded) + 32 > args.max_url and get_ok:
+                raise AssertionError("服务桩没有拒绝过长的URL")
+
+        # 阈值高于服务的实际限制时，GET 返回414后改用POST
+        stub.reset_counters()
+        lenient = HttpBackend(stub.url, post_threshold=args.max_url * 4)
+        source = synthetic_class_diagram(args.max_url * 8)
+        encoded = plantuml_encode(source)
+        _render_success(lenient, encoded, source, 1)
+        stats = lenient.stats()
+        print(f"414 回退: 编码后 {len(encoded)} 个字符，拒绝 {stub.rejected} 次，POST {stub.posts} 次，"
+              f"post_fallbacks={stats['post_fallbacks']}")
+        if stub.rejected != 1 or stub.posts != 1 or stats["post_fallbacks"] != 1:
+            raise AssertionError("GET 返回414后没有改用POST")
+    plantuml_client.close_clients()
+    print("POST渲染校验通过")
+
+
+def _log_calls(logger, code, calls, lazy):
+    """
+    模拟一次失败的渲染调用的日志：开始信息、调试源码和错误源码
+    """
+    started = time.perf_counter()
+    for i in range(calls):
+        if lazy:
+            logger.info("开始生成UML图: %s, 格式: %s, 输出目录: %s", "class", "png", "/tmp/out")
+            logger.debug("生成的UML代码:\n%s", SourcePreview(code))
+            logger.error("UML代码: \n%s", SourcePreview(code))
+        else:
+            logger.info(f"开始生成UML图: {'class'}, 格式: {'png'}, 输出目录: {'/tmp/out'}")
+            logger.debug(f"生成的UML代码:\n{code}")
+            logger.error(f"UML代码: \n{code}")
+    return time.perf_counter() - started
+
+
+def bench_logging(args):
+    """
+    对比同步日志（f-string完整源码，直接写文件和控制台）与队列日志（延迟格式化、截断源码）的单次调用开销
+    """
+    import tempfile
+
+    code = synthetic_class_diagram(args.source_kb * 1024)
+    print(f"{'mode':>10} {'calls':>7} {'caller (us/call)':>17} {'total (us/call)':>16} {'log size (KB)':>14}")
+    for mode in ("sync", "queued"):
+        with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+            logger = logging.getLogger(f"uml-benchmark-{mode}")
+            logger.propagate = False
+            handlers = create_handlers(log_dir, max_bytes=1 << 40, backup_count=0, console=False)
+            console = logging.StreamHandler(devnull)
+            console.setFormatter(handlers[0].formatter)
+            handlers.append(console)
+
+            started = time.perf_counter()
+            if mode == "sync":
+                logger.setLevel(logging.INFO)
+                for handler in handlers:
+                    logger.addHandler(handler)
+                caller = _log_calls(logger, code, args.calls, lazy=False)
+            else:
+                listener = start_queued_logging(handlers, logger=logger)
+                caller = _log_calls(logger, code, args.calls, lazy=True)
+                listener.stop()
+                atexit.unregister(listener.stop)
+            total = time.perf_counter() - started
+
+            for handler in handlers:
+                handler.close()
+            logger.handlers.clear()
+            size = sum(os.path.getsize(os.path.join(log_dir, name)) for name in os.listdir(log_dir))
+        print(f"{mode:>10} {args.calls:>7} {caller / args.calls * 1e6:>17.1f} "
+              f"{total / args.calls * 1e6:>16.1f} {size / 1024:>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UML-MCP-Server 性能基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    codec_parser = subparsers.add_parser('codec', help='PlantUML编码器基准测试')
+    codec_parser.add_argument('--max-size', type=int, default=10 * 1024 * 1024, help='最大输入字节数')
+    codec_parser.set_defaults(func=bench_codec)
+
+    http_parser = subparsers.add_parser('http', help='HTTP连接池基准测试（本地渲染服务桩）')
+    http_parser.add_argument('--requests', type=int, default=100, help='渲染请求数')
+    http_parser.add_argument('--concurrency', type=int, default=10, help='并发请求数')
+    http_parser.add_argument('--latency', type=float, default=0.005, help='渲染服务桩的响应延迟（秒）')
+    http_parser.set_defaults(func=bench_http)
+
+    concurrency_parser = subparsers.add_parser('concurrency', help='异步工具并发调用校验（本地渲染服务桩）')
+    concurrency_parser.add_argument('--calls', type=int, default=20, help='并发工具调用数')
+    concurrency_parser.add_argument('--latency', type=float, default=0.5, help='渲染服务桩的响应延迟（秒）')
+    concurrency_parser.set_defaults(func=bench_concurrency)
+
+    backends_parser = subparsers.add_parser('backends', help='本地JVM与HTTP渲染后端延迟对比')
+    backends_parser.add_argument('--jar', default=os.environ.get("PLANTUML_JAR", "plantuml.jar"), help='plantuml.jar 路径')
+    backends_parser.add_argument('--java', default=os.environ.get("UML_JAVA", "java"), help='java可执行文件')
+    backends_parser.add_argument('--server', default=os.environ.get("PLANTUML_SERVER", "http://www.plantuml.com/plantuml"), help='HTTP后端使用的PlantUML服务地址')
+    backends_parser.add_argument('--renders', type=int, default=20, help='每个后端的渲染次数')
+    backends_parser.add_argument('--cold-renders', type=int, default=3, help='每次启动JVM的渲染次数')
+    backends_parser.set_defaults(func=bench_backends)
+
+    pool_parser = subparsers.add_parser('pool', help='本地渲染进程池吞吐量')
+    pool_parser.add_argument('--jar', default=os.environ.get("PLANTUML_JAR", "plantuml.jar"), help='plantuml.jar 路径')
+    pool_parser.add_argument('--java', default=os.environ.get("UML_JAVA", "java"), help='java可执行文件')
+    pool_parser.add_argument('--renders', type=int, default=200, help='渲染的图表数')
+    pool_parser.add_argument('--size', type=int, default=20 * 1024, help='每个合成类图的源码字节数')
+    pool_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='进程数列表')
+    pool_parser.set_defaults(func=bench_pool)
+
+    memory_parser = subparsers.add_parser('memory', help='超大图像流式下载的内存峰值校验（本地渲染服务桩）')
+    memory_parser.add_argument('--payload-mb', type=int, default=128, help='渲染结果大小（MB）')
+    memory_parser.add_argument('--limit-mb', type=int, default=16, help='允许的Python堆内存峰值（MB）')
+    memory_parser.set_defaults(func=bench_memory)
+
+    startup_parser = subparsers.add_parser('startup', help='服务器冷启动到首次响应的时间')
+    startup_parser.add_argument('--runs', type=int, default=10, help='启动次数')
+    startup_parser.add_argument('--server', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uml_mcp_server.py'),
+                                help='服务器脚本路径')
+    startup_parser.set_defaults(func=bench_startup)
+
+    logging_parser = subparsers.add_parser('logging', help='同步日志与队列日志的单次调用开销对比')
+    logging_parser.add_argument('--calls', type=int, default=2000, help='模拟的渲染调用数')
+    logging_parser.add_argument('--source-kb', type=int, default=100, help='PlantUML源码大小（KB）')
+    logging_parser.set_defaults(func=bench_logging)
+
+    coalesce_parser = subparsers.add_parser('coalesce', help='相同并发渲染的请求合并校验（本地渲染服务桩）')
+    coalesce_parser.add_argument('--calls', type=int, default=20, help='并发的相同异步调用数')
+    coalesce_parser.add_argument('--latency', type=float, default=0.2, help='渲染服务桩的响应延迟（秒）')
+    coalesce_parser.set_defaults(func=bench_coalesce)
+
+    resilience_parser = subparsers.add_parser('resilience', help='超时、重试、熔断和对冲请求校验（故障注入服务桩）')
+    resilience_parser.set_defaults(func=bench_resilience)
+
+    balance_parser = subparsers.add_parser('balance', help='多渲染服务负载均衡的吞吐量与故障节点摘除校验')
+    balance_parser.add_argument('--endpoints', type=int, nargs='+', default=[1, 2, 4], help='服务桩数量列表')
+    balance_parser.add_argument('--renders', type=int, default=400, help='每轮渲染的图表数')
+    balance_parser.add_argument('--concurrency', type=int, default=32, help='并发渲染数')
+    balance_parser.add_argument('--latency', type=float, default=0.02, help='服务桩的渲染延迟（秒）')
+    balance_parser.add_argument('--capacity', type=int, default=2, help='每个服务桩同时处理的请求数')
+    balance_parser.add_argument('--balance', default='least-outstanding', choices=HttpBackend.BALANCE_POLICIES,
+                                help='负载均衡策略')
+    balance_parser.set_defaults(func=bench_balance)
+
+    post_parser = subparsers.add_parser('post', help='1KB-1MB 图表的编码耗时和 GET/POST 渲染成功率')
+    post_parser.add_argument('--max-url', type=int, default=8192, help='服务桩接受的最长请求行')
+    post_parser.add_argument('--threshold', type=int, default=HttpBackend.POST_THRESHOLD,
+                             help='改用POST的编码长度')
+    post_parser.add_argument('--max-size', type=int, default=1024 * 1024, help='最大源码字节数')
+    post_parser.add_argument('--renders', type=int, default=10, help='每个大小的渲染次数')
+    post_parser.set_defaults(func=bench_post)
+
+    sessions_parser = subparsers.add_parser('sessions', help='图表会话：空白或注释修改跳过渲染并返回结构差异')
+    sessions_parser.add_argument('--edits', type=int, default=40, help='连续修改次数')
+    sessions_parser.add_argument('--latency', type=float, default=0.05, help='服务桩的渲染延迟（秒）')
+    sessions_parser.set_defaults(func=bench_sessions)
+
+    lint_parser = subparsers.add_parser('lint', help='本地语法预检查的准确性和耗时')
+    lint_parser.add_argument('--iterations', type=int, default=2000, help='每个样例的检查次数')
+    lint_parser.set_defaults(func=bench_lint)
+
+    markdown_parser = subparsers.add_parser('markdown', help='Markdown图表提取的耗时和内存')
+    markdown_parser.add_argument('--size-mb', type=float, nargs='+', default=[1, 8, 32], help='Markdown文件大小（MB）')
+    markdown_parser.add_argument('--diagrams', type=int, default=48, help='每个文件中的图表数')
+    markdown_parser.set_defaults(func=bench_markdown)
+
+    docs_parser = subparsers.add_parser('docs', help='文档目录增量构建的耗时')
+    docs_parser.add_argument('--files', type=int, default=500, help='Markdown文件数')
+    docs_parser.add_argument('--diagrams', type=int, default=3, help='每个文件中的图表数')
+    docs_parser.add_argument('--latency', type=float, default=0.05, help='服务桩的渲染延迟（秒）')
+    docs_parser.add_argument('--jobs', type=int, default=8, help='渲染进程数')
+    docs_parser.set_defaults(func=bench_docs)
+
+    mermaid_parser = subparsers.add_parser('mermaid', help='Mermaid编译器的正确性和耗时')
+    mermaid_parser.add_argument('--lines', type=int, default=10000, help='最大的Mermaid代码行数')
+    mermaid_parser.set_defaults(func=bench_mermaid)
+
+    gallery_parser = subparsers.add_parser('gallery', help='画廊页面的大小、生成耗时和增量写入')
+    gallery_parser.add_argument('--files', type=int, default=400, help='Markdown文件数')
+    gallery_parser.add_argument('--diagrams', type=int, default=3, help='每个文件中的图数')
+    gallery_parser.add_argument('--latency', type=float, default=0.02, help='渲染服务桩的延迟（秒）')
+    gallery_parser.add_argument('--jobs', type=int, default=8, help='渲染进程数')
+    gallery_parser.set_defaults(func=bench_gallery)
+
+    watch_parser = subparsers.add_parser('watch', help='--watch 模式的保存到图像延迟、防抖和空闲CPU占用')
+    watch_parser.add_argument('--latency', type=float, default=0.05, help='渲染服务桩的延迟（秒）')
+    watch_parser.add_argument('--debounce', type=int, default=150, help='防抖时间（毫秒）')
+    watch_parser.add_argument('--idle', type=float, default=2.0, help='测量空闲CPU占用的时长（秒）')
+    watch_parser.set_defaults(func=bench_watch)
+
+    suite_parser = subparsers.add_parser('suite', help='渲染流水线基准测试套件，结果写入JSON')
+    suite_parser.add_argument('--output', default='bench.json', help='结果JSON文件，空字符串表示不写入')
+    suite_parser.add_argument('--compare', help='与之前保存的结果JSON比较，发现退化时退出码为1')
+    suite_parser.add_argument('--tolerance', type=float, default=0.2, help='比较时允许的p95和吞吐量变化比例')
+    suite_parser.add_argument('--requests', type=int, default=64, help='每个场景的工具调用次数')
+    suite_parser.add_argument('--sizes', type=int, nargs='+', default=SUITE_SIZES, help='图表源码字节数')
+    suite_parser.add_argument('--concurrency', type=int, nargs='+', default=SUITE_CONCURRENCY, help='并发数')
+    suite_parser.add_argument('--max-size', type=int, default=1024 * 1024, help='编码器测试的最大源码字节数')
+    suite_parser.add_argument('--latency', type=float, default=0.01, help='服务桩的渲染延迟（秒）')
+    suite_parser.add_argument('--payload-size', type=int, default=16 * 1024, help='服务桩返回的图像字节数')
+    suite_parser.add_argument('--error-rate', type=float, default=0.0, help='服务桩返回500的概率')
+    suite_parser.add_argument('--seed', type=int, default=0, help='服务桩错误的随机数种子')
+    suite_parser.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
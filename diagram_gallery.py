@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 多图表画廊页面
+
+所有图表汇总到一个静态HTML页面，不依赖任何CDN或脚本：网格中显示预先渲染的缩略图
+（或较小的内联SVG），原尺寸图像放在折叠的 <details> 中并设置 loading="lazy"，
+展开之前不会下载。图像带有宽高属性、每个图表设置 content-visibility，
+上千个图表的页面打开时也只需要布局和解码可见部分。
+
+渲染过程中页面按 FLUSH_INTERVAL 增量重写：已完成的图表立即可见，其余显示为占位。
+"""
+
+import html
+import os
+import re
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+# 缩略图的最大宽度（像素）
+THUMBNAIL_WIDTH = 320
+
+# 不超过此大小（字节）的SVG直接内联到页面中作为缩略图
+INLINE_SVG_LIMIT = 64 * 1024
+
+# 渲染过程中两次重写页面之间的最短间隔（秒）
+FLUSH_INTERVAL = 0.5
+
+# 图表状态
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_SVG_START = re.compile(r"<svg\b", re.IGNORECASE)
+_SVG_REFERENCE = re.compile(r'(\bid="|url\(#|href="#)([^")]+)')
+
+_STYLE = """
+body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; color: #333; }
+h1 { border-bottom: 1px solid #ddd; padding-bottom: 10px; }
+h2 { font-size: 1.1em; margin-top: 30px; }
+.grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(%(width)dpx, 1fr)); gap: 16px; }
+figure { margin: 0; padding: 10px; background-color: white; border-radius: 5px;
+         box-shadow: 0 2px 5px rgba(0,0,0,0.1); content-visibility: auto; contain-intrinsic-size: %(width)dpx 280px; }
+figure img, figure svg { max-width: 100%%; height: auto; }
+figcaption { font-size: 0.85em; margin-top: 6px; word-break: break-all; }
+.thumbnail { display: flex; justify-content: center; align-items: center; min-height: 120px; overflow: hidden; }
+.placeholder { color: #999; }
+.failed { color: #c00; }
+details { margin-top: 6px; font-size: 0.85em; }
+"""
+
+
+def thumbnail_source(plantuml_code, width=THUMBNAIL_WIDTH) -> str:
+    """
+    在第一个 @startXXX 之后加入 scale max，让渲染服务直接生成缩略图，不需要本地图像库
+
+    Args:
+        plantuml_code: 补全了 @startuml/@enduml 的PlantUML代码
+        width: 缩略图的最大宽度（像素），较小的图保持原尺寸
+
+    Returns:
+        str: 缩略图的PlantUML代码
+    """
+    lines = plantuml_code.split("\n")
+    for i, line in enumerate(lines):
+        if line.strip().startswith("@start"):
+            lines.insert(i + 1, f"scale max {width} width")
+            break
+    return "\n".join(lines)
+
+
+def png_size(path) -> Optional[Tuple[int, int]]:
+    """
+    从PNG文件头（IHDR）读取宽高，不是PNG或无法读取时返回None
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(24)
+    except OSError:
+        return None
+    if len(header) < 24 or not header.startswith(_PNG_SIGNATURE) or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def inline_svg(path, prefix, limit=INLINE_SVG_LIMIT) -> Optional[str]:
+    """
+    读取可以内联的SVG：去掉XML声明，并给所有 id 及其引用加上前缀，避免同一页面中多个SVG的 id 冲突
+
+    Returns:
+        str: <svg> 元素；文件不存在、超过 limit 或不是SVG时返回None
+    """
+    try:
+        if os.path.getsize(path) > limit:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+    start = _SVG_START.search(content)
+    if start is None:
+        return None
+    return _SVG_REFERENCE.sub(lambda m: m.group(1) + prefix + m.group(2), content[start.start():])
+
+
+class Gallery:
+    """
+    画廊页面：按来源文件分组的图表列表，渲染过程中增量重写
+    """
+
+    def __init__(self, output_dir, title="Diagrammes", name="index.html"):
+        """
+        Args:
+            output_dir: 图像所在目录，页面写到其中，图像路径相对于此目录
+            title: 页面标题
+            name: 页面文件名
+        """
+        self.output_dir = output_dir
+        self.title = title
+        self.path = os.path.join(output_dir, name)
+        self.writes = 0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        # 产物路径 -> 等待它的图表键
+        self._waiting: Dict[str, List[str]] = {}
+        self._inline: Dict[Tuple[str, str], Optional[str]] = {}
+        self._dirty = False
+        self._last_flush = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, source, line, kind, image, thumbnail=None, svg=None, state=None):
+        """
+        加入一个图表
+
+        Args:
+            key: 图表在页面中的唯一键
+            source: 来源文件（用于分组和说明）
+            line: 代码块在来源文件中的起始行号
+            kind: 图表类型
+            image: 原尺寸图像，相对于 output_dir
+            thumbnail: 缩略图，相对于 output_dir；None 时使用原尺寸图像
+            svg: SVG图像，相对于 output_dir
+            state: PENDING/READY/FAILED；None 时根据产物是否都已存在决定
+        """
+        artifacts = [path for path in (image, thumbnail, svg) if path]
+        missing = [path for path in artifacts if not os.path.exists(os.path.join(self.output_dir, path))]
+        if state is None:
+            state = PENDING if missing else READY
+        if state == PENDING:
+            for path in missing:
+                self._waiting.setdefault(path, []).append(key)
+        self._entries[key] = {"source": source, "line": line, "kind": kind, "image": image,
+                              "thumbnail": thumbnail, "svg": svg, "state": state,
+                              "missing": set(missing) if state == PENDING else set()}
+        self._dirty = True
+
+    def rendered(self, path, error=None):
+        """
+        记录一个产物渲染完成（或失败）；图表的所有产物都完成后变为 READY
+
+        Args:
+            path: 产物路径，相对于 output_dir
+            error: 渲染失败时的错误信息
+        """
+        for key in self._waiting.pop(path, ()):
+            entry = self._entries[key]
+            if error:
+                entry["state"] = FAILED
+            entry["missing"].discard(path)
+            if not entry["missing"] and entry["state"] == PENDING:
+                entry["state"] = READY
+            self._dirty = True
+
+    def flush(self, force=False) -> bool:
+        """
+        有变化且距上次写入超过 FLUSH_INTERVAL（或 force）时重写页面
+
+        Returns:
+            bool: 是否写入了页面
+        """
+        now = time.monotonic()
+        if not self._dirty or (not force and now - self._last_flush < FLUSH_INTERVAL):
+            return False
+        self._last_flush = now
+        self._dirty = False
+        return self.write()
+
+    def write(self) -> bool:
+        """
+        生成页面并原子地写入；内容与现有文件相同时不写入
+
+        Returns:
+            bool: 是否写入了页面
+        """
+        content = self.render()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                if f.read() == content:
+                    return False
+        except (OSError, UnicodeDecodeError):
+            pass
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+        self.writes += 1
+        return True
+
+    def render(self) -> str:
+        """
+        生成页面HTML
+        """
+        groups: "OrderedDict[str, List[str]]" = OrderedDict()
+        for index, entry in enumerate(self._entries.values()):
+            groups.setdefault(entry["source"], []).append(self._figure(index, entry))
+        ready = sum(entry["state"] == READY for entry in self._entries.values())
+        parts = [
+            "<!DOCTYPE html>",
+            '<html lang="fr">',
+            "<head>",
+            '<meta charset="UTF-8">',
+            '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
+            f"<title>{html.escape(self.title)}</title>",
+            f"<style>{_STYLE % {'width': THUMBNAIL_WIDTH}}</style>",
+            "</head>",
+            "<body>",
+            f"<h1>{html.escape(self.title)}</h1>",
+            f"<p>{ready} / {len(self._entries)} diagramme(s) rendu(s)</p>",
+        ]
+        for source, figures in groups.items():
+            parts.append(f"<h2>{html.escape(source)}</h2>")
+            parts.append('<div class="grid">')
+            parts.extend(figures)
+            parts.append("</div>")
+        parts.extend(["</body>", "</html>", ""])
+        return "\n".join(parts)
+
+    def _figure(self, index, entry) -> str:
+        anchor = f"d{index}"
+        caption = (f'<figcaption><a href="#{anchor}">{html.escape(entry["source"])}:{entry["line"]}</a> '
+                   f'({html.escape(entry["kind"] or "uml")})</figcaption>')
+        if entry["state"] == PENDING:
+            body = '<div class="thumbnail placeholder">rendu en cours…</div>'
+        elif entry["state"] == FAILED:
+            body = '<div class="thumbnail failed">échec du rendu</div>'
+        else:
+            body = f'<div class="thumbnail">{self._thumbnail(anchor, entry)}</div>'
+            image = _url(entry["image"])
+            links = [f'<a href="{image}">image</a>']
+            if entry["svg"]:
+                links.append(f'<a href="{_url(entry["svg"])}">SVG</a>')
+            body += (f'<details><summary>Taille réelle</summary>'
+                     f'<a href="{image}"><img src="{image}" loading="lazy" decoding="async" alt=""></a>'
+                     f'</details><div>{" · ".join(links)}</div>')
+        return f'<figure id="{anchor}">{body}{caption}</figure>'
+
+    def _thumbnail(self, anchor, entry) -> str:
+        if entry["svg"]:
+            cache_key = (entry["svg"], anchor)
+            if cache_key not in self._inline:
+                self._inline[cache_key] = inline_svg(os.path.join(self.output_dir, entry["svg"]), f"{anchor}-")
+            if self._inline[cache_key] is not None:
+                return self._inline[cache_key]
+        thumbnail = entry["thumbnail"] or entry["image"]
+        size = png_size(os.path.join(self.output_dir, thumbnail))
+        dimensions = f' width="{size[0]}" height="{size[1]}"' if size else ""
+        return (f'<img src="{_url(thumbnail)}"{dimensions} loading="lazy" decoding="async" '
+                f'alt="{html.escape(entry["kind"] or "diagramme")}">')
+
+
+def _url(path) -> str:
+    return quote(path.replace(os.sep, "/"))
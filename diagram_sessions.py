@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 图表会话与增量渲染
+
+同一个输出目录下同名的图表视为一个会话；没有名称的图表每次都是新的会话，
+不与其他图表比较。每次生成时先对补全了
+@startuml/@enduml 的源码做语义规范化（去掉注释、空行和多余空白），与会话上一版本相同
+且输出文件仍然存在时直接返回上一版本的结果，不再编码和渲染。
+语义变化时返回与上一版本的结构差异：新增、删除或变化的类、参与者、其他元素和关系。
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from render_cache import normalize_source
+
+# 类图中带成员体的声明
+CLASS_KEYWORDS = ("abstract class", "abstract", "class", "interface", "enum", "annotation",
+                  "struct", "exception", "metaclass", "protocol", "record", "stereotype")
+
+# 时序图参与者
+PARTICIPANT_KEYWORDS = ("participant", "actor", "boundary", "control", "entity", "database",
+                        "collections", "queue")
+
+# 其他可命名元素，带 { 时是容器，内部仍是声明
+ELEMENT_KEYWORDS = ("object", "map", "json", "usecase", "component", "node", "package", "namespace",
+                    "rectangle", "frame", "folder", "cloud", "artifact", "state", "card", "file",
+                    "storage", "stack", "hexagon", "person", "port", "portin", "portout", "circle",
+                    "label", "agent")
+
+_DECLARATION = re.compile(
+    r"^(?P<kind>" + "|".join(re.escape(k).replace(r"\ ", r"\s+")
+                             for k in CLASS_KEYWORDS + PARTICIPANT_KEYWORDS + ELEMENT_KEYWORDS) + r")"
+    r"\s+(?P<name>\"[^\"]+\"|[^\s{\"<:]+)(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+
+_ENDPOINT = r"(?:\"[^\"]+\"|\(\s*[^)]+\)|\[[^\]]+\]|:[^:]+:|[\w.$@]+)"
+_RELATION = re.compile(
+    r"^(?P<left>" + _ENDPOINT + r")\s*(?:\"[^\"]*\"\s*)?"
+    r"(?P<arrow>(?:<\|?|<<|\*|o|#|x|\}|\+|\^|/|\\\\?)?"
+    r"[-.=~]+(?:\[[^\]]*\])?(?:(?:left|right|up|down|le|ri|do)[-.=~]*)?[-.=~]*"
+    r"(?:\|?>>?|\*|o|#|x|\{|\+|\^|//?|\\\\?){0,2})"
+    r"\s*(?:\"[^\"]*\"\s*)?(?P<right>" + _ENDPOINT + r")(?:\s*[+-]{2}|\s*\*\*|\s*!!)?"
+    r"\s*(?::\s*(?P<label>.*))?$"
+)
+
+_QUOTED = re.compile(r'("[^"]*")')
+
+
+def semantic_source(text):
+    """
+    语义规范化：在 normalize_source 的基础上去掉单行注释（'）、块注释（/' '/）、空行、
+    行首行尾空白，并把引号之外的连续空白合并为一个空格
+
+    只有空白或注释不同的源码得到相同的结果。
+    """
+    lines = []
+    in_comment = False
+    for line in normalize_source(text).split('\n'):
+        stripped = line.strip()
+        if in_comment:
+            end = stripped.find("'/")
+            if end < 0:
+                continue
+            stripped = stripped[end + 2:].strip()
+            in_comment = False
+        while "/'" in stripped:
+            start = stripped.find("/'")
+            end = stripped.find("'/", start + 2)
+            if end < 0:
+                stripped = stripped[:start].rstrip()
+                in_comment = True
+                break
+            stripped = f"{stripped[:start]} {stripped[end + 2:]}".strip()
+        if not stripped or stripped.startswith("'"):
+            continue
+        parts = _QUOTED.split(stripped)
+        lines.append("".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)))
+    return '\n'.join(lines)
+
+
+def semantic_digest(text):
+    """
+    返回语义规范化后源码的SHA-256摘要
+    """
+    return hashlib.sha256(semantic_source(text).encode('utf-8')).hexdigest()
+
+
+def _unquote(name):
+    return name[1:-1] if len(name) >= 2 and name[0] == name[-1] == '"' else name
+
+
+def extract_structure(source, diagram_type=None) -> Dict[str, Dict[str, object]]:
+    """
+    从语义规范化后的源码中提取结构：类、参与者、其他元素和关系
+
+    只做逐行的正则匹配，不是完整的PlantUML解析器，用于给出廉价的结构差异。
+
+    Args:
+        source: semantic_source 的输出
+        diagram_type: 图表类型，sequence 时关系两端的名称也视为参与者
+
+    Returns:
+        dict: classes/participants/elements 为 名称 -> 声明与成员，
+              relations 为 (左端, 右端) -> 排序后的 箭头与标签 列表
+    """
+    structure: Dict[str, Dict[str, object]] = {"classes": {}, "participants": {}, "elements": {}, "relations": {}}
+    # 每个打开的 { 对应的成员列表；None 表示容器（内部仍是声明）
+    stack: List[Optional[List[str]]] = []
+    for line in source.split('\n'):
+        if stack and stack[-1] is not None:
+            if line.startswith("}"):
+                stack.pop()
+            else:
+                stack[-1].append(line)
+            continue
+        if line.startswith("}"):
+            if stack:
+                stack.pop()
+            continue
+        if line.startswith(("@", "!", "skinparam", "title", "hide", "show", "note", "end ")):
+            continue
+
+        declaration = _DECLARATION.match(line)
+        if declaration:
+            kind = re.sub(r"\s+", " ", declaration.group("kind").lower())
+            name = _unquote(declaration.group("name"))
+            rest = declaration.group("rest").strip()
+            opens = rest.endswith("{")
+            if kind in CLASS_KEYWORDS:
+                category = "classes"
+            elif kind in PARTICIPANT_KEYWORDS and (diagram_type == "sequence" or kind == "participant"):
+                category = "participants"
+            else:
+                category = "elements"
+            entry = {"kind": kind, "declaration": rest.rstrip("{").strip(), "members": []}
+            structure[category][name] = entry
+            if opens:
+                stack.append(entry["members"] if category == "classes" else None)
+            continue
+
+        relation = _RELATION.match(line)
+        if relation:
+            left, right = _unquote(relation.group("left")), _unquote(relation.group("right"))
+            label = (relation.group("label") or "").strip()
+            structure["relations"].setdefault((left, right), []).append(
+                f"{relation.group('arrow')} {label}".strip())
+            if diagram_type == "sequence":
+                for name in (left, right):
+                    structure["participants"].setdefault(name, {"kind": "participant", "declaration": "",
+                                                                "members": []})
+            continue
+
+        if line.endswith("{"):
+            stack.append(None)
+
+    for key in structure["relations"]:
+        structure["relations"][key] = sorted(structure["relations"][key])
+    return structure
+
+
+def structure_diff(before, after) -> Dict[str, Dict[str, list]]:
+    """
+    比较两个 extract_structure 的结果
+
+    Returns:
+        dict: classes/participants/elements/relations 各自的 added、removed、changed 列表；
+              关系用 "左端 -> 右端" 表示
+    """
+    diff = {}
+    for category in ("classes", "participants", "elements", "relations"):
+        old, new = before[category], after[category]
+        names = {key: (" -> ".join(key) if category == "relations" else key) for key in set(old) | set(new)}
+        diff[category] = {
+            "added": sorted(names[key] for key in new if key not in old),
+            "removed": sorted(names[key] for key in old if key not in new),
+            "changed": sorted(names[key] for key in new if key in old and new[key] != old[key]),
+        }
+    return diff
+
+
+def analyze_source(text, diagram_type=None) -> Tuple[str, Dict[str, Dict[str, object]]]:
+    """
+    对源码做一次语义规范化，返回语义摘要和结构
+
+    Returns:
+        tuple: (语义规范化后源码的SHA-256摘要, extract_structure 的结果)
+    """
+    source = semantic_source(text)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest(), extract_structure(source, diagram_type)
+
+
+class DiagramSession:
+    """
+    一个会话的最近一次成功渲染
+    """
+
+    __slots__ = ("digest", "structure", "result", "revision")
+
+    def __init__(self, digest, structure, result, revision):
+        self.digest = digest
+        self.structure = structure
+        self.result = result
+        self.revision = revision
+
+
+class SessionStore:
+    """
+    线程安全的会话表，按最近使用保留最多 max_sessions 个会话
+    """
+
+    def __init__(self, max_sessions=256):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, DiagramSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"unchanged": 0, "rendered": 0, "evictions": 0}
+
+    @staticmethod
+    def key_for(output_dir, name=None) -> Optional[str]:
+        """
+        会话键：输出目录的绝对路径加上文件名
+
+        Returns:
+            str: 会话键；未指定文件名时返回None，调用者无法区分同类型的不同图表，不建立会话
+        """
+        if not name:
+            return None
+        return os.path.join(os.path.abspath(output_dir), os.path.basename(name))
+
+    def get(self, key) -> Optional[DiagramSession]:
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+            return session
+
+    def reuse(self, key, digest, formats) -> Optional[Tuple[DiagramSession, List[dict]]]:
+        """
+        语义未变化且请求的格式都已渲染、输出文件仍然存在时，返回会话和对应格式的结果
+
+        Returns:
+            tuple: (会话, 按 formats 排列的上一版本结果)，不能复用时返回None
+        """
+        session = self.get(key)
+        if session is None or session.digest != digest:
+            return None
+        artifacts = {artifact["format"]: artifact for artifact in session.result["artifacts"]}
+        selected = [artifacts.get(fmt) for fmt in formats]
+        if any(artifact is None or not os.path.exists(artifact["local_path"]) for artifact in selected):
+            return None
+        with self._lock:
+            self._stats["unchanged"] += 1
+        return session, selected
+
+    def record(self, key, digest, structure, result) -> DiagramSession:
+        """
+        记录一次成功渲染，语义变化时版本号加一；语义未变化时保留上一版本中其他格式的结果
+        """
+        with self._lock:
+            previous = self._sessions.pop(key, None)
+            if previous is None:
+                revision = 1
+            elif previous.digest != digest:
+                revision = previous.revision + 1
+            else:
+                revision = previous.revision
+                rendered = {artifact["format"] for artifact in result["artifacts"]}
+                kept = [artifact for artifact in previous.result["artifacts"] if artifact["format"] not in rendered]
+                result = dict(result, artifacts=result["artifacts"] + kept)
+            session = DiagramSession(digest, structure, result, revision)
+            self._sessions[key] = session
+            self._stats["rendered"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats["evictions"] += 1
+            return session
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), **self._stats}
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 监视Markdown文件的变化
+
+Linux 上通过 ctypes 直接使用 inotify（不需要第三方库），等待事件时阻塞在 select 上，
+空闲时不占用CPU；其他平台或 inotify 不可用时退回到按间隔比较 mtime 和大小的轮询。
+watch() 在一次变化之后等待一段静默时间（防抖），把编辑器连续多次保存合并为一次回调。
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+from typing import Callable, Dict, Iterable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认防抖时间（秒）和轮询间隔（秒）
+DEBOUNCE = 0.15
+POLL_INTERVAL = 0.5
+
+# 被监视的文件扩展名
+EXTENSIONS = (".md", ".markdown")
+
+# inotify 事件（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT = struct.Struct("iIII")
+
+
+def _is_watched(path):
+    return path.lower().endswith(EXTENSIONS)
+
+
+class InotifyWatcher:
+    """
+    基于 inotify 的监视器；监视的是目录，编辑器以“写临时文件再重命名”方式保存时同样能收到事件
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        """
+        Args:
+            paths: 要监视的文件或目录；目录会递归监视，包括之后新建的子目录
+
+        Raises:
+            OSError: 当前平台不支持 inotify 或无法添加监视
+        """
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name or not hasattr(select, "select"):
+            raise OSError(errno.ENOSYS, "inotify 不可用")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify 不可用")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs: Dict[int, str] = {}
+        # 只监视单个文件时，目录 -> 文件名集合；递归监视的目录不在其中
+        self._files: Dict[str, Set[str]] = {}
+        try:
+            for path in paths:
+                path = os.path.abspath(path)
+                if os.path.isdir(path):
+                    self._watch_tree(path)
+                else:
+                    directory = os.path.dirname(path)
+                    self._add(directory)
+                    self._files.setdefault(directory, set()).add(os.path.basename(path))
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"无法监视目录 {directory}")
+        self._dirs[wd] = directory
+
+    def _watch_tree(self, root, changes=None):
+        for directory, subdirs, files in os.walk(root):
+            subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+            self._add(directory)
+            if changes is not None:
+                # 新建目录中已有的文件也算作变化（例如整个目录被移动进来）
+                changes.update(os.path.join(directory, name) for name in files if _is_watched(name))
+
+    def fileno(self):
+        return self._fd
+
+    def wait(self, timeout=None) -> Set[str]:
+        """
+        等待变化
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            set: 发生变化的文件的绝对路径；超时返回空集合。事件队列溢出时返回被监视的所有目录
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if not readable:
+                return set()
+            changes = self._read()
+            if changes:
+                return changes
+
+    def _read(self) -> Set[str]:
+        changes: Set[str] = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify 事件队列溢出，视为所有文件都已变化")
+                changes.update(self._dirs.values())
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            name = os.fsdecode(name)
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and directory not in self._files and not name.startswith("."):
+                    try:
+                        self._watch_tree(path, changes)
+                    except OSError as e:
+                        logger.warning("无法监视新目录 %s: %s", path, e)
+                continue
+            watched = self._files.get(directory)
+            if (name in watched) if watched is not None else _is_watched(name):
+                changes.add(path)
+        return changes
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """
+    轮询监视器：每隔 interval 秒比较一次被监视文件的 mtime 和大小
+    """
+
+    def __init__(self, paths: Iterable[str], interval=POLL_INTERVAL):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.paths:
+            if os.path.isdir(path):
+                for directory, subdirs, files in os.walk(path):
+                    subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+                    for name in files:
+                        if _is_watched(name):
+                            self._stat(os.path.join(directory, name), snapshot)
+            else:
+                self._stat(path, snapshot)
+        return snapshot
+
+    @staticmethod
+    def _stat(path, snapshot):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        snapshot[path] = (st.st_mtime_ns, st.st_size)
+
+    def wait(self, timeout=None) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return set()
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+            snapshot = self._scan()
+            changes = {path for path in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            if changes:
+                return changes
+
+    def close(self):
+        pass
+
+
+def create_watcher(paths, polling=False, interval=POLL_INTERVAL):
+    """
+    优先使用 inotify，不可用时退回到轮询
+
+    Args:
+        paths: 要监视的文件或目录
+        polling: True 时直接使用轮询
+        interval: 轮询间隔（秒）
+    """
+    paths = list(paths)
+    if not polling:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:
+            logger.info("inotify 不可用（%s），改为每 %.1f 秒轮询一次", e, interval)
+    return PollingWatcher(paths, interval)
+
+
+def watch(watcher, callback: Callable[[Set[str]], None], debounce=DEBOUNCE, stop=None, idle_timeout=1.0):
+    """
+    等待变化并调用 callback；一次变化之后的 debounce 秒内没有新的变化才回调，
+    期间的所有变化合并为一次
+
+    Args:
+        watcher: create_watcher 返回的监视器
+        callback: 以变化文件的路径集合为参数
+        debounce: 防抖时间（秒）
+        stop: threading.Event，设置后在 idle_timeout 秒内退出；None 表示一直运行
+        idle_timeout: 检查 stop 的间隔（秒）
+    """
+    while stop is None or not stop.is_set():
+        changes = watcher.wait(None if stop is None else idle_timeout)
+        if not changes:
+            continue
+        while True:
+            more = watcher.wait(debounce)
+            if not more:
+                break
+            changes |= more
+        callback(changes)
+
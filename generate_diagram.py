@@ -6,153 +6,107 @@ Date: 2025-05-05
 """
 
 import os
-import re
 import sys
-import zlib
-import base64
-import requests
 import argparse
 import datetime
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from diagram_gallery import FAILED, Gallery, thumbnail_source
+from file_watcher import DEBOUNCE, create_watcher, watch
+from markdown_diagrams import find_diagram, iter_diagram_blocks
+from mermaid_compiler import compile_mermaid
+from plantuml_client import PlantUMLServerError, fetch_to_file
+from plantuml_codec import plantuml_encode
+
+# Serveur PlantUML utilisé pour le rendu
+PLANTUML_SERVER = os.environ.get("PLANTUML_SERVER", "http://www.plantuml.com/plantuml").rstrip("/")
+
+# Mode répertoire: nom du manifeste et extensions des fichiers Markdown
+MANIFEST_NAME = ".diagram_manifest.json"
+MANIFEST_VERSION = 2
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+
+# Types de diagramme -> premier mot du bloc Mermaid
+MERMAID_KINDS = {
+    "sequence": ("sequenceDiagram",),
+    "flowchart": ("flowchart", "graph"),
+    "class": ("classDiagram",),
+}
+
+def extract_diagrams(markdown_file, diagram_type=None):
+    """
+    Extrait tous les blocs Mermaid du type spécifié (tous les types si None) en une seule passe
+    """
+    kinds = MERMAID_KINDS.get(diagram_type)
+    return [block for block in iter_diagram_blocks(markdown_file)
+            if block.language == "mermaid" and (kinds is None or block.kind in kinds)]
+
 def extract_diagram(markdown_file, diagram_type="sequence"):
     """
-    Extrait un diagramme de type spécifié depuis un fichier Markdown
+    Extrait le premier diagramme de type spécifié depuis un fichier Markdown
     """
-    with open(markdown_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Définir le pattern en fonction du type de diagramme
-    if diagram_type == "sequence":
-        pattern = r'```mermaid\nsequenceDiagram.*?```'
-    elif diagram_type == "flowchart":
-        pattern = r'```mermaid\nflowchart.*?```'
-    elif diagram_type == "class":
-        pattern = r'```mermaid\nclassDiagram.*?```'
-    else:
-        pattern = r'```mermaid\n.*?```'
-    
-    match = re.search(pattern, content, re.DOTALL)
-    
-    if match:
-        # Extraire juste le contenu du diagramme, sans les délimiteurs ```mermaid et ```
-        diagram = match.group(0)[10:-3].strip()
-        return diagram
-    else:
-        return None
+    block = find_diagram(markdown_file, "mermaid", MERMAID_KINDS.get(diagram_type))
+    return block.content.strip() if block else None
 
-def convert_mermaid_to_plantuml(mermaid_code, diagram_type="sequence"):
+def convert_mermaid_to_plantuml(mermaid_code, diagram_type="sequence", digest=None, source="mermaid", line_offset=0):
     """
-    Convertit le code Mermaid en PlantUML selon le type de diagramme
+    Convertit le code Mermaid en PlantUML (séquence, flowchart et classe) et affiche les diagnostics
+
+    Le type est lu dans la déclaration du diagramme (sequenceDiagram, flowchart, classDiagram);
+    diagram_type ne sert que si elle est absente. Les résultats sont mis en cache par hash du bloc.
+
+    Args:
+        mermaid_code: code Mermaid
+        diagram_type: type utilisé si le code n'a pas de déclaration
+        digest: hash du bloc (DiagramBlock.digest), calculé si None
+        source: nom affiché dans les diagnostics
+        line_offset: numéro de la ligne qui précède le code dans le fichier source
     """
-    if diagram_type == "sequence":
-        return convert_sequence_diagram(mermaid_code)
-    elif diagram_type == "flowchart":
-        return convert_flowchart_diagram(mermaid_code)
-    elif diagram_type == "class":
-        return convert_class_diagram(mermaid_code)
-    else:
+    result = compile_mermaid(mermaid_code, diagram_type, digest)
+    print_diagnostics(result.diagnostics, source, line_offset)
+    if result.plantuml is None:
         # Pour les autres types, conversion basique
-        return "@startuml\n" + mermaid_code + "\n@enduml"
+        return "@startuml\n" + mermaid_code.strip() + "\n@enduml"
+    return result.plantuml
+
+def print_diagnostics(diagnostics, source="mermaid", line_offset=0):
+    """
+    Affiche les diagnostics de conversion au format fichier:ligne:colonne
+    """
+    for item in diagnostics:
+        severity = "erreur" if item["severity"] == "error" else "avertissement"
+        print(f"{source}:{item['line'] + line_offset}:{item['column']}: {severity}: {item['message']}")
 
 def convert_sequence_diagram(mermaid_code):
     """
     Convertit un diagramme de séquence Mermaid en PlantUML
     """
-    plantuml_code = "@startuml\ntitle Diagramme de séquence\n\n"
-    
-    lines = mermaid_code.strip().split('\n')
-    
-    for line in lines:
-        # Ignorer la ligne sequenceDiagram
-        if line.strip() == "sequenceDiagram":
-            continue
-        # Conserver autonumber
-        elif line.strip() == "autonumber":
-            plantuml_code += "autonumber\n"
-        # Traiter les définitions de participants
-        elif "participant" in line:
-            plantuml_code += line + "\n"
-        # Traiter les flèches de séquence
-        elif "->" in line or "->>" in line:
-            plantuml_code += line.replace("->>", "->") + "\n"
-        # Traiter les notes
-        elif "Note over" in line:
-            plantuml_code += line + "\n"
-        # Ajouter les autres lignes qui ne nécessitent pas de conversion
-        elif line.strip():
-            plantuml_code += line + "\n"
-    
-    plantuml_code += "@enduml"
-    return plantuml_code
+    return convert_mermaid_to_plantuml(mermaid_code, "sequence")
 
 def convert_flowchart_diagram(mermaid_code):
     """
     Convertit un diagramme flowchart Mermaid en PlantUML
     """
-    plantuml_code = "@startuml\n"
-    
-    # Transformation basique - à améliorer pour une meilleure conversion
-    plantuml_code += "title Diagramme de flux\n\n"
-    plantuml_code += "' Converti depuis Mermaid flowchart\n"
-    plantuml_code += "' Note: La conversion directe peut nécessiter des ajustements manuels\n\n"
-    
-    lines = mermaid_code.strip().split('\n')
-    for line in lines:
-        if "flowchart" in line or "graph" in line:
-            if "TB" in line:
-                plantuml_code += "top to bottom direction\n"
-            elif "LR" in line:
-                plantuml_code += "left to right direction\n"
-        elif "-->" in line:
-            plantuml_code += line.replace("-->", "->") + "\n"
-        elif "subgraph" in line:
-            package_name = line.split("subgraph")[1].strip()
-            plantuml_code += f"package {package_name} {{\n"
-        elif "end" == line.strip():
-            plantuml_code += "}\n"
-        elif line.strip():
-            plantuml_code += line + "\n"
-    
-    plantuml_code += "@enduml"
-    return plantuml_code
+    return convert_mermaid_to_plantuml(mermaid_code, "flowchart")
 
 def convert_class_diagram(mermaid_code):
     """
     Convertit un diagramme de classe Mermaid en PlantUML
     """
-    plantuml_code = "@startuml\ntitle Diagramme de classe\n\n"
-    
-    lines = mermaid_code.strip().split('\n')
-    for line in lines:
-        if "classDiagram" in line:
-            continue
-        elif "class" in line and "{" in line:
-            plantuml_code += line.replace("{", " {") + "\n"
-        elif "-->" in line:
-            plantuml_code += line.replace("-->", "-->") + "\n"
-        elif line.strip():
-            plantuml_code += line + "\n"
-    
-    plantuml_code += "@enduml"
-    return plantuml_code
-
-def plantuml_encode(text):
-    """
-    Encode le texte PlantUML pour l'URL avec correction pour éviter le problème HUFFMAN
-    """
-    compressed = zlib.compress(text.encode('utf-8'))
-    return base64.b64encode(compressed).decode('ascii')
+    return convert_mermaid_to_plantuml(mermaid_code, "class")
 
 def generate_uml_image(uml_code, output_dir="output", base_name="diagram"):
     """
     Génère une image UML à partir du code PlantUML
     """
-    # Encoder le code
+    # Encoder le code (Deflate brut et alphabet PlantUML, donc sans préfixe ~1)
     encoded = plantuml_encode(uml_code)
     
-    # Construire l'URL (avec ~1 pour corriger l'encodage HUFFMAN)
-    url = f"http://www.plantuml.com/plantuml/png/~1{encoded}"
+    # Construire l'URL
+    url = f"{PLANTUML_SERVER}/png/{encoded}"
     
     # Créer le répertoire de sortie si nécessaire
     os.makedirs(output_dir, exist_ok=True)
@@ -163,26 +117,21 @@ def generate_uml_image(uml_code, output_dir="output", base_name="diagram"):
     file_path = os.path.join(output_dir, filename)
     
     try:
-        # Récupérer l'image
-        response = requests.get(url)
+        # Récupérer l'image et la sauvegarder localement (statut, Content-Type et taille vérifiés)
+        fetch_to_file(url, file_path, timeout=60)
         
-        if response.status_code == 200:
-            # Sauvegarder l'image localement
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            
-            print(f"Diagramme UML généré avec succès!")
-            print(f"URL du diagramme: {url}")
-            print(f"Chemin local: {os.path.abspath(file_path)}")
-            
-            return {
-                "code": uml_code,
-                "url": url,
-                "local_path": os.path.abspath(file_path)
-            }
-        else:
-            print(f"Erreur lors de la génération du diagramme: {response.status_code}")
-            return None
+        print(f"Diagramme UML généré avec succès!")
+        print(f"URL du diagramme: {url}")
+        print(f"Chemin local: {os.path.abspath(file_path)}")
+        
+        return {
+            "code": uml_code,
+            "url": url,
+            "local_path": os.path.abspath(file_path)
+        }
+    except PlantUMLServerError as e:
+        print(f"Erreur lors de la génération du diagramme: {e.status_code}")
+        return None
     except Exception as e:
         print(f"Erreur lors de la génération du diagramme: {str(e)}")
         # En cas d'erreur avec PlantUML, suggérer l'utilisation de Mermaid
@@ -386,15 +335,330 @@ def create_html_viewer(diagram_path, mermaid_code, base_name="diagram"):
     print(f"Visualiseur HTML créé: {os.path.abspath(html_path)}")
     return html_path
 
+def block_to_plantuml(block, source="mermaid"):
+    """
+    Convertit un bloc extrait (Mermaid ou PlantUML) en code PlantUML; les diagnostics
+    sont affichés avec les numéros de ligne du fichier source
+    """
+    if block.language == "plantuml":
+        code = block.content.strip()
+        return code if code.startswith("@start") else f"@startuml\n{code}\n@enduml"
+    return convert_mermaid_to_plantuml(block.content, None, block.digest, source, block.start_line)
+
+def find_markdown_files(root, exclude=None):
+    """
+    Parcourt l'arborescence et retourne les fichiers Markdown triés (chemins relatifs à root),
+    en ignorant les répertoires cachés et le répertoire exclude
+    """
+    exclude = os.path.abspath(exclude) if exclude else None
+    found = []
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs
+                            if not d.startswith(".") and os.path.abspath(os.path.join(directory, d)) != exclude)
+        for name in sorted(files):
+            if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(directory, name), root))
+    return found
+
+def render_to_path(job):
+    """
+    Rend un diagramme vers un chemin fixe (écriture atomique); exécuté dans un processus du pool, ou directement pour un seul rendu
+
+    Le format (png ou svg) est déduit de l'extension du chemin de sortie. Une réponse d'erreur du
+    serveur (statut, Content-Type ou en-tête de fichier inattendus) n'est jamais écrite à la place de l'image.
+
+    Returns:
+        tuple: (chemin de sortie, message d'erreur ou None)
+    """
+    plantuml_code, file_path = job
+    fmt = "svg" if file_path.endswith(".svg") else "png"
+    url = f"{PLANTUML_SERVER}/{fmt}/{plantuml_encode(plantuml_code)}"
+    try:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        fetch_to_file(url, file_path, timeout=60, fmt=fmt)
+        return file_path, None
+    except PlantUMLServerError as e:
+        return file_path, f"HTTP {e.status_code}"
+    except Exception as e:
+        return file_path, str(e)
+
+def load_manifest(manifest_path):
+    """
+    Charge le manifeste du dernier build; un manifeste absent, illisible ou d'une autre version est ignoré
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def save_manifest(manifest_path, manifest):
+    """
+    Écrit le manifeste de façon atomique
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def _prune(output_dir, paths):
+    """
+    Supprime les images qui ne correspondent plus à aucun bloc, puis les répertoires devenus vides
+    """
+    pruned = 0
+    for path in sorted(paths):
+        try:
+            os.remove(path)
+            pruned += 1
+        except FileNotFoundError:
+            continue
+        directory = os.path.dirname(path)
+        while os.path.abspath(directory) != os.path.abspath(output_dir):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+    return pruned
+
+def _block_artifacts(block):
+    """
+    Images d'un bloc du manifeste: image, miniature et, si demandé, SVG
+    """
+    return [path for path in (block["output"], block["thumbnail"], block.get("svg")) if path]
+
+def build_tree(source_dir, output_dir="output", jobs=None, manifest_path=None, svg=False):
+    """
+    Mode répertoire: extrait tous les diagrammes d'une arborescence Markdown et ne rend que
+    les blocs dont le contenu a changé depuis le dernier build
+
+    Chaque image est nommée d'après le hash du contenu de son bloc
+    (output_dir/<chemin relatif>/<nom>_<hash>.png, plus <nom>_<hash>_thumb.png pour la miniature).
+    Les fichiers dont la date de modification et la taille n'ont pas changé ne sont pas relus,
+    les rendus sont répartis sur un pool de processus, et les images des blocs supprimés ou
+    modifiés sont effacées. La galerie output_dir/index.html est réécrite au fur et à mesure
+    des rendus.
+
+    Args:
+        source_dir: racine de la documentation
+        output_dir: répertoire des images
+        jobs: nombre de processus de rendu (par défaut le nombre de CPU)
+        manifest_path: chemin du manifeste (par défaut output_dir/.diagram_manifest.json)
+        svg: rendre aussi chaque diagramme en SVG (intégré directement dans la galerie s'il est petit)
+
+    Returns:
+        dict: nombre de fichiers, fichiers relus, blocs, images rendues, réutilisées, supprimées et échecs
+    """
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)["files"]
+    files = {}
+    pending = {}
+    stats = {"files": 0, "scanned": 0, "blocks": 0, "rendered": 0, "reused": 0, "pruned": 0, "failed": 0}
+
+    for rel_path in find_markdown_files(source_dir, exclude=output_dir):
+        stats["files"] += 1
+        path = os.path.join(source_dir, rel_path)
+        st = os.stat(path)
+        entry = previous.get(rel_path)
+        if (entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size
+                and all(("svg" in block) == svg for block in entry["blocks"])
+                and all(os.path.exists(os.path.join(output_dir, artifact))
+                        for block in entry["blocks"] for artifact in _block_artifacts(block))):
+            files[rel_path] = entry
+            stats["blocks"] += len(entry["blocks"])
+            stats["reused"] += sum(len(_block_artifacts(block)) for block in entry["blocks"])
+            continue
+
+        stats["scanned"] += 1
+        stem = os.path.splitext(rel_path)[0]
+        blocks = []
+        for block in iter_diagram_blocks(path):
+            # Chemin relatif à output_dir, pour que le manifeste reste valable si le répertoire est déplacé
+            image = f"{stem}_{block.digest[:12]}"
+            record = {"language": block.language, "kind": block.kind, "start_line": block.start_line,
+                      "end_line": block.end_line, "digest": block.digest, "output": f"{image}.png",
+                      "thumbnail": f"{image}_thumb.png"}
+            if svg:
+                record["svg"] = f"{image}.svg"
+            blocks.append(record)
+            code = None
+            for artifact in _block_artifacts(record):
+                output = os.path.join(output_dir, artifact)
+                if output in pending:
+                    continue
+                if os.path.exists(output):
+                    stats["reused"] += 1
+                    continue
+                code = code or block_to_plantuml(block, path)
+                pending[output] = thumbnail_source(code) if artifact == record["thumbnail"] else code
+        stats["blocks"] += len(blocks)
+        files[rel_path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "blocks": blocks}
+
+    gallery = Gallery(output_dir, f"Diagrammes de {os.path.basename(os.path.abspath(source_dir))}")
+    for rel_path, entry in files.items():
+        for block in entry["blocks"]:
+            gallery.add(f"{rel_path}:{block['start_line']}", rel_path, block["start_line"], block["kind"],
+                        block["output"], block["thumbnail"], block.get("svg"))
+    gallery.flush(force=True)
+
+    if pending:
+        workers = min(jobs or os.cpu_count() or 1, len(pending))
+        jobs_list = [(code, output) for output, code in pending.items()]
+        if workers == 1:
+            # Un seul rendu (cas typique du mode --watch): pas besoin de démarrer un pool de processus
+            results = map(render_to_path, jobs_list)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(render_to_path, jobs_list, chunksize=max(1, len(jobs_list) // (workers * 4)))
+        try:
+            for output, error in results:
+                if error:
+                    stats["failed"] += 1
+                    print(f"Erreur lors du rendu de {output}: {error}")
+                else:
+                    stats["rendered"] += 1
+                # La galerie est réécrite au fur et à mesure (au plus toutes les FLUSH_INTERVAL secondes)
+                gallery.rendered(os.path.relpath(output, output_dir), error)
+                gallery.flush()
+        finally:
+            if workers > 1:
+                pool.shutdown()
+
+    gallery.flush(force=True)
+
+    # Les images qui ne sont plus référencées par aucun bloc sont supprimées
+    kept = {path for entry in files.values() for block in entry["blocks"] for path in _block_artifacts(block)}
+    stale = {path for entry in previous.values() for block in entry["blocks"] for path in _block_artifacts(block)} - kept
+    stats["pruned"] = _prune(output_dir, [os.path.join(output_dir, image) for image in stale])
+
+    save_manifest(manifest_path, {"version": MANIFEST_VERSION, "source": os.path.abspath(source_dir),
+                                  "files": files})
+    print(f"{stats['files']} fichier(s), {stats['blocks']} diagramme(s): {stats['rendered']} image(s) rendue(s), "
+          f"{stats['reused']} réutilisée(s), {stats['pruned']} supprimée(s), {stats['failed']} échec(s)")
+    print(f"Galerie HTML: {os.path.abspath(gallery.path)}")
+    return stats
+
+def render_diagrams(args, rendered=None):
+    """
+    Extrait et rend les diagrammes du fichier args.source, avec leurs miniatures, puis écrit
+    la galerie output/<nom>_gallery.html
+
+    Args:
+        args: arguments de la ligne de commande
+        rendered: nom de base -> dernier rendu (hash du bloc, image, miniature); les blocs dont
+                  le hash n'a pas changé ne sont pas rendus à nouveau, et la galerie n'est réécrite
+                  que si elle change (mode --watch)
+
+    Returns:
+        int: nombre d'échecs, ou None si aucun diagramme n'a été trouvé
+    """
+    # Extraire le ou les diagrammes
+    if args.all:
+        blocks = extract_diagrams(args.source, args.type)
+        diagrams = [(block, f"{args.name}_{i}") for i, block in enumerate(blocks, 1)]
+    else:
+        block = find_diagram(args.source, "mermaid", MERMAID_KINDS.get(args.type))
+        diagrams = [(block, args.name)] if block else []
+    
+    if not diagrams:
+        print(f"Aucun diagramme de type {args.type} trouvé dans {args.source}")
+        return None
+    
+    if rendered is None:
+        print(f"{len(diagrams)} diagramme(s) {args.type} extrait(s) avec succès!")
+        rendered = {}
+    
+    gallery = Gallery(args.output, f"Diagrammes de {os.path.basename(args.source)}", f"{args.name}_gallery.html")
+    failed = 0
+    for block, base_name in diagrams:
+        previous = rendered.get(base_name)
+        if previous is None or previous["digest"] != block.digest:
+            # Convertir en PlantUML
+            plantuml_code = block_to_plantuml(block, args.source)
+            
+            # Générer l'image et sa miniature
+            result = generate_uml_image(plantuml_code, args.output, base_name)
+            if not result:
+                failed += 1
+                rendered.pop(base_name, None)
+                gallery.add(base_name, args.source, block.start_line, block.kind, None, state=FAILED)
+                continue
+            image = result["local_path"]
+            thumbnail, error = render_to_path((thumbnail_source(plantuml_code), f"{os.path.splitext(image)[0]}_thumb.png"))
+            if error:
+                print(f"Erreur lors du rendu de la miniature {thumbnail}: {error}")
+                thumbnail = None
+            
+            if args.viewer:
+                # Visualiseur HTML individuel (ancien format)
+                create_html_viewer(image, block.content.strip(), base_name)
+            previous = rendered[base_name] = {"digest": block.digest, "image": image, "thumbnail": thumbnail}
+        
+        gallery.add(base_name, args.source, block.start_line, block.kind,
+                    os.path.relpath(previous["image"], args.output),
+                    os.path.relpath(previous["thumbnail"], args.output) if previous["thumbnail"] else None)
+    
+    if gallery.write():
+        print(f"Galerie HTML créée: {os.path.abspath(gallery.path)}")
+    return failed
+
+def watch_source(args, stop=None):
+    """
+    Mode --watch: surveille le fichier ou le répertoire source (inotify, ou scrutation
+    périodique si inotify n'est pas disponible) et, après chaque rafale d'enregistrements,
+    ne rend que les blocs dont le contenu a changé
+
+    Args:
+        args: arguments de la ligne de commande
+        stop: threading.Event pour arrêter la surveillance; None pour surveiller jusqu'à Ctrl+C
+    """
+    directory_mode = os.path.isdir(args.source)
+    rendered = {}
+    
+    def rebuild(changes=None):
+        started = time.perf_counter()
+        if directory_mode:
+            build_tree(args.source, args.output, args.jobs, args.manifest, args.svg)
+        elif os.path.exists(args.source):
+            render_diagrams(args, rendered)
+        else:
+            print(f"{args.source} a été supprimé, en attente de sa recréation")
+            return
+        if changes:
+            print(f"Mise à jour en {time.perf_counter() - started:.2f} s ({len(changes)} fichier(s) modifié(s))")
+    
+    rebuild()
+    watcher = create_watcher([args.source], polling=args.poll)
+    print(f"Surveillance de {args.source} ({type(watcher).__name__}), Ctrl+C pour arrêter")
+    try:
+        watch(watcher, rebuild, debounce=args.debounce / 1000, stop=stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
 def main():
     """
     Fonction principale
     """
     parser = argparse.ArgumentParser(description='Générateur de diagrammes UML depuis des fichiers Markdown')
-    parser.add_argument('--source', '-s', required=True, help='Chemin du fichier Markdown source')
+    parser.add_argument('--source', '-s', required=True, help='Chemin du fichier Markdown source, ou d\'un répertoire de documentation (mode répertoire incrémental)')
     parser.add_argument('--type', '-t', default='sequence', choices=['sequence', 'flowchart', 'class'], help='Type de diagramme à extraire')
     parser.add_argument('--output', '-o', default='output', help='Dossier de sortie')
     parser.add_argument('--name', '-n', default='diagram', help='Nom de base du fichier de sortie')
+    parser.add_argument('--all', '-a', action='store_true', help='Générer tous les diagrammes du type demandé, pas seulement le premier')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Mode répertoire: nombre de processus de rendu (par défaut le nombre de CPU)')
+    parser.add_argument('--svg', action='store_true', help='Mode répertoire: rendre aussi chaque diagramme en SVG (intégré à la galerie)')
+    parser.add_argument('--viewer', action='store_true', help='Créer aussi un visualiseur HTML par diagramme (en plus de la galerie)')
+    parser.add_argument('--watch', '-w', action='store_true', help='Surveiller la source et ne rendre que les diagrammes modifiés à chaque enregistrement')
+    parser.add_argument('--debounce', type=int, default=int(DEBOUNCE * 1000), help='Mode --watch: délai de regroupement des enregistrements (ms)')
+    parser.add_argument('--poll', action='store_true', help='Mode --watch: scruter les fichiers au lieu d\'utiliser inotify')
+    parser.add_argument('--manifest', default=None, help=f'Mode répertoire: chemin du manifeste (par défaut <output>/{MANIFEST_NAME})')
     
     args = parser.parse_args()
     
@@ -403,24 +667,20 @@ def main():
         print(f"Erreur: Le fichier {args.source} n'existe pas.")
         return 1
     
-    # Extraire le diagramme
-    mermaid_diagram = extract_diagram(args.source, args.type)
-    
-    if not mermaid_diagram:
-        print(f"Aucun diagramme de type {args.type} trouvé dans {args.source}")
-        return 1
-    
-    print(f"Diagramme {args.type} extrait avec succès!")
+    # Mode --watch: rendu initial puis nouveau rendu des seuls blocs modifiés à chaque enregistrement
+    if args.watch:
+        return watch_source(args)
     
-    # Convertir en PlantUML
-    plantuml_code = convert_mermaid_to_plantuml(mermaid_diagram, args.type)
+    # Mode répertoire: tous les diagrammes de l'arborescence, rendu incrémental
+    if os.path.isdir(args.source):
+        stats = build_tree(args.source, args.output, args.jobs, args.manifest, args.svg)
+        return 1 if stats["failed"] else 0
     
-    # Générer l'image
-    result = generate_uml_image(plantuml_code, args.output, args.name)
+    failed = render_diagrams(args)
+    if failed is None:
+        return 1
     
-    if result:
-        # Créer le visualiseur HTML
-        create_html_viewer(result["local_path"], mermaid_diagram, args.name)
+    if not failed:
         print("\nTraitement terminé avec succès!\n")
         return 0
     
@@ -8,26 +8,16 @@ import requests
 import zlib
 import base64
 import json
-import re
 import datetime
 
+from markdown_diagrams import find_diagram
+
 def extract_mermaid_sequence_diagram(markdown_file):
     """
-    Extrait le diagramme de séquence Mermaid du fichier Markdown
+    Extrait le premier diagramme de séquence Mermaid du fichier Markdown
     """
-    with open(markdown_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Recherche du bloc de diagramme de séquence
-    sequence_pattern = r'```mermaid\nsequenceDiagram.*?```'
-    match = re.search(sequence_pattern, content, re.DOTALL)
-    
-    if match:
-        # Extraire juste le contenu du diagramme, sans les délimiteurs ```mermaid et ```
-        diagram = match.group(0)[10:-3].strip()
-        return diagram
-    else:
-        return None
+    block = find_diagram(markdown_file, "mermaid", ("sequenceDiagram",))
+    return block.content.strip() if block else None
 
 def convert_mermaid_to_plantuml(mermaid_code):
     """
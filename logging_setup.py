@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 异步日志
+
+日志记录通过 QueueHandler 放入内存队列，由 QueueListener 的后台线程格式化并写入
+按大小轮转的日志文件和控制台，调用方只承担一次入队的开销。
+日志参数使用 % 风格延迟格式化；PlantUML源码通过 SourcePreview 包装，
+只有真正输出时才截断并转换为字符串。
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# 日志中PlantUML源码的最大字符数
+LOG_SOURCE_MAX_CHARS = int(os.environ.get("UML_LOG_SOURCE_MAX_CHARS", "2000"))
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class SourcePreview:
+    """
+    日志中的PlantUML源码预览，在格式化时才截断到 max_chars 个字符
+    """
+
+    __slots__ = ("code", "max_chars")
+
+    def __init__(self, code, max_chars=None):
+        self.code = code
+        self.max_chars = LOG_SOURCE_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self):
+        if len(self.code) <= self.max_chars:
+            return self.code
+        omitted = len(self.code) - self.max_chars
+        return f"{self.code[:self.max_chars]}\n... (省略 {omitted} 个字符，共 {len(self.code)} 个字符)"
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    不在调用线程中格式化日志的 QueueHandler
+
+    标准 QueueHandler 会在入队前格式化消息；这里直接把日志记录交给监听线程，
+    由监听线程上的处理器完成格式化和写入。
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def create_handlers(log_dir, max_bytes, backup_count, console=True, level=logging.INFO):
+    """
+    创建按大小轮转的文件处理器和可选的控制台处理器
+
+    Args:
+        log_dir: 日志目录
+        max_bytes: 单个日志文件的最大字节数，超过后轮转
+        backup_count: 保留的历史日志文件数
+        console: 是否同时输出到标准错误
+        level: 处理器的日志级别
+
+    Returns:
+        list: 日志处理器
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    # 日志文件在第一条日志写入时才打开
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "uml_mcp_server.log"), maxBytes=max_bytes,
+        backupCount=backup_count, encoding='utf-8', delay=True)
+    handlers = [file_handler]
+    if console:
+        handlers.append(logging.StreamHandler(sys.stderr))
+
+    for handler in handlers:
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def start_queued_logging(handlers, logger=None, level=logging.INFO):
+    """
+    把 logger 的输出改为经由队列交给后台线程处理
+
+    Args:
+        handlers: 实际写日志的处理器
+        logger: 要配置的日志记录器，默认为根日志记录器
+        level: 日志记录器的级别
+
+    Returns:
+        QueueListener: 已启动的监听器，进程退出时自动停止并写完队列中的日志
+    """
+    logger = logger or logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    logger.setLevel(level)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 从Markdown文件中提取图表代码块
+
+逐个围栏行（``` 或 ~~~）做一次线性扫描，返回所有 mermaid/plantuml 代码块及其类型、
+行号范围和内容摘要。较大的文件通过 mmap 读取，不会整体读入内存。
+
+围栏规则遵循CommonMark：开始围栏最多缩进3个空格，由至少3个相同的 ` 或 ~ 组成；
+结束围栏使用相同字符、长度不小于开始围栏，其后只能有空白。其他语言的代码块
+（例如 ````markdown 中示例的 ```mermaid）同样被跟踪，其中的内容不会被当作图表。
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 超过此大小（字节）的文件通过 mmap 读取
+MMAP_THRESHOLD = 1024 * 1024
+
+# 代码块信息字符串的第一个词 -> 图表语言
+LANGUAGES = {
+    "mermaid": "mermaid",
+    "plantuml": "plantuml",
+    "puml": "plantuml",
+}
+
+# 围栏字符，每种至少连续3个
+FENCE_CHARS = (b"`", b"~")
+
+
+class DiagramBlock:
+    """
+    Markdown中的一个图表代码块
+    """
+
+    __slots__ = ("language", "kind", "start_line", "end_line", "content", "digest")
+
+    def __init__(self, language, kind, start_line, end_line, content, digest):
+        self.language = language
+        self.kind = kind
+        self.start_line = start_line
+        self.end_line = end_line
+        self.content = content
+        self.digest = digest
+
+    def __repr__(self):
+        return (f"DiagramBlock({self.language}:{self.kind}, lines {self.start_line}-{self.end_line}, "
+                f"{self.digest[:12]})")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def diagram_kind(language, content) -> str:
+    """
+    图表的具体类型：mermaid 取第一个非空行的第一个词（例如 sequenceDiagram、flowchart），
+    plantuml 取 @startXXX 的后缀（默认 uml）
+    """
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith("%%"):
+            continue
+        if language == "plantuml":
+            return line[len("@start"):].split()[0] if line.startswith("@start") and len(line) > 6 else "uml"
+        return line.split()[0].rstrip(":;")
+    return "uml" if language == "plantuml" else ""
+
+
+def scan_blocks(data, path="<string>") -> Iterator[DiagramBlock]:
+    """
+    扫描Markdown内容，依次返回所有图表代码块
+
+    Args:
+        data: UTF-8编码的Markdown内容，可以是 bytes、bytearray 或 mmap
+        path: 用于日志的文件名
+
+    Returns:
+        Iterator[DiagramBlock]: 按出现顺序排列的图表代码块
+    """
+    line, pos = 1, 0
+    opened = None  # (围栏字符, 围栏长度, 语言, 开始行号, 内容起始偏移)
+    for start, end, fence, info in _fence_lines(data):
+        line += data[pos:start].count(b"\n")
+        pos = start
+        if opened is None:
+            if fence[:1] == b"`" and b"`" in info:
+                # 信息字符串中含有反引号的不是围栏（CommonMark）
+                continue
+            word = info.split(None, 1)[0].decode("utf-8", "replace").lower() if info else ""
+            opened = (fence[:1], len(fence), LANGUAGES.get(word), line, end + 1)
+        elif fence[:1] == opened[0] and len(fence) >= opened[1] and not info:
+            _, _, language, start_line, content_start = opened
+            opened = None
+            if language is None:
+                continue
+            content = data[content_start:max(content_start, start)].decode("utf-8", "replace")
+            content = content.replace("\r\n", "\n")[:-1]
+            yield DiagramBlock(language, diagram_kind(language, content), start_line, line, content,
+                               hashlib.sha256(content.encode("utf-8")).hexdigest())
+    if opened is not None and opened[2] is not None:
+        logger.warning("%s 第%s行的 %s 代码块没有结束围栏，已忽略", path, opened[3], opened[2])
+
+
+def _fence_lines(data):
+    """
+    依次返回可能是围栏的行: (行首偏移, 行尾偏移, 围栏, 去掉首尾空白的信息字符串)
+
+    用 find 查找 ``` 和 ~~~（C实现的子串搜索），只对命中的行做Python层面的检查，
+    比逐行或逐字符的正则扫描快得多。
+    """
+    size = len(data)
+    found = {char: data.find(char * 3) for char in FENCE_CHARS}
+    while True:
+        candidates = [(index, char) for char, index in found.items() if index >= 0]
+        if not candidates:
+            return
+        index, char = min(candidates)
+        line_end = data.find(b"\n", index)
+        if line_end < 0:
+            line_end = size
+        # 围栏前最多3个空格，再往前必须是换行或文件开头
+        newline = data.rfind(b"\n", max(0, index - 4), index)
+        line_start = newline + 1 if newline >= 0 or index <= 3 else -1
+        if line_start >= 0 and data[line_start:index] == b" " * (index - line_start):
+            length = index + 3
+            while length < line_end and data[length:length + 1] == char:
+                length += 1
+            yield line_start, line_end, data[index:length], data[length:line_end].strip()
+        # 一行中只有行首可能是围栏，从下一行继续查找
+        for other, other_index in found.items():
+            if 0 <= other_index <= line_end:
+                found[other] = data.find(other * 3, line_end + 1)
+
+
+def iter_diagram_blocks(markdown_file) -> Iterator[DiagramBlock]:
+    """
+    逐个返回Markdown文件中的图表代码块，大于 MMAP_THRESHOLD 的文件通过 mmap 读取
+
+    Args:
+        markdown_file: Markdown文件路径
+
+    Returns:
+        Iterator[DiagramBlock]: 按出现顺序排列的图表代码块
+    """
+    with open(markdown_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            yield from scan_blocks(f.read(), markdown_file)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from scan_blocks(data, markdown_file)
+
+
+def find_diagram(markdown_file, language="mermaid", kinds=None) -> Optional[DiagramBlock]:
+    """
+    返回第一个符合条件的图表代码块，找到后立即停止扫描
+
+    Args:
+        markdown_file: Markdown文件路径
+        language: mermaid 或 plantuml，None 表示不限
+        kinds: 允许的图表类型（例如 ("sequenceDiagram",)），None 表示不限
+
+    Returns:
+        DiagramBlock: 没有符合条件的代码块时返回None
+    """
+    for block in iter_diagram_blocks(markdown_file):
+        if (language is None or block.language == language) and (kinds is None or block.kind in kinds):
+            return block
+    return None
@@ -0,0 +1,943 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: Mermaid 到 PlantUML 的编译器
+
+支持时序图（sequenceDiagram）、流程图（flowchart/graph）和类图（classDiagram）。
+每一行先由词法分析器切分为记号，再由对应图表类型的解析器生成中间表示（IR），
+最后由发射器把IR转换为PlantUML代码（一次 join），整体耗时与输入行数成线性关系。
+
+无法识别或只能近似转换的语句不会被静默丢弃：每一处都产生带行号和列号的诊断信息，
+无法识别的语句以注释形式保留在输出中。编译结果按源码摘要缓存。
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from uml_lint import ERROR, WARNING
+
+# 编译结果缓存的最大条目数
+CACHE_SIZE = 1024
+
+# 图表声明的第一个词 -> 图表类型
+HEADERS = {
+    "sequencediagram": "sequence",
+    "flowchart": "flowchart",
+    "flowchart-elk": "flowchart",
+    "graph": "flowchart",
+    "classdiagram": "class",
+    "classdiagram-v2": "class",
+}
+
+# 方向 -> PlantUML 布局方向（BT、RL 没有对应写法，近似为反方向的布局）
+DIRECTIONS = {
+    "TB": "top to bottom direction",
+    "TD": "top to bottom direction",
+    "BT": "top to bottom direction",
+    "LR": "left to right direction",
+    "RL": "left to right direction",
+}
+
+_BREAK = re.compile(r"<br\s*/?>", re.IGNORECASE)
+
+
+class Token:
+    """
+    一个记号: 类型、原文和在行内的列号（从0开始）
+    """
+
+    __slots__ = ("kind", "text", "column")
+
+    def __init__(self, kind, text, column):
+        self.kind = kind
+        self.text = text
+        self.column = column
+
+    def __repr__(self):
+        return f"{self.kind}({self.text!r}@{self.column})"
+
+
+def _lexer(*rules):
+    """
+    把 (记号类型, 正则) 列表合并为一个按顺序尝试的正则；最后总是匹配任意单个字符的 ERROR
+    """
+    return re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in rules + (("ERROR", r"."),)))
+
+
+def tokenize(line, lexer) -> List[Token]:
+    """
+    把一行切分为记号，跳过 SPACE 记号
+    """
+    # ERROR 匹配任意字符，所以 finditer 的匹配首尾相接，覆盖整行
+    return [Token(match.lastgroup, match.group(), match.start())
+            for match in lexer.finditer(line) if match.lastgroup != "SPACE"]
+
+
+_SEQUENCE_LEXER = _lexer(
+    ("SPACE", r"\s+"),
+    ("TEXT", r":.*"),
+    ("ARROW", r"<<-->>|<<->>|-->>|->>|--[x)]|-[x)]|-->|->"),
+    ("ACTIVATION", r"[+-]"),
+    ("COMMA", r","),
+    ("WORD", r"[^\s,:<>+-](?:[^\s,:<>+-]|-(?![-x)>]))*"),
+)
+
+_FLOWCHART_LEXER = _lexer(
+    ("SPACE", r"\s+"),
+    # 最常见的记号放在前面
+    ("ID", r"[\w$@]+(?:-(?![-.>])[\w$@]+|\.(?![-.])[\w$@]+)*"),
+    ("SEMI", r";"),
+    ("AMP", r"&"),
+    ("PIPE", r"\|[^|]*\|"),
+    ("STYLECLASS", r":::[\w-]+"),
+    ("SHAPE", r"\(\[(?:\"[^\"]*\"|[^\]])*\]\)|\[\[(?:\"[^\"]*\"|[^\]])*\]\]|\[\((?:\"[^\"]*\"|[^)])*\)\]"
+              r"|\(\((?:\"[^\"]*\"|[^)])*\)\)|\{\{(?:\"[^\"]*\"|[^}])*\}\}|\[(?:\"[^\"]*\"|[^\]])*\]"
+              r"|\((?:\"[^\"]*\"|[^)])*\)|\{(?:\"[^\"]*\"|[^}])*\}|>(?:\"[^\"]*\"|[^\]])*\]"),
+    ("ARROW", r"<?-{2,}(?:>|[ox](?!\w))?|<?={2,}(?:>|[ox](?!\w))?|<?-?\.+-(?:>|[ox](?!\w))?|-\.|~{3,}"),
+    ("STRING", r"\"[^\"]*\""),
+)
+
+_CLASS_LEXER = _lexer(
+    ("SPACE", r"\s+"),
+    ("ANNOTATION", r"<<[^>]*>>"),
+    ("RELATION", r"(?:<\||\*|o|<|\(\))?(?:--|\.\.)(?:\|>|\*|o(?!\w)|>|\(\))?"),
+    ("STRING", r"\"[^\"]*\""),
+    ("LABEL", r"\[\"[^\"]*\"\]"),
+    ("STYLECLASS", r":::[\w-]+"),
+    ("TEXT", r":.*"),
+    ("LBRACE", r"\{"),
+    ("RBRACE", r"\}"),
+    ("COMMA", r","),
+    ("ID", r"[\w$]+(?:\.[\w$]+)*(?:~[^~]*~)?"),
+)
+
+
+class IRNode:
+    """
+    中间表示的一个节点: 类型、源码行号和属性
+    """
+
+    __slots__ = ("kind", "line", "attrs")
+
+    def __init__(self, kind, line, **attrs):
+        self.kind = kind
+        self.line = line
+        self.attrs = attrs
+
+    def __getitem__(self, name):
+        return self.attrs[name]
+
+    def __repr__(self):
+        return f"IRNode({self.kind}@{self.line}, {self.attrs})"
+
+
+class CompileResult:
+    """
+    编译结果: 图表类型、PlantUML代码（不支持的图表类型为None）、诊断信息和源码摘要
+    """
+
+    __slots__ = ("kind", "plantuml", "diagnostics", "digest")
+
+    def __init__(self, kind, plantuml, diagnostics, digest):
+        self.kind = kind
+        self.plantuml = plantuml
+        self.diagnostics = diagnostics
+        self.digest = digest
+
+    @property
+    def errors(self):
+        return [d for d in self.diagnostics if d["severity"] == ERROR]
+
+
+class _Diagnostics:
+    """
+    收集诊断信息；解析器使用去掉缩进后的列号，这里换算回原始行中的列号（从1开始）
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.items = []
+
+    def add(self, line, column, severity, message):
+        if 1 <= line <= len(self.lines):
+            text = self.lines[line - 1]
+            column += len(text) - len(text.lstrip())
+        self.items.append({"line": line, "column": column + 1, "severity": severity, "message": message})
+
+
+def _text(value):
+    """
+    Mermaid文本中的 <br> 换行转换为PlantUML的 \\n
+    """
+    value = value.strip()
+    return _BREAK.sub(r"\\n", value) if "<" in value else value
+
+
+def _unquote(value):
+    value = value.strip()
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+_SAFE_ID = re.compile(r"[A-Za-z_]\w*$")
+
+
+class _Identifiers:
+    """
+    Mermaid名称 -> PlantUML标识符；含有特殊字符的名称转换为下划线形式，同一名称总是得到同一标识符
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, str] = {}
+        self._taken = set()
+
+    def __call__(self, name):
+        ident = self.ids.get(name)
+        if ident is not None:
+            return ident
+        if _SAFE_ID.match(name):
+            ident = name
+        else:
+            base = re.sub(r"\W", "_", name) or "_"
+            base = base if _SAFE_ID.match(base) else f"_{base}"
+            ident, n = base, 1
+            while ident in self._taken:
+                n += 1
+                ident = f"{base}_{n}"
+        self.ids[name] = ident
+        self._taken.add(ident)
+        return ident
+
+
+def _split_header(lines):
+    """
+    跳过注释、空行和前置元数据（--- title: ... ---），找到图表声明行
+
+    Returns:
+        tuple: (声明行的索引或None, 前置元数据中的标题)
+    """
+    title = None
+    index = 0
+    count = len(lines)
+    while index < count and (not lines[index].strip() or lines[index].strip().startswith("%%")):
+        index += 1
+    if index < count and lines[index].strip() == "---":
+        index += 1
+        while index < count and lines[index].strip() != "---":
+            key, _, value = lines[index].partition(":")
+            if key.strip() == "title":
+                title = _unquote(value)
+            index += 1
+        index += 1
+    while index < count and (not lines[index].strip() or lines[index].strip().startswith("%%")):
+        index += 1
+    return (index if index < count else None), title
+
+
+# ---------------------------------------------------------------- 时序图
+
+_SEQUENCE_ARROWS = {
+    "->": "->",
+    "-->": "-->",
+    "->>": "->",
+    "-->>": "-->",
+    "-x": "->x",
+    "--x": "-->x",
+    "-)": "->>",
+    "--)": "-->>",
+    "<<->>": "<->",
+    "<<-->>": "<-->",
+}
+
+# 块开始关键字 -> 允许出现的分支关键字
+_SEQUENCE_BLOCKS = {"loop": (), "alt": ("else",), "opt": (), "par": ("and",), "critical": ("option",),
+                    "break": (), "rect": (), "box": ()}
+
+_COLORS = {"aqua", "black", "blue", "fuchsia", "gray", "grey", "green", "lime", "maroon", "navy", "olive",
+           "orange", "pink", "purple", "red", "silver", "teal", "white", "yellow", "lightblue", "lightgreen",
+           "lightgrey", "lightyellow", "transparent"}
+
+
+def _parse_sequence(lines, first, diagnostics):
+    """
+    时序图解析器
+
+    Returns:
+        list: IR节点列表
+    """
+    ir = []
+    ids = _Identifiers()
+    stack = []
+    for index in range(first, len(lines)):
+        number = index + 1
+        line = lines[index].strip()
+        if not line or line.startswith("%%"):
+            continue
+        tokens = tokenize(line, _SEQUENCE_LEXER)
+        head = tokens[0]
+        keyword = head.text.lower() if head.kind == "WORD" else None
+        rest = line[len(head.text):].strip()
+
+        if keyword in ("participant", "actor"):
+            if len(tokens) < 2 or tokens[1].kind != "WORD":
+                diagnostics.add(number, head.column, ERROR, f"{head.text} 缺少参与者名称")
+                ir.append(IRNode("comment", number, text=line))
+                continue
+            alias = None
+            if len(tokens) > 3 and tokens[2].text == "as":
+                alias = _text(line[tokens[3].column:])
+            name = tokens[1].text
+            ir.append(IRNode("participant", number, role=keyword, id=ids(name),
+                             label=alias or (name if ids.ids[name] != name else None)))
+        elif keyword == "create" and len(tokens) >= 2:
+            name = tokens[-1].text
+            ir.append(IRNode("create", number, id=ids(name)))
+        elif keyword in ("destroy", "activate", "deactivate") and len(tokens) == 2 and tokens[1].kind == "WORD":
+            ir.append(IRNode(keyword, number, id=ids(tokens[1].text)))
+        elif keyword == "autonumber":
+            ir.append(IRNode("autonumber", number))
+        elif keyword == "title":
+            ir.append(IRNode("title", number, text=_text(rest.lstrip(":"))))
+        elif keyword == "note":
+            node = _sequence_note(tokens, line, number, ids, diagnostics)
+            ir.append(node)
+        elif keyword in _SEQUENCE_BLOCKS:
+            stack.append((keyword, number))
+            color = None
+            if keyword in ("box", "rect"):
+                first_word = rest.split(None, 1)[0] if rest else ""
+                if first_word.lower() in _COLORS:
+                    color, rest = first_word, rest[len(first_word):].strip()
+                elif first_word.lower().startswith(("rgb(", "rgba(", "hsl(")):
+                    diagnostics.add(number, len(head.text) + 1, WARNING, f"PlantUML不支持 {keyword} 的颜色写法 {first_word}，已忽略")
+                    rest = rest[rest.index(")") + 1:].strip() if ")" in rest else ""
+                if keyword == "rect":
+                    diagnostics.add(number, head.column, WARNING, "PlantUML没有 rect 背景块，已转换为 group")
+            ir.append(IRNode("block", number, block=keyword, text=_text(rest), color=color))
+        elif keyword in ("else", "and", "option"):
+            if not stack or keyword not in _SEQUENCE_BLOCKS[stack[-1][0]]:
+                diagnostics.add(number, head.column, ERROR, f"{head.text} 不在对应的 alt/par/critical 块中")
+                ir.append(IRNode("comment", number, text=line))
+                continue
+            ir.append(IRNode("branch", number, text=_text(rest)))
+        elif keyword == "end" and len(tokens) == 1:
+            if not stack:
+                diagnostics.add(number, head.column, ERROR, "多余的 end，没有对应的块")
+                ir.append(IRNode("comment", number, text=line))
+                continue
+            block, _ = stack.pop()
+            ir.append(IRNode("end", number, block=block))
+        elif keyword in ("link", "links", "properties", "details"):
+            diagnostics.add(number, head.column, WARNING, f"PlantUML不支持参与者的 {head.text} 菜单，已忽略")
+        else:
+            ir.append(_sequence_message(tokens, line, number, ids, diagnostics))
+
+    for block, number in reversed(stack):
+        diagnostics.add(number, 0, ERROR, f"{block} 块没有对应的 end，已在末尾补上")
+        ir.append(IRNode("end", number, block=block))
+    return ir
+
+
+def _sequence_note(tokens, line, number, ids, diagnostics):
+    kinds = [token.kind for token in tokens]
+    text_index = kinds.index("TEXT") if "TEXT" in kinds else len(tokens)
+    words = [token.text for token in tokens[1:text_index] if token.kind == "WORD"]
+    position = words[0].lower() if words else ""
+    names = words[2:] if position in ("left", "right") and len(words) > 1 and words[1] == "of" else words[1:]
+    if position not in ("left", "right", "over") or not names or (position != "over" and len(names) != 1):
+        diagnostics.add(number, tokens[0].column, ERROR, "无法识别的 Note 语句，应为 Note left of/right of/over 参与者: 文本")
+        return IRNode("comment", number, text=line)
+    text = tokens[text_index].text[1:] if text_index < len(tokens) else ""
+    return IRNode("note", number, position=position, ids=[ids(name) for name in names], text=_text(text))
+
+
+def _sequence_message(tokens, line, number, ids, diagnostics):
+    kinds = [token.kind for token in tokens]
+    if kinds[-1] == "TEXT":
+        kinds, text = kinds[:-1], tokens[-1].text[1:]
+    else:
+        text = None
+    if kinds in (["WORD", "ARROW", "WORD"], ["WORD", "ARROW", "ACTIVATION", "WORD"]):
+        activation = {"+": "++", "-": "--"}.get(tokens[2].text) if len(kinds) == 4 else None
+        return IRNode("message", number, source=ids(tokens[0].text),
+                      target=ids(tokens[len(kinds) - 1].text),
+                      arrow=_SEQUENCE_ARROWS[tokens[1].text], activation=activation,
+                      text=_text(text) if text is not None else None)
+    bad = next((token for token in tokens if token.kind == "ERROR"), tokens[min(1, len(tokens) - 1)])
+    diagnostics.add(number, bad.column, ERROR, f"无法识别的时序图语句，问题出现在 {bad.text!r}")
+    return IRNode("comment", number, text=line)
+
+
+def _emit_sequence(ir, out):
+    indent = "  "
+    depth = 0
+    for node in ir:
+        kind = node.kind
+        pad = indent * depth
+        if kind == "participant":
+            role = "actor" if node["role"] == "actor" else "participant"
+            if node["label"]:
+                out.append(f'{pad}{role} "{node["label"]}" as {node["id"]}')
+            else:
+                out.append(f"{pad}{role} {node['id']}")
+        elif kind == "message":
+            activation = f" {node['activation']}" if node["activation"] else ""
+            text = f" : {node['text']}" if node["text"] else ""
+            out.append(f"{pad}{node['source']} {node['arrow']} {node['target']}{activation}{text}")
+        elif kind == "note":
+            where = "over " + ", ".join(node["ids"]) if node["position"] == "over" else f"{node['position']} of {node['ids'][0]}"
+            out.append(f"{pad}note {where} : {node['text']}")
+        elif kind in ("create", "destroy", "activate", "deactivate"):
+            out.append(f"{pad}{kind} {node['id']}")
+        elif kind == "autonumber":
+            out.append(f"{pad}autonumber")
+        elif kind == "title":
+            out.append(f"title {node['text']}")
+        elif kind == "block":
+            block, text, color = node["block"], node["text"], node["color"]
+            if block == "box":
+                out.append(f'{pad}box "{text}"' + (f" #{color}" if color else ""))
+            elif block == "rect":
+                out.append(f"{pad}group {text}".rstrip())
+            else:
+                out.append(f"{pad}{block} {text}".rstrip())
+            depth += 1
+        elif kind == "branch":
+            out.append(f"{indent * (depth - 1)}else {node['text']}".rstrip())
+        elif kind == "end":
+            depth -= 1
+            out.append(f"{indent * depth}end box" if node["block"] == "box" else f"{indent * depth}end")
+        elif kind == "comment":
+            out.append(f"{pad}' {node['text']}")
+
+
+# ---------------------------------------------------------------- 流程图
+
+# 节点形状的开始符号 -> (结束符号长度, PlantUML元素)
+_SHAPES = (
+    ("([", 2, "usecase"),
+    ("[[", 2, "rectangle"),
+    ("[(", 2, "database"),
+    ("((", 2, "usecase"),
+    ("{{", 2, "hexagon"),
+    ("[", 1, "rectangle"),
+    ("(", 1, "card"),
+    ("{", 1, "hexagon"),
+    (">", 1, "card"),
+)
+
+
+def _shape(text):
+    """
+    节点形状记号 -> (PlantUML元素, 标签)
+    """
+    for opener, closer, element in _SHAPES:
+        if text.startswith(opener):
+            label = text[len(opener):len(text) - closer]
+            if opener == "[" and label[:1] in "/\\" and label[-1:] in "/\\":
+                label = label[1:-1]
+            return element, _text(_unquote(label))
+    return "rectangle", _text(text)
+
+
+def _flow_arrow(token):
+    """
+    Mermaid连线 -> PlantUML箭头
+
+    Returns:
+        tuple: (PlantUML箭头, 无法精确转换时的说明或None)
+    """
+    text = token
+    both = text.startswith("<")
+    if both:
+        text = text[1:]
+    head = text[-1] if text[-1] in ">ox" else ""
+    body = text[:-1] if head else text
+    note = None
+    if head == "x":
+        head, note = ">", f"PlantUML没有 {token} 的叉形箭头，已转换为普通箭头"
+    length = max(2, len(body.strip(".")) if "." not in body else body.count(".") + 1)
+    if body.startswith("~"):
+        line = "-[hidden]-"
+    elif "=" in body:
+        line = "-[bold]" + "-" * (length - 1)
+    elif "." in body:
+        line = "." * length
+    else:
+        line = "-" * length
+    return ("<" if both else "") + line + head, note
+
+
+def _parse_flowchart(lines, first, header, diagnostics):
+    """
+    流程图解析器
+
+    Returns:
+        tuple: (方向, 节点表 id -> IRNode, 子图列表, 连线列表, 标题)
+    """
+    direction = header.split()[1].upper() if len(header.split()) > 1 else "TB"
+    nodes: "OrderedDict[str, IRNode]" = OrderedDict()
+    subgraphs: List[IRNode] = []
+    edges: List[IRNode] = []
+    ids = _Identifiers()
+    stack: List[IRNode] = []
+    title = None
+
+    def node(token, shape, number):
+        name = token.text
+        ident = ids(name)
+        entry = nodes.get(ident)
+        if entry is None:
+            entry = nodes[ident] = IRNode("node", number, id=ident, label=name, element="rectangle",
+                                          parent=stack[-1]["id"] if stack else None, shaped=False)
+        if shape is not None:
+            element, label = _shape(shape.text)
+            if entry["shaped"] and (element, label) != (entry["element"], entry["label"]):
+                diagnostics.add(number, shape.column, WARNING, f"节点 {name} 已经定义过形状或标签，以第{entry.line}行为准")
+            elif not entry["shaped"]:
+                entry.attrs.update(element=element, label=label, shaped=True)
+        return ident
+
+    for index in range(first, len(lines)):
+        number = index + 1
+        raw = lines[index].strip()
+        if not raw or raw.startswith("%%"):
+            continue
+        tokens = tokenize(raw, _FLOWCHART_LEXER)
+        # 分号分隔同一行中的多条语句
+        statements, current = [], []
+        for token in tokens:
+            if token.kind == "SEMI":
+                if current:
+                    statements.append(current)
+                current = []
+            else:
+                current.append(token)
+        if current:
+            statements.append(current)
+
+        for tokens in statements:
+            head = tokens[0]
+            keyword = head.text if head.kind == "ID" else None
+            if keyword == "subgraph":
+                if len(tokens) >= 3 and tokens[1].kind == "ID" and tokens[2].kind == "SHAPE" and len(tokens) == 3:
+                    ident, label = ids(tokens[1].text), _shape(tokens[2].text)[1]
+                elif len(tokens) == 2 and tokens[1].kind == "ID":
+                    ident = ids(tokens[1].text)
+                    label = tokens[1].text
+                else:
+                    label = _unquote(raw[head.column + len(head.text):].strip())
+                    ident = ids(f"subgraph {number}")
+                group = IRNode("subgraph", number, id=ident, label=_text(label),
+                               parent=stack[-1]["id"] if stack else None)
+                subgraphs.append(group)
+                stack.append(group)
+            elif keyword == "end" and len(tokens) == 1:
+                if stack:
+                    stack.pop()
+                else:
+                    diagnostics.add(number, head.column, ERROR, "多余的 end，没有对应的 subgraph")
+            elif keyword == "direction" and stack:
+                diagnostics.add(number, head.column, WARNING, "PlantUML不支持子图单独设置方向，已忽略")
+            elif keyword in ("classDef", "class", "style", "linkStyle", "click", "accTitle", "accDescr"):
+                if keyword == "accTitle" and title is None:
+                    title = _text(raw.partition(":")[2])
+                else:
+                    diagnostics.add(number, head.column, WARNING, f"{keyword} 语句没有对应的PlantUML写法，已忽略")
+            elif keyword == "title":
+                title = _text(raw[len("title"):])
+            else:
+                _parse_flow_statement(tokens, raw, number, node, edges, diagnostics)
+
+    for group in reversed(stack):
+        diagnostics.add(group.line, 0, ERROR, f"subgraph {group['label']} 没有对应的 end，已在末尾补上")
+    return direction, nodes, subgraphs, edges, title
+
+
+def _parse_flow_statement(tokens, raw, number, node, edges, diagnostics):
+    """
+    解析 节点组 (连线 节点组)* 形式的语句，节点组是用 & 连接的节点
+    """
+    position = 0
+    count = len(tokens)
+
+    def group():
+        nonlocal position
+        members = []
+        while position < count and tokens[position].kind == "ID":
+            name = tokens[position]
+            position += 1
+            shape = None
+            if position < count and tokens[position].kind == "SHAPE":
+                shape = tokens[position]
+                position += 1
+            if position < count and tokens[position].kind == "STYLECLASS":
+                position += 1
+            members.append(node(name, shape, number))
+            if position < count and tokens[position].kind == "AMP":
+                position += 1
+            else:
+                break
+        return members
+
+    def fail(token, message):
+        diagnostics.add(number, token.column, ERROR, message)
+
+    left = group()
+    if not left:
+        bad = tokens[position] if position < count else tokens[-1]
+        fail(bad, f"无法识别的流程图语句，问题出现在 {bad.text!r}")
+        return
+    while position < count:
+        token = tokens[position]
+        if token.kind != "ARROW":
+            fail(token, f"此处应为连线，实际是 {token.text!r}")
+            return
+        position += 1
+        label = None
+        arrow_text = token.text
+        if arrow_text in ("--", "-.", "=="):
+            # 带文本的连线: A -- 文本 --> B
+            start = position
+            while position < count and tokens[position].kind != "ARROW":
+                position += 1
+            if position == count:
+                fail(token, f"连线 {arrow_text} 后的文本没有结束的箭头")
+                return
+            closing = tokens[position]
+            label = _unquote(raw[token.column + len(arrow_text):closing.column]) if position > start else ""
+            arrow_text = closing.text
+            position += 1
+        if position < count and tokens[position].kind == "PIPE":
+            label = tokens[position].text[1:-1]
+            position += 1
+        arrow, note = _flow_arrow(arrow_text)
+        if note:
+            diagnostics.add(number, token.column, WARNING, note)
+        right = group()
+        if not right:
+            bad = tokens[position] if position < count else token
+            fail(bad, f"连线 {token.text} 后缺少目标节点")
+            return
+        for source in left:
+            for target in right:
+                edges.append(IRNode("edge", number, source=source, target=target, arrow=arrow,
+                                    label=_text(_unquote(label)) if label else None))
+        left = right
+
+
+def _emit_flowchart(parsed, out):
+    direction, nodes, subgraphs, edges, title = parsed
+    if title:
+        out.append(f"title {title}")
+    out.append(DIRECTIONS.get(direction, DIRECTIONS["TB"]))
+    children: Dict[Optional[str], List[IRNode]] = {}
+    for group in subgraphs:
+        children.setdefault(group["parent"], []).append(group)
+    members: Dict[Optional[str], List[IRNode]] = {}
+    # 连线可以直接指向子图，这些名称不再单独声明为节点
+    group_ids = {group["id"] for group in subgraphs}
+    for entry in nodes.values():
+        if entry["id"] in group_ids:
+            continue
+        members.setdefault(entry["parent"], []).append(entry)
+
+    def emit(parent, depth):
+        pad = "  " * depth
+        for entry in members.get(parent, ()):
+            label = entry["label"].replace('"', "'")
+            out.append(f'{pad}{entry["element"]} "{label}" as {entry["id"]}')
+        for group in children.get(parent, ()):
+            label = group["label"].replace('"', "'")
+            out.append(f'{pad}rectangle "{label}" as {group["id"]} {{')
+            emit(group["id"], depth + 1)
+            out.append(f"{pad}}}")
+
+    emit(None, 0)
+    for edge in edges:
+        label = f" : {edge['label']}" if edge["label"] else ""
+        out.append(f"{edge['source']} {edge['arrow']} {edge['target']}{label}")
+
+
+# ---------------------------------------------------------------- 类图
+
+# 注解 -> PlantUML 类关键字
+_CLASS_ANNOTATIONS = {"interface": "interface", "abstract": "abstract class", "enumeration": "enum", "enum": "enum"}
+
+_GENERIC = re.compile(r"~([^~]*)~")
+
+
+def _generic(text):
+    return _GENERIC.sub(r"<\1>", text)
+
+
+def _member(text):
+    """
+    Mermaid类成员 -> PlantUML类成员: 泛型 ~T~ 转为 <T>，后缀 $ 和 * 转为 {static} 和 {abstract}
+    """
+    text = _generic(text.strip())
+    modifier = ""
+    if text.endswith("$"):
+        modifier, text = "{static} ", text[:-1].rstrip()
+    elif text.endswith("*"):
+        modifier, text = "{abstract} ", text[:-1].rstrip()
+    if ")" in text:
+        signature, _, returns = text.rpartition(")")
+        text = f"{signature}) : {returns.strip()}" if returns.strip() else f"{signature})"
+    return modifier + text
+
+
+def _parse_class(lines, first, diagnostics):
+    """
+    类图解析器
+
+    Returns:
+        tuple: (方向, 类表 名称 -> IRNode, 关系列表, 注释列表, 标题)
+    """
+    direction = None
+    classes: "OrderedDict[str, IRNode]" = OrderedDict()
+    relations: List[IRNode] = []
+    notes: List[IRNode] = []
+    namespace = None
+    body: Optional[IRNode] = None
+    title = None
+
+    def declare(name, number):
+        base = name.split("~", 1)[0]
+        entry = classes.get(base)
+        if entry is None:
+            entry = classes[base] = IRNode("class", number, name=base, generic=_generic(name[len(base):]),
+                                           label=None, keyword="class", stereotypes=[], members=[],
+                                           namespace=namespace)
+        elif name != base and not entry["generic"]:
+            entry.attrs["generic"] = _generic(name[len(base):])
+        return entry
+
+    def annotate(entry, annotation):
+        value = annotation[2:-2].strip()
+        keyword = _CLASS_ANNOTATIONS.get(value.lower())
+        if keyword and entry["keyword"] == "class":
+            entry.attrs["keyword"] = keyword
+        elif not keyword:
+            entry["stereotypes"].append(value)
+
+    for index in range(first, len(lines)):
+        number = index + 1
+        raw = lines[index].strip()
+        if not raw or raw.startswith("%%"):
+            continue
+        if body is not None:
+            if raw == "}":
+                body = None
+            elif raw.startswith("<<") and raw.endswith(">>"):
+                annotate(body, raw)
+            else:
+                body["members"].append(_member(raw))
+            continue
+
+        tokens = tokenize(raw, _CLASS_LEXER)
+        head = tokens[0]
+        kinds = [token.kind for token in tokens]
+        keyword = head.text if head.kind == "ID" else None
+
+        if keyword == "direction" and len(tokens) == 2:
+            direction = tokens[1].text.upper()
+        elif keyword == "title":
+            title = _text(raw[len("title"):])
+        elif keyword == "class" and len(tokens) >= 2 and tokens[1].kind == "ID":
+            entry = declare(tokens[1].text, number)
+            position = 2
+            if position < len(tokens) and tokens[position].kind == "LABEL":
+                entry.attrs["label"] = tokens[position].text[2:-2]
+                position += 1
+            while position < len(tokens) and tokens[position].kind in ("STYLECLASS", "ANNOTATION"):
+                if tokens[position].kind == "ANNOTATION":
+                    annotate(entry, tokens[position].text)
+                position += 1
+            if position < len(tokens) and tokens[position].kind == "LBRACE":
+                position += 1
+                if position < len(tokens) and tokens[-1].kind == "RBRACE":
+                    # 单行类体: class A { +int x }
+                    inner = raw[tokens[position - 1].column + 1:tokens[-1].column].strip()
+                    if inner:
+                        entry["members"].append(_member(inner))
+                    position = len(tokens)
+                else:
+                    body = entry
+            if position < len(tokens):
+                bad = tokens[position]
+                diagnostics.add(number, bad.column, ERROR, f"class 声明中无法识别的内容: {raw[bad.column:]!r}")
+        elif keyword == "namespace" and kinds == ["ID", "ID", "LBRACE"]:
+            if namespace is not None:
+                diagnostics.add(number, head.column, WARNING, "PlantUML包不支持这种嵌套写法，已展开到外层命名空间")
+            namespace = tokens[1].text
+        elif kinds == ["RBRACE"] and namespace is not None:
+            namespace = None
+        elif head.kind == "ANNOTATION" and kinds == ["ANNOTATION", "ID"]:
+            annotate(declare(tokens[1].text, number), head.text)
+        elif keyword == "note":
+            strings = [token for token in tokens if token.kind == "STRING"]
+            target = tokens[2].text if len(tokens) > 3 and tokens[1].text == "for" and tokens[2].kind == "ID" else None
+            if not strings:
+                diagnostics.add(number, head.column, ERROR, "note 缺少带引号的文本")
+                continue
+            notes.append(IRNode("note", number, target=target, text=_text(_unquote(strings[-1].text))))
+        elif keyword in ("click", "link", "callback", "cssClass", "style", "classDef"):
+            diagnostics.add(number, head.column, WARNING, f"{keyword} 语句没有对应的PlantUML写法，已忽略")
+        elif kinds[:2] == ["ID", "TEXT"] and len(kinds) == 2:
+            member = tokens[1].text[1:].strip()
+            if member.startswith("<<") and member.endswith(">>"):
+                annotate(declare(head.text, number), member)
+            else:
+                declare(head.text, number)["members"].append(_member(member))
+        elif "RELATION" in kinds:
+            relation = _class_relation(tokens, kinds, number, diagnostics)
+            if relation is not None:
+                for name in (relation["left"], relation["right"]):
+                    declare(name, number)
+                relation.attrs.update(left=relation["left"].split("~", 1)[0], right=relation["right"].split("~", 1)[0])
+                relations.append(relation)
+        elif kinds == ["ID"]:
+            declare(head.text, number)
+        else:
+            bad = next((token for token in tokens if token.kind == "ERROR"), head)
+            diagnostics.add(number, bad.column, ERROR, f"无法识别的类图语句，问题出现在 {bad.text!r}")
+
+    if body is not None:
+        diagnostics.add(body.line, 0, ERROR, f"类 {body['name']} 的 {{ 没有对应的 }}")
+    if namespace is not None:
+        diagnostics.add(len(lines), 0, ERROR, f"namespace {namespace} 的 {{ 没有对应的 }}")
+    return direction, classes, relations, notes, title
+
+
+def _class_relation(tokens, kinds, number, diagnostics):
+    arrow = kinds.index("RELATION")
+    left = tokens[:arrow]
+    right = tokens[arrow + 1:]
+    label = None
+    if right and right[-1].kind == "TEXT":
+        label = _text(right[-1].text[1:])
+        right = right[:-1]
+    shapes = ([token.kind for token in left], [token.kind for token in right])
+    if shapes[0] not in (["ID"], ["ID", "STRING"]) or shapes[1] not in (["ID"], ["STRING", "ID"]):
+        bad = tokens[arrow]
+        diagnostics.add(number, bad.column, ERROR, "关系两端应为 类名 [\"基数\"] 箭头 [\"基数\"] 类名")
+        return None
+    relation = tokens[arrow].text
+    if "()" in relation:
+        diagnostics.add(number, tokens[arrow].column, WARNING, "PlantUML类图不支持棒棒糖接口关系，已转换为依赖")
+        relation = relation.replace("()", "").replace("--", "..") or ".."
+        relation = relation if relation.endswith(">") else relation + ">"
+    return IRNode("relation", number, left=left[0].text, right=right[-1].text, arrow=relation,
+                  left_cardinality=left[1].text if len(left) == 2 else None,
+                  right_cardinality=right[0].text if len(right) == 2 else None, label=label)
+
+
+def _emit_class(parsed, out):
+    direction, classes, relations, notes, title = parsed
+    if title:
+        out.append(f"title {title}")
+    if direction:
+        out.append(DIRECTIONS.get(direction, DIRECTIONS["TB"]))
+    by_namespace: "OrderedDict[Optional[str], List[IRNode]]" = OrderedDict()
+    for entry in classes.values():
+        by_namespace.setdefault(entry["namespace"], []).append(entry)
+    for namespace, entries in by_namespace.items():
+        pad = "  " if namespace else ""
+        if namespace:
+            out.append(f"package {namespace} {{")
+        for entry in entries:
+            name = f'"{entry["label"]}" as {entry["name"]}' if entry["label"] else entry["name"]
+            stereotypes = "".join(f" <<{value}>>" for value in entry["stereotypes"])
+            declaration = f"{pad}{entry['keyword']} {name}{entry['generic']}{stereotypes}"
+            if entry["members"]:
+                out.append(declaration + " {")
+                out.extend(f"{pad}  {member}" for member in entry["members"])
+                out.append(f"{pad}}}")
+            else:
+                out.append(declaration)
+        if namespace:
+            out.append("}")
+    for relation in relations:
+        left = f'{relation["left"]} {relation["left_cardinality"]}' if relation["left_cardinality"] else relation["left"]
+        right = f'{relation["right_cardinality"]} {relation["right"]}' if relation["right_cardinality"] else relation["right"]
+        label = f" : {relation['label']}" if relation["label"] else ""
+        out.append(f"{left} {relation['arrow']} {right}{label}")
+    for n, note in enumerate(notes, 1):
+        if note["target"]:
+            out.append(f"note right of {note['target']} : {note['text']}")
+        else:
+            out.append(f'note "{note["text"]}" as N{n}')
+
+
+# ---------------------------------------------------------------- 入口
+
+_cache: "OrderedDict[tuple, CompileResult]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_mermaid(code, diagram_type=None, digest=None) -> CompileResult:
+    """
+    把Mermaid代码编译为PlantUML
+
+    Args:
+        code: Mermaid代码，第一条语句是图表声明（sequenceDiagram、flowchart LR、classDiagram 等）
+        diagram_type: 代码没有图表声明时使用的类型（sequence、flowchart、class）
+        digest: 源码的SHA-256摘要（例如 DiagramBlock.digest），作为缓存键；None 时自动计算
+
+    Returns:
+        CompileResult: 诊断信息的行号从1开始，相对于 code 的第一行；
+                       不支持的图表类型 plantuml 为None
+    """
+    digest = digest or hashlib.sha256(code.encode("utf-8")).hexdigest()
+    key = (digest, diagram_type)
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            return result
+
+    result = _compile(code, diagram_type, digest)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _compile(code, diagram_type, digest):
+    lines = code.split("\n")
+    diagnostics = _Diagnostics(lines)
+    header_index, title = _split_header(lines)
+    header = lines[header_index].strip() if header_index is not None else ""
+    kind = HEADERS.get(header.split()[0].lower()) if header else None
+    first = header_index + 1 if header_index is not None else len(lines)
+    if kind is None:
+        if header and diagram_type in ("sequence", "flowchart", "class"):
+            # 没有图表声明，按调用方指定的类型解析全部内容
+            kind, first = diagram_type, header_index
+            header = "flowchart TB" if kind == "flowchart" else header
+        else:
+            word = header.split()[0] if header else ""
+            diagnostics.add(header_index + 1 if header_index is not None else 1, 0, ERROR,
+                            f"不支持的Mermaid图表类型: {word or '（空）'}")
+            return CompileResult(word or None, None, tuple(diagnostics.items), digest)
+
+    out = ["@startuml"]
+    if title:
+        out.append(f"title {title}")
+    if kind == "sequence":
+        _emit_sequence(_parse_sequence(lines, first, diagnostics), out)
+    elif kind == "flowchart":
+        _emit_flowchart(_parse_flowchart(lines, first, header, diagnostics), out)
+    else:
+        _emit_class(_parse_class(lines, first, diagnostics), out)
+    out.append("@enduml")
+    diagnostics.items.sort(key=lambda item: (item["line"], item["column"]))
+    return CompileResult(kind, "\n".join(out) + "\n", tuple(diagnostics.items), digest)
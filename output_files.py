@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 输出文件的原子写入
+
+所有输出文件先写入同一目录下的临时文件，完成后再通过 os.replace 原子替换，
+并发渲染或中途失败时不会留下写了一半的文件。目标文件内容已经相同时跳过写入。
+"""
+
+import filecmp
+import os
+import shutil
+import uuid
+
+# 写入结果
+WRITTEN = "written"
+LINKED = "linked"
+COPIED = "copied"
+UNCHANGED = "unchanged"
+
+_COMPARE_CHUNK_SIZE = 64 * 1024
+
+
+def temp_path_for(path):
+    """
+    返回与目标文件位于同一目录的临时文件路径，保证 os.replace 在同一文件系统内完成
+    """
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, f".{filename}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def remove_quietly(path):
+    """
+    删除文件，文件不存在或无法删除时忽略
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def atomic_write(path, content):
+    """
+    原子地写入文件内容
+
+    Args:
+        path: 目标文件路径
+        content: 要写入的字节串
+    """
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+
+def same_content(path, content):
+    """
+    判断文件内容是否与给定字节串相同，文件不存在时返回False
+    """
+    try:
+        if os.path.getsize(path) != len(content):
+            return False
+        view = memoryview(content)
+        offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(_COMPARE_CHUNK_SIZE)
+                if not chunk:
+                    return offset == len(content)
+                if view[offset:offset + len(chunk)] != chunk:
+                    return False
+                offset += len(chunk)
+    except OSError:
+        return False
+
+
+def write_if_changed(path, content):
+    """
+    内容不同时原子写入文件
+
+    Returns:
+        str: WRITTEN 或 UNCHANGED
+    """
+    if same_content(path, content):
+        return UNCHANGED
+    atomic_write(path, content)
+    return WRITTEN
+
+
+def link_or_copy(src, dst):
+    """
+    让 dst 拥有与 src 相同的内容：内容已相同时不做任何操作，
+    否则优先创建硬链接（不复制数据），跨文件系统等情况下退回流式复制。
+    两种方式都通过临时文件 + os.replace 原子完成。
+
+    Returns:
+        str: UNCHANGED、LINKED 或 COPIED
+    """
+    try:
+        if os.path.samefile(src, dst) or filecmp.cmp(src, dst, shallow=False):
+            return UNCHANGED
+    except OSError:
+        pass
+
+    tmp_path = temp_path_for(dst)
+    try:
+        try:
+            os.link(src, tmp_path)
+            result = LINKED
+        except OSError:
+            shutil.copyfile(src, tmp_path)
+            result = COPIED
+        os.replace(tmp_path, dst)
+        return result
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
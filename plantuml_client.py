@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: PlantUML渲染服务的HTTP客户端
+
+所有渲染请求共享同一个连接池：每个渲染服务主机一个 httpx.Client，
+保持长连接并限制单主机连接数，可选启用HTTP/2（需要安装 h2）。
+异步工具使用 httpx.AsyncClient，按事件循环和主机分别维护连接池。
+
+fetch_to_file 系列函数按块流式下载到临时文件并原子重命名，
+状态码、Content-Type、大小和文件头在读取响应体之前或第一个数据块上校验，
+因此单次渲染占用的内存与图像大小无关。
+
+所有 fetch 函数都可以通过 body 参数以POST方式提交PlantUML源码（POST {server}/{fmt}），
+用于编码后URL过长的大型图表。
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from output_files import remove_quietly, temp_path_for
+
+logger = logging.getLogger(__name__)
+
+# 连接池配置
+HTTP_MAX_CONNECTIONS = int(os.environ.get("UML_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("UML_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("UML_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.environ.get("UML_HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("UML_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("UML_HTTP_READ_TIMEOUT", str(HTTP_TIMEOUT)))
+HTTP2 = os.environ.get("UML_HTTP2", "").lower() in ("1", "true", "yes")
+
+# 流式下载配置
+STREAM_CHUNK_SIZE = 64 * 1024
+MAX_RENDER_BYTES = int(os.environ.get("UML_MAX_RENDER_MB", "200")) * 1024 * 1024
+
+# 各输出格式期望的 Content-Type
+FORMAT_CONTENT_TYPES = {
+    "png": ("image/png",),
+    "svg": ("image/svg+xml",),
+    "txt": ("text/plain",),
+    "eps": ("application/postscript", "image/eps", "application/eps"),
+}
+
+# 各输出格式的文件头，在第一个数据块上校验（txt没有固定文件头）
+FORMAT_SIGNATURES = {
+    "png": (b"\x89PNG",),
+    "svg": (b"<?xml", b"<svg"),
+    "txt": (),
+    "eps": (b"%!PS",),
+}
+
+_clients: Dict[str, httpx.Client] = {}
+_clients_lock = threading.Lock()
+
+# AsyncClient 绑定在创建它的事件循环上
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+class PlantUMLServerError(Exception):
+    """PlantUML服务返回了错误状态码"""
+
+    def __init__(self, status_code, message=None):
+        self.status_code = status_code
+        super().__init__(message or f"PlantUML服务错误: {status_code}")
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _http2_enabled():
+    if not HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("已设置UML_HTTP2，但未安装h2，回退到HTTP/1.1（pip install httpx[http2]）")
+        return False
+    return True
+
+
+def _client_timeout():
+    # 连接超时单独设置，渲染服务不可达时快速失败；读取超时覆盖渲染本身的耗时
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, read=HTTP_READ_TIMEOUT)
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client(url) -> httpx.Client:
+    """
+    获取指定渲染服务主机的共享客户端，首次使用时创建
+
+    Args:
+        url: 渲染服务地址或完整的渲染URL
+
+    Returns:
+        httpx.Client: 该主机的连接池客户端
+    """
+    origin = _origin(url)
+    client = _clients.get(origin)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(origin)
+        if client is None:
+            logger.info("创建渲染服务连接池: %s", origin)
+            client = httpx.Client(http2=_http2_enabled(), timeout=_client_timeout(), limits=_limits())
+            _clients[origin] = client
+    return client
+
+
+def get_async_client(url) -> httpx.AsyncClient:
+    """
+    获取当前事件循环中指定渲染服务主机的共享异步客户端
+
+    Args:
+        url: 渲染服务地址或完整的渲染URL
+
+    Returns:
+        httpx.AsyncClient: 该主机的异步连接池客户端
+    """
+    origin = _origin(url)
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(origin)
+    if client is None:
+        logger.info("创建异步渲染服务连接池: %s", origin)
+        client = httpx.AsyncClient(http2=_http2_enabled(), timeout=_client_timeout(), limits=_limits())
+        clients[origin] = client
+    return client
+
+
+def close_clients():
+    """
+    关闭所有连接池
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _forget_clients_after_fork():
+    """
+    fork 出的子进程（例如 generate_diagram.py 的进程池）不能与父进程共用连接池中的套接字，
+    丢弃继承的客户端而不关闭它们，子进程第一次请求时重新创建
+    """
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+    _async_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_clients_after_fork)
+
+
+async def aclose_clients():
+    """
+    关闭当前事件循环中的所有异步连接池
+    """
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def fetch_image(url, timeout=None, fmt="png", body=None) -> Tuple[bytes, str]:
+    """
+    通过共享连接池请求渲染结果，整个响应体读入内存
+
+    Args:
+        url: 完整的PlantUML渲染URL；使用POST时为 {server}/{fmt}
+        timeout: 本次请求的超时时间（秒），默认使用连接池的超时配置
+        fmt: 输出格式，用于校验 Content-Type
+        body: PlantUML源码，不为None时以POST方式提交
+
+    Returns:
+        tuple: (渲染结果, Content-Type)
+
+    Raises:
+        PlantUMLServerError: 服务返回非200状态码
+        ValueError: 响应的 Content-Type 或大小不符合要求
+        httpx.HTTPError: 网络错误或超时
+    """
+    response = get_client(url).request(_method(body), url, timeout=_timeout(timeout), **_body_args(body))
+    content_type = _check_headers(response, fmt, response.content[:1024])
+    _check_chunk(response.content, 0, fmt, MAX_RENDER_BYTES)
+    return response.content, content_type
+
+
+async def fetch_image_async(url, timeout=None, fmt="png", body=None) -> Tuple[bytes, str]:
+    """
+    fetch_image 的异步版本，等待渲染服务期间不阻塞事件循环
+    """
+    response = await get_async_client(url).request(
+        _method(body), url, timeout=_timeout(timeout), **_body_args(body))
+    content_type = _check_headers(response, fmt, response.content[:1024])
+    _check_chunk(response.content, 0, fmt, MAX_RENDER_BYTES)
+    return response.content, content_type
+
+
+def fetch_to_file(url, path, timeout=None, fmt="png", max_bytes=MAX_RENDER_BYTES, body=None) -> Tuple[int, str]:
+    """
+    流式下载渲染结果到文件
+
+    响应体按块写入同一目录下的临时文件，下载完成后原子重命名为 path；
+    任何校验失败或网络错误都会删除临时文件，path 保持不变。
+
+    Args:
+        url: 完整的PlantUML渲染URL；使用POST时为 {server}/{fmt}
+        path: 目标文件路径
+        timeout: 本次请求的超时时间（秒），默认使用连接池的超时配置
+        fmt: 输出格式，用于校验 Content-Type 和文件头
+        max_bytes: 允许的最大响应体字节数
+        body: PlantUML源码，不为None时以POST方式提交
+
+    Returns:
+        tuple: (写入的字节数, Content-Type)
+    """
+    with get_client(url).stream(_method(body), url, timeout=_timeout(timeout), **_body_args(body)) as response:
+        if response.status_code != 200:
+            _check_headers(response, fmt, next(response.iter_bytes(1024), b""))
+        content_type = _check_headers(response, fmt, b"", max_bytes)
+        tmp_path = temp_path_for(path)
+        try:
+            size = 0
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_bytes(STREAM_CHUNK_SIZE):
+                    size = _check_chunk(chunk, size, fmt, max_bytes)
+                    f.write(chunk)
+            _check_chunk(b"", size, fmt, max_bytes)
+            os.replace(tmp_path, path)
+        except BaseException:
+            remove_quietly(tmp_path)
+            raise
+    return size, content_type
+
+
+async def fetch_to_file_async(url, path, timeout=None, fmt="png", max_bytes=MAX_RENDER_BYTES,
+                              body=None) -> Tuple[int, str]:
+    """
+    fetch_to_file 的异步版本，文件写入在线程池中执行
+    """
+    async with get_async_client(url).stream(
+            _method(body), url, timeout=_timeout(timeout), **_body_args(body)) as response:
+        if response.status_code != 200:
+            first = b""
+            async for first in response.aiter_bytes(1024):
+                break
+            _check_headers(response, fmt, first)
+        content_type = _check_headers(response, fmt, b"", max_bytes)
+        tmp_path = temp_path_for(path)
+        try:
+            size = 0
+            f = await asyncio.to_thread(open, tmp_path, 'wb')
+            try:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    size = _check_chunk(chunk, size, fmt, max_bytes)
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+            _check_chunk(b"", size, fmt, max_bytes)
+            await asyncio.to_thread(os.replace, tmp_path, path)
+        except BaseException:
+            remove_quietly(tmp_path)
+            raise
+    return size, content_type
+
+
+def _timeout(timeout):
+    return httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+
+
+def _method(body):
+    return "GET" if body is None else "POST"
+
+
+def _body_args(body):
+    if body is None:
+        return {}
+    return {"content": body.encode("utf-8"), "headers": {"Content-Type": "text/plain; charset=utf-8"}}
+
+
+def _check_headers(response, fmt, preview, max_bytes=None):
+    """
+    在读取响应体之前校验状态码、Content-Type 和 Content-Length
+
+    preview 是已读取的响应体开头部分，仅用于错误日志。
+    """
+    # 检查响应状态码
+    if response.status_code != 200:
+        logger.error("PlantUML服务返回错误: %s", response.status_code)
+        logger.error("响应内容: %s", preview.decode('utf-8', errors='replace'))
+        raise PlantUMLServerError(response.status_code)
+
+    # 检查响应内容是否为期望的格式
+    content_type = response.headers.get('Content-Type', '')
+    if not any(part in content_type for part in FORMAT_CONTENT_TYPES[fmt]):
+        logger.error("响应不是%s格式，Content-Type: %s", fmt, content_type)
+        raise ValueError("未收到有效的图像")
+
+    # 检查声明的大小
+    content_length = response.headers.get('Content-Length')
+    if max_bytes is not None and content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        logger.error("渲染结果过大: %s 字节，上限 %s 字节", content_length, max_bytes)
+        raise ValueError(f"渲染结果超过大小上限（{max_bytes} 字节）")
+
+    return content_type
+
+
+def _check_chunk(chunk, received, fmt, max_bytes):
+    """
+    校验一个数据块：第一个数据块检查文件头，并累计检查大小上限
+
+    chunk 为空时表示响应体已结束，用于检查空响应。
+
+    Returns:
+        int: 累计接收的字节数
+    """
+    if received == 0:
+        signatures = FORMAT_SIGNATURES[fmt]
+        if not chunk:
+            raise ValueError("渲染结果为空")
+        if signatures and not chunk.lstrip().startswith(signatures):
+            logger.error("渲染结果的文件头与%s格式不符: %r", fmt, chunk[:16])
+            raise ValueError("未收到有效的图像")
+    received += len(chunk)
+    if received > max_bytes:
+        logger.error("渲染结果超过大小上限: %s 字节", max_bytes)
+        raise ValueError(f"渲染结果超过大小上限（{max_bytes} 字节）")
+    return received
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: PlantUML文本编码与解码
+
+参考: https://plantuml.com/text-encoding
+
+编码流程为 UTF-8 -> 原始Deflate（不带zlib头和校验和）-> PlantUML字母表的base64。
+字母表转换通过 bytes.translate 一次性完成，不再逐字符拼接字符串。
+
+PlantUML服务用 ~1 前缀标记带zlib头的旧编码（HUFFMAN），原始Deflate的编码不能加 ~1 前缀。
+"""
+
+import base64
+import zlib
+
+# 标准base64的字符映射: ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/
+# PlantUML使用的字符映射: 0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_PLANTUML_ALPHABET = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_"
+
+_ENCODE_TABLE = bytes.maketrans(_BASE64_ALPHABET, _PLANTUML_ALPHABET)
+_DECODE_TABLE = bytes.maketrans(_PLANTUML_ALPHABET, _BASE64_ALPHABET)
+
+# 原始Deflate流（负的wbits表示不写zlib头和adler32校验）
+_RAW_DEFLATE_WBITS = -15
+
+
+def deflate(data, level=zlib.Z_DEFAULT_COMPRESSION):
+    """
+    使用原始Deflate格式压缩数据
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _RAW_DEFLATE_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def inflate(data):
+    """
+    解压原始Deflate数据
+    """
+    return zlib.decompress(data, _RAW_DEFLATE_WBITS)
+
+
+def plantuml_encode(text):
+    """
+    将PlantUML文本编码为URL安全的字符串
+
+    Args:
+        text: PlantUML代码
+
+    Returns:
+        str: PlantUML编码后的字符串（不含 ~1 前缀）
+    """
+    standard_b64 = base64.b64encode(deflate(text.encode('utf-8')))
+    return standard_b64.translate(_ENCODE_TABLE).rstrip(b'=').decode('ascii')
+
+
+def plantuml_decode(encoded):
+    """
+    将PlantUML编码字符串还原为PlantUML文本
+
+    Args:
+        encoded: plantuml_encode 的输出（原始Deflate），或带 ~1 前缀的旧编码（带zlib头）
+
+    Returns:
+        str: PlantUML代码
+
+    Raises:
+        zlib.error: 数据与前缀标记的格式不符
+    """
+    legacy = encoded.startswith("~1")
+    if legacy:
+        encoded = encoded[2:]
+    data = encoded.encode('ascii').translate(_DECODE_TABLE)
+    data += b'=' * (-len(data) % 4)
+    data = base64.b64decode(data, validate=True)
+    return (zlib.decompress(data) if legacy else inflate(data)).decode('utf-8')
@@ -0,0 +1,914 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 可插拔的渲染后端
+
+- HttpBackend: 通过HTTP调用一个或多个PlantUML服务（默认 plantuml.com），
+  支持多节点负载均衡、节点摘除与恢复、重试、熔断和对冲请求
+- LocalServerBackend: 在常驻子进程中运行 plantuml.jar 的 picoweb 服务，
+  JVM只启动一次，之后的渲染都走本机回环连接
+- LocalPoolBackend: 由多个 LocalServerBackend 组成的渲染进程池，
+  带任务排队、健康检查、崩溃或卡死进程的自动重启以及单任务超时
+- FallbackBackend: 主后端不可用时回退到备用后端
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import random
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import httpx
+
+from output_files import atomic_write, remove_quietly, temp_path_for
+from plantuml_client import (PlantUMLServerError, fetch_image, fetch_image_async, fetch_to_file,
+                             fetch_to_file_async)
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, RetryPolicy, is_retryable
+
+logger = logging.getLogger(__name__)
+
+# 当前调用上下文中最近一次渲染实际使用的后端的 endpoint，由 FallbackBackend 设置；
+# 回退到备用后端的结果要按备用后端的 endpoint 缓存，不能记在主后端名下
+served_endpoint: ContextVar[Optional[str]] = ContextVar("served_endpoint", default=None)
+
+
+class RenderBackend:
+    """
+    渲染后端接口
+
+    子类实现 render()；endpoint 用于区分不同后端的渲染缓存。
+    """
+
+    name = "base"
+    endpoint = ""
+
+    def render(self, encoded, fmt="png", source=None) -> bytes:
+        """
+        渲染PlantUML编码后的图表
+
+        Args:
+            encoded: plantuml_encode 的输出
+            fmt: 输出格式
+            source: 编码前的PlantUML源码，后端可以用它代替 encoded 提交（例如大型图表使用POST）
+
+        Returns:
+            bytes: 渲染结果
+        """
+        raise NotImplementedError
+
+    async def render_async(self, encoded, fmt="png", source=None) -> bytes:
+        """
+        render 的异步版本，默认在线程池中执行 render
+        """
+        return await asyncio.to_thread(self.render, encoded, fmt, source)
+
+    def render_to_file(self, encoded, fmt, path, source=None) -> int:
+        """
+        渲染并原子地写入 path，返回写入的字节数
+
+        默认实现先完整渲染到内存再写入；支持流式下载的后端应覆盖此方法。
+        """
+        content = self.render(encoded, fmt, source)
+        atomic_write(path, content)
+        return len(content)
+
+    async def render_to_file_async(self, encoded, fmt, path, source=None) -> int:
+        """
+        render_to_file 的异步版本，默认在线程池中执行 render_to_file
+        """
+        return await asyncio.to_thread(self.render_to_file, encoded, fmt, path, source)
+
+    def close(self):
+        """
+        释放后端占用的资源
+        """
+
+
+class Endpoint:
+    """
+    一个PlantUML服务节点及其被动健康统计
+
+    节点的熔断器即健康状态：连续失败后被摘除（open），冷却后放行一个试探请求（half-open），
+    试探成功即重新加入（closed）。
+    """
+
+    # 耗时指数加权移动平均的平滑系数
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, url, failure_threshold=0, reset_timeout=30.0):
+        self.url = url.rstrip("/")
+        self.breaker = CircuitBreaker(self.url, failure_threshold, reset_timeout)
+        self.latency = LatencyTracker()
+        self.ewma: Optional[float] = None
+        self.outstanding = 0
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+
+    def score(self):
+        """
+        延迟加权的负载分数：平均耗时 × (在途请求数 + 1)
+        """
+        return (self.ewma or 0.0) * (self.outstanding + 1)
+
+    def stats(self):
+        p95 = self.latency.percentile(95)
+        return {
+            "url": self.url,
+            "state": self.breaker.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": sum(self.errors.values()),
+            "errors_by_type": dict(self.errors),
+            "latency_ewma_ms": round(self.ewma * 1000, 2) if self.ewma is not None else None,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "ejections": self.breaker.stats()["opened"],
+        }
+
+
+class HttpBackend(RenderBackend):
+    """
+    通过HTTP调用一个或多个PlantUML服务渲染
+
+    多个服务时按 balance 策略分配请求：least-outstanding 选择在途请求最少的节点，
+    latency 按 平均耗时 × 在途请求数 的倒数加权随机选择。每个节点有自己的熔断器，
+    连续失败的节点被摘除，冷却后通过试探请求重新加入。
+
+    每次渲染按 RetryPolicy 对5xx和连接错误重试，重试优先换到其他节点；所有节点都被摘除时直接失败。
+    设置 hedge_delay 后，请求在最近成功耗时的p95（样本不足时为 hedge_delay）内没有完成时，
+    向 hedge_server（默认另一个节点，只有一个节点时为同一个）发出第二个请求，先成功的结果胜出。
+
+    编码结果超过 post_threshold 个字符且提供了源码时，改为 POST {server}/{fmt} 提交源码，
+    避免URL过长被服务拒绝；较短的图表仍使用GET，GET 返回414时也会改用POST重试一次。
+    """
+
+    name = "http"
+
+    BALANCE_POLICIES = ("least-outstanding", "latency")
+
+    # 对冲请求的最短等待时间（秒）
+    MIN_HEDGE_DELAY = 0.01
+
+    # 默认改用POST的编码长度（字符），多数服务和代理限制请求行在 8KB 以内
+    POST_THRESHOLD = 4000
+
+    def __init__(self, server, timeout=None, retry=None, failure_threshold=0, reset_timeout=30.0,
+                 hedge_delay=None, hedge_server=None, balance="least-outstanding", post_threshold=POST_THRESHOLD):
+        """
+        Args:
+            server: PlantUML服务地址，或多个服务地址的列表
+            timeout: 单次请求的超时时间（秒），默认使用连接池的连接和读取超时配置
+            retry: 重试策略，默认不重试
+            failure_threshold: 节点被摘除前的连续失败次数，0 表示不摘除
+            reset_timeout: 节点被摘除后等待多久放行试探请求（秒）
+            hedge_delay: 发出对冲请求前的初始等待时间（秒），None 表示不使用对冲请求
+            hedge_server: 对冲请求使用的PlantUML服务地址，默认从其他节点中选择
+            balance: 多节点的负载均衡策略，least-outstanding 或 latency
+            post_threshold: 编码结果超过该长度时改用POST提交源码，0 表示始终使用GET
+        """
+        if balance not in self.BALANCE_POLICIES:
+            raise ValueError(f"不支持的负载均衡策略: {balance}。支持的策略: {', '.join(self.BALANCE_POLICIES)}")
+        servers = [server] if isinstance(server, str) else list(server)
+        if not servers:
+            raise ValueError("至少需要一个PlantUML服务地址")
+        self.nodes = [Endpoint(url, failure_threshold, reset_timeout) for url in servers]
+        # 所有节点渲染结果相同，缓存键只使用第一个节点，增减节点不会使缓存失效
+        self.endpoint = self.nodes[0].url
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy(attempts=1)
+        self.balance = balance
+        self.post_threshold = post_threshold
+        self.hedge_delay = hedge_delay
+        self.hedge_node = Endpoint(hedge_server, failure_threshold, reset_timeout) if hedge_server else None
+        self.latency = LatencyTracker()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "posts": 0, "post_fallbacks": 0}
+
+    def url_for(self, encoded, fmt="png", server=None):
+        return f"{server or self.endpoint}/{fmt}/{encoded}"
+
+    def uses_post(self, encoded, source=None):
+        """
+        判断是否以POST方式提交源码
+        """
+        return source is not None and 0 < self.post_threshold < len(encoded)
+
+    def render(self, encoded, fmt="png", source=None):
+        return self._call(lambda server: self._fetch(fetch_image, encoded, fmt, server, source)[0])
+
+    async def render_async(self, encoded, fmt="png", source=None):
+        async def attempt(server):
+            content, _ = await self._fetch_async(fetch_image_async, encoded, fmt, server, source)
+            return content
+        return await self._call_async(attempt)
+
+    def render_to_file(self, encoded, fmt, path, source=None):
+        # 每次尝试写入各自的临时文件，胜出的结果再原子替换到 path
+        def attempt(server):
+            tmp_path = temp_path_for(path)
+            size, _ = self._fetch(fetch_to_file, encoded, fmt, server, source, tmp_path)
+            return size, tmp_path
+
+        size, tmp_path = self._call(attempt, cleanup=_remove_attempt_file)
+        _replace_attempt_file(tmp_path, path)
+        return size
+
+    async def render_to_file_async(self, encoded, fmt, path, source=None):
+        async def attempt(server):
+            tmp_path = temp_path_for(path)
+            size, _ = await self._fetch_async(fetch_to_file_async, encoded, fmt, server, source, tmp_path)
+            return size, tmp_path
+
+        size, tmp_path = await self._call_async(attempt, cleanup=_remove_attempt_file)
+        await asyncio.to_thread(_replace_attempt_file, tmp_path, path)
+        return size
+
+    def _fetch(self, fetch, encoded, fmt, server, source, *args):
+        """
+        用 fetch 请求一次渲染：编码结果过长时POST源码，GET返回414时改用POST
+        """
+        if self.uses_post(encoded, source):
+            self._count("posts")
+            return fetch(f"{server}/{fmt}", *args, timeout=self.timeout, fmt=fmt, body=source)
+        try:
+            return fetch(self.url_for(encoded, fmt, server), *args, timeout=self.timeout, fmt=fmt)
+        except PlantUMLServerError as e:
+            if e.status_code != 414 or source is None:
+                raise
+        self._note_post_fallback(encoded)
+        return fetch(f"{server}/{fmt}", *args, timeout=self.timeout, fmt=fmt, body=source)
+
+    async def _fetch_async(self, fetch, encoded, fmt, server, source, *args):
+        """_fetch 的异步版本"""
+        if self.uses_post(encoded, source):
+            self._count("posts")
+            return await fetch(f"{server}/{fmt}", *args, timeout=self.timeout, fmt=fmt, body=source)
+        try:
+            return await fetch(self.url_for(encoded, fmt, server), *args, timeout=self.timeout, fmt=fmt)
+        except PlantUMLServerError as e:
+            if e.status_code != 414 or source is None:
+                raise
+        self._note_post_fallback(encoded)
+        return await fetch(f"{server}/{fmt}", *args, timeout=self.timeout, fmt=fmt, body=source)
+
+    def _note_post_fallback(self, encoded):
+        self._count("posts")
+        self._count("post_fallbacks")
+        logger.warning("渲染URL过长（%s 个字符）被服务拒绝，改用POST提交源码", len(encoded))
+
+    def stats(self):
+        """
+        返回请求、重试、对冲、POST次数、最近耗时的p95以及每个节点的状态、耗时和错误统计
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            endpoints = [node.stats() for node in self.nodes]
+            if self.hedge_node is not None:
+                stats["hedge_endpoint"] = self.hedge_node.stats()
+        p95 = self.latency.percentile(95)
+        stats["p95_ms"] = round(p95 * 1000, 2) if p95 is not None else None
+        stats["balance"] = self.balance
+        stats["endpoints"] = endpoints
+        return stats
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _ordered(self, nodes):
+        """
+        按负载均衡策略排列候选节点，最优先的在前
+        """
+        if len(nodes) <= 1:
+            return nodes
+        with self._lock:
+            if self.balance == "least-outstanding":
+                return sorted(nodes, key=lambda node: (node.outstanding, node.ewma or 0.0, random.random()))
+            # 延迟加权随机：第一个节点按分数倒数加权抽取，其余按分数排序作为备选
+            weights = [1.0 / max(node.score(), 0.001) for node in nodes]
+            first = random.choices(nodes, weights=weights)[0]
+            rest = sorted((node for node in nodes if node is not first), key=Endpoint.score)
+        return [first] + rest
+
+    def _select(self, exclude=()):
+        """
+        选择一个健康的节点，优先避开 exclude 中的节点
+
+        只对返回的节点调用 breaker.allow()：半开节点的试探名额只由真正发出的请求占用。
+
+        Raises:
+            CircuitOpenError: 所有节点都已被摘除
+        """
+        preferred = [node for node in self.nodes if node not in exclude and node.breaker.available()]
+        fallback = [node for node in self.nodes if node in exclude and node.breaker.available()]
+        for node in self._ordered(preferred) + self._ordered(fallback):
+            try:
+                node.breaker.allow()
+                return node
+            except CircuitOpenError:
+                continue
+        # 所有节点都已被摘除，报告最早恢复的节点
+        errors = []
+        for node in self.nodes:
+            try:
+                node.breaker.allow()
+                return node
+            except CircuitOpenError as e:
+                errors.append(e)
+        raise min(errors, key=lambda error: error.retry_after)
+
+    def _hedge_target(self, primary):
+        """
+        选择对冲请求的节点，没有可用节点时返回None
+        """
+        try:
+            if self.hedge_node is not None:
+                self.hedge_node.breaker.allow()
+                return self.hedge_node
+            return self._select(exclude=(primary,))
+        except CircuitOpenError:
+            return None
+
+    def _retry_delay(self, error, started, delays):
+        """
+        返回重试前的等待时间，不应重试时返回None
+        """
+        if not is_retryable(error):
+            return None
+        delay = next(delays, None)
+        if delay is None or not self.retry.should_retry(error, started, delay):
+            return None
+        self._count("retries")
+        logger.warning("渲染请求失败，%.2f 秒后重试: %s: %s", delay, type(error).__name__, error)
+        return delay
+
+    def _call(self, attempt, cleanup=None):
+        started = time.monotonic()
+        delays = self.retry.delays()
+        tried = []
+        while True:
+            node = self._select(exclude=tried)
+            try:
+                if self.hedge_delay is None:
+                    return self._timed(attempt, node)
+                return self._hedged(attempt, node, cleanup)
+            except Exception as e:
+                tried.append(node)
+                delay = self._retry_delay(e, started, delays)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def _call_async(self, attempt, cleanup=None):
+        started = time.monotonic()
+        delays = self.retry.delays()
+        tried = []
+        while True:
+            node = self._select(exclude=tried)
+            try:
+                if self.hedge_delay is None:
+                    return await self._timed_async(attempt, node)
+                return await self._hedged_async(attempt, node, cleanup)
+            except Exception as e:
+                tried.append(node)
+                delay = self._retry_delay(e, started, delays)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def _begin(self, node):
+        with self._lock:
+            node.outstanding += 1
+            node.requests += 1
+            self._stats["requests"] += 1
+        return time.perf_counter()
+
+    def _finish(self, node, started, error=None):
+        """
+        记录一次请求的结果：更新节点的耗时和错误统计，并把健康状态反馈给节点的熔断器
+        """
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            node.outstanding -= 1
+            if error is None:
+                node.ewma = elapsed if node.ewma is None else node.ewma + Endpoint.EWMA_ALPHA * (elapsed - node.ewma)
+            else:
+                name = type(error).__name__
+                node.errors[name] = node.errors.get(name, 0) + 1
+        if error is None:
+            node.latency.record(elapsed)
+            self.latency.record(elapsed)
+            node.breaker.record_success()
+        elif is_retryable(error):
+            node.breaker.record_failure()
+        else:
+            # 服务有响应（例如语法错误），说明节点本身可用
+            node.breaker.record_success()
+
+    def _abandon(self, node):
+        with self._lock:
+            node.outstanding -= 1
+        node.breaker.release_probe()
+
+    def _timed(self, attempt, node):
+        started = self._begin(node)
+        try:
+            result = attempt(node.url)
+        except Exception as e:
+            self._finish(node, started, e)
+            raise
+        except BaseException:
+            self._abandon(node)
+            raise
+        self._finish(node, started)
+        return result
+
+    async def _timed_async(self, attempt, node):
+        started = self._begin(node)
+        try:
+            result = await attempt(node.url)
+        except Exception as e:
+            self._finish(node, started, e)
+            raise
+        except BaseException:
+            # 被取消的对冲请求不计入节点健康统计，但要归还它占用的试探名额
+            self._abandon(node)
+            raise
+        self._finish(node, started)
+        return result
+
+    def _hedge_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="plantuml-hedge")
+        return self._executor
+
+    def _hedge_after(self):
+        p95 = self.latency.percentile(95)
+        return max(self.MIN_HEDGE_DELAY, p95 if p95 is not None else self.hedge_delay)
+
+    def _hedged(self, attempt, node, cleanup):
+        executor = self._hedge_executor()
+        primary = executor.submit(self._timed, attempt, node)
+        try:
+            return primary.result(timeout=self._hedge_after())
+        except FutureTimeoutError:
+            pass
+
+        target = self._hedge_target(node)
+        if target is None:
+            return primary.result()
+        self._count("hedged")
+        secondary = executor.submit(self._timed, attempt, target)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winners = [future for future in done if future.exception() is None]
+            if not winners:
+                error = error or next(iter(done)).exception()
+                continue
+            if winners[0] is secondary:
+                self._count("hedge_wins")
+            # 落败的请求无法中途取消，完成后清理它的结果
+            for future in winners[1:] + list(pending):
+                if cleanup is not None:
+                    future.add_done_callback(lambda f: f.exception() is None and cleanup(f.result()))
+            return winners[0].result()
+        raise error
+
+    async def _hedged_async(self, attempt, node, cleanup):
+        primary = asyncio.ensure_future(self._timed_async(attempt, node))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self._hedge_after())
+            if done:
+                return primary.result()
+
+            target = self._hedge_target(node)
+            if target is None:
+                return await primary
+            self._count("hedged")
+            secondary = asyncio.ensure_future(self._timed_async(attempt, target))
+            pending.add(secondary)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                if not winners:
+                    error = error or next(iter(done)).exception()
+                    continue
+                if winners[0] is secondary:
+                    self._count("hedge_wins")
+                if cleanup is not None:
+                    for task in winners[1:]:
+                        cleanup(task.result())
+                return winners[0].result()
+            raise error
+        finally:
+            # 取消落败或仍在进行的请求，取消时 fetch_to_file_async 会删除自己的临时文件
+            for task in pending:
+                if task.done():
+                    continue
+                task.cancel()
+                if cleanup is not None:
+                    task.add_done_callback(
+                        lambda t: not t.cancelled() and t.exception() is None and cleanup(t.result()))
+
+
+def _remove_attempt_file(result):
+    remove_quietly(result[1])
+
+
+def _replace_attempt_file(tmp_path, path):
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _terminate(process):
+    """终止子进程，5秒内未退出时强制结束"""
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class LocalServerBackend(RenderBackend):
+    """
+    在常驻的 java -jar plantuml.jar -picoweb 子进程中渲染
+
+    子进程在第一次渲染时启动，退出后会在下一次渲染时自动重启。
+    """
+
+    name = "local"
+
+    def __init__(self, jar_path, java="java", startup_timeout=60.0, java_options=None, timeout=None):
+        """
+        Args:
+            jar_path: plantuml.jar 的路径
+            java: java可执行文件
+            startup_timeout: 等待picoweb服务就绪的最长时间（秒）
+            java_options: 额外的JVM参数列表
+            timeout: 单次渲染的超时时间（秒）
+        """
+        self.jar_path = jar_path
+        self.java = java
+        self.startup_timeout = startup_timeout
+        self.timeout = timeout
+        self.starts = 0
+        self.port = None
+        self.java_options = list(java_options or ["-Djava.awt.headless=true"])
+        self.endpoint = f"local:{os.path.abspath(jar_path)}"
+        self._process = None
+        self._http = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        """
+        启动picoweb子进程并等待端口就绪；已在运行时直接返回
+
+        子进程、端口和HTTP后端在端口就绪后才对其他线程可见，running 为真时一定可以渲染。
+        """
+        with self._lock:
+            if self.running:
+                return
+            if not os.path.isfile(self.jar_path):
+                raise RuntimeError(f"未找到plantuml.jar: {self.jar_path}")
+
+            port = _free_port()
+            command = [self.java, *self.java_options, "-jar", self.jar_path, f"-picoweb:{port}:127.0.0.1"]
+            logger.info("启动本地PlantUML渲染进程: %s", ' '.join(command))
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.starts += 1
+            try:
+                self._wait_ready(process, port)
+            except BaseException:
+                _terminate(process)
+                raise
+            # picoweb 只接受GET渲染请求，本机回环连接也没有URL长度限制
+            self._http = HttpBackend(f"http://127.0.0.1:{port}/plantuml", timeout=self.timeout, post_threshold=0)
+            self.port = port
+            self._process = process
+            logger.info("本地PlantUML渲染进程已就绪，耗时 %.2f 秒", time.perf_counter() - started)
+
+    def _wait_ready(self, process, port):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"本地PlantUML渲染进程启动失败，退出码: {process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"本地PlantUML渲染进程在 {self.startup_timeout} 秒内未就绪")
+
+    def _stop_process(self):
+        process, self._process = self._process, None
+        _terminate(process)
+
+    def healthy(self):
+        """
+        检查子进程是否存活且端口可连接
+        """
+        if not self.running:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=1.0):
+                return True
+        except OSError:
+            return False
+
+    def render(self, encoded, fmt="png", source=None):
+        if not self.running:
+            self.start()
+        return self._http.render(encoded, fmt)
+
+    async def render_async(self, encoded, fmt="png", source=None):
+        if not self.running:
+            await asyncio.to_thread(self.start)
+        return await self._http.render_async(encoded, fmt)
+
+    def render_to_file(self, encoded, fmt, path, source=None):
+        if not self.running:
+            self.start()
+        return self._http.render_to_file(encoded, fmt, path)
+
+    async def render_to_file_async(self, encoded, fmt, path, source=None):
+        if not self.running:
+            await asyncio.to_thread(self.start)
+        return await self._http.render_to_file_async(encoded, fmt, path)
+
+    def close(self):
+        with self._lock:
+            self._stop_process()
+
+
+class LocalPoolBackend(RenderBackend):
+    """
+    多个本地 plantuml.jar 渲染进程组成的进程池
+
+    调用方在空闲进程队列上排队等待；渲染超时的进程视为卡死并被终止，
+    连接失败或已退出的进程在下一次使用前重启。后台线程定期检查空闲进程的健康状态。
+    """
+
+    name = "local-pool"
+
+    def __init__(self, jar_path, workers=None, java="java", job_timeout=60.0,
+                 acquire_timeout=None, health_interval=10.0, startup_timeout=60.0):
+        """
+        Args:
+            jar_path: plantuml.jar 的路径
+            workers: 渲染进程数量，默认等于CPU核数
+            java: java可执行文件
+            job_timeout: 单个渲染任务的超时时间（秒）
+            acquire_timeout: 等待空闲进程的最长时间（秒），默认一直等待
+            health_interval: 健康检查间隔（秒），0 表示不做后台检查
+            startup_timeout: 等待单个进程就绪的最长时间（秒）
+        """
+        self.size = workers or os.cpu_count() or 1
+        self.endpoint = f"local:{os.path.abspath(jar_path)}"
+        self.acquire_timeout = acquire_timeout
+        self.health_interval = health_interval
+        self.workers = [
+            LocalServerBackend(jar_path, java=java, startup_timeout=startup_timeout, timeout=job_timeout)
+            for _ in range(self.size)
+        ]
+        self._idle: "queue.Queue[LocalServerBackend]" = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+        self._stats = {"jobs": 0, "failures": 0, "timeouts": 0}
+
+    def start(self):
+        """
+        并行启动所有渲染进程并开启健康检查线程
+        """
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            list(executor.map(lambda worker: worker.start(), self.workers))
+        self._ensure_health_monitor()
+
+    def _ensure_health_monitor(self):
+        if self.health_interval <= 0 or self._health_thread is not None:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._stop.clear()
+                self._health_thread = threading.Thread(
+                    target=self._health_loop, name="plantuml-pool-health", daemon=True)
+                self._health_thread.start()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            # 只检查当前空闲的进程，正在渲染的进程由单任务超时负责
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if worker.starts and not worker.healthy():
+                        logger.warning("本地渲染进程健康检查失败，正在重启 (端口 %s)", worker.port)
+                        worker.close()
+                        worker.start()
+                except (OSError, RuntimeError) as e:
+                    logger.error("重启本地渲染进程失败: %s", e)
+                finally:
+                    self._idle.put(worker)
+
+    def render(self, encoded, fmt="png", source=None):
+        return self._with_worker(lambda worker: worker.render(encoded, fmt))
+
+    def render_to_file(self, encoded, fmt, path, source=None):
+        return self._with_worker(lambda worker: worker.render_to_file(encoded, fmt, path))
+
+    def _with_worker(self, job):
+        """
+        取得一个空闲进程执行 job(worker)，超时或失败时终止该进程
+        """
+        self._ensure_health_monitor()
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"等待空闲渲染进程超时（{self.acquire_timeout} 秒）")
+        try:
+            result = job(worker)
+            with self._lock:
+                self._stats["jobs"] += 1
+            return result
+        except httpx.TimeoutException:
+            logger.warning("本地渲染任务超时，终止卡死的渲染进程 (端口 %s)", worker.port)
+            with self._lock:
+                self._stats["timeouts"] += 1
+            worker.close()
+            raise
+        except (OSError, RuntimeError, httpx.TransportError):
+            with self._lock:
+                self._stats["failures"] += 1
+            worker.close()
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def stats(self):
+        """
+        返回进程池的任务数、失败数、超时数和重启次数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["workers"] = self.size
+        stats["idle"] = self._idle.qsize()
+        stats["running"] = sum(1 for worker in self.workers if worker.running)
+        stats["restarts"] = sum(max(0, worker.starts - 1) for worker in self.workers)
+        return stats
+
+    def close(self):
+        self._stop.set()
+        if self._health_thread is not None:
+            self._health_thread.join(timeout=5)
+            self._health_thread = None
+        for worker in self.workers:
+            worker.close()
+
+
+class FallbackBackend(RenderBackend):
+    """
+    主后端不可用（启动失败、连接失败）时改用备用后端
+
+    PlantUML服务返回的错误（例如语法错误）不会触发回退。每次渲染把实际使用的后端的
+    endpoint 记录在 served_endpoint 中，调用者据此选择渲染缓存键。
+    """
+
+    UNAVAILABLE_ERRORS = (OSError, RuntimeError, httpx.TransportError)
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    @property
+    def endpoint(self):
+        return self.primary.endpoint
+
+    def render(self, encoded, fmt="png", source=None):
+        try:
+            result = self.primary.render(encoded, fmt, source)
+        except self.UNAVAILABLE_ERRORS as e:
+            self._falling_back(e)
+            return self.fallback.render(encoded, fmt, source)
+        served_endpoint.set(self.primary.endpoint)
+        return result
+
+    async def render_async(self, encoded, fmt="png", source=None):
+        try:
+            result = await self.primary.render_async(encoded, fmt, source)
+        except self.UNAVAILABLE_ERRORS as e:
+            self._falling_back(e)
+            return await self.fallback.render_async(encoded, fmt, source)
+        served_endpoint.set(self.primary.endpoint)
+        return result
+
+    def render_to_file(self, encoded, fmt, path, source=None):
+        try:
+            result = self.primary.render_to_file(encoded, fmt, path, source)
+        except self.UNAVAILABLE_ERRORS as e:
+            self._falling_back(e)
+            return self.fallback.render_to_file(encoded, fmt, path, source)
+        served_endpoint.set(self.primary.endpoint)
+        return result
+
+    async def render_to_file_async(self, encoded, fmt, path, source=None):
+        try:
+            result = await self.primary.render_to_file_async(encoded, fmt, path, source)
+        except self.UNAVAILABLE_ERRORS as e:
+            self._falling_back(e)
+            return await self.fallback.render_to_file_async(encoded, fmt, path, source)
+        served_endpoint.set(self.primary.endpoint)
+        return result
+
+    def _falling_back(self, error):
+        logger.warning("%s渲染后端不可用，回退到%s: %s", self.primary.name, self.fallback.name, error)
+        served_endpoint.set(self.fallback.endpoint)
+
+    def stats(self):
+        """
+        返回主后端和备用后端各自的统计信息
+        """
+        return {
+            name: backend.stats()
+            for name, backend in (("primary", self.primary), ("fallback", self.fallback))
+            if hasattr(backend, "stats")
+        }
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+def create_backend(kind, server, jar_path=None, java="java", fallback=True, workers=1, job_timeout=60.0,
+                   http_options=None):
+    """
+    根据配置创建渲染后端
+
+    Args:
+        kind: 后端类型，http 或 local
+        server: HTTP后端使用的PlantUML服务地址，或参与负载均衡的地址列表
+        jar_path: 本地后端使用的 plantuml.jar 路径
+        java: java可执行文件
+        fallback: 本地后端不可用时是否回退到HTTP后端
+        workers: 本地渲染进程数量，大于1时使用进程池，0 表示等于CPU核数
+        job_timeout: 本地单个渲染任务的超时时间（秒）
+        http_options: 传给 HttpBackend 的重试、熔断、对冲、负载均衡和POST阈值参数
+
+    Returns:
+        RenderBackend: 渲染后端
+    """
+    if kind == "http":
+        return HttpBackend(server, **(http_options or {}))
+    if kind != "local":
+        raise ValueError(f"不支持的渲染后端: {kind}。支持的后端: http, local")
+
+    jar_path = jar_path or "plantuml.jar"
+    if workers == 1:
+        backend = LocalServerBackend(jar_path, java=java, timeout=job_timeout)
+    else:
+        backend = LocalPoolBackend(jar_path, workers=workers or None, java=java, job_timeout=job_timeout)
+    atexit.register(backend.close)
+    if fallback:
+        return FallbackBackend(backend, HttpBackend(server, **(http_options or {})))
+    return backend
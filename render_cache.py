@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 基于内容寻址的渲染缓存
+
+缓存键由规范化后的PlantUML源码、输出格式和渲染服务地址共同计算得到。
+缓存分两级：内存中的LRU缓存，以及带容量和过期时间限制的磁盘缓存。
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from output_files import atomic_write, link_or_copy, remove_quietly, temp_path_for, write_if_changed
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_source(text):
+    """
+    规范化PlantUML源码，使语义相同的源码得到相同的缓存键
+
+    统一换行符、去除行尾空白以及首尾空行。
+    """
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def source_digest(text):
+    """
+    返回规范化后源码的SHA-256摘要，用于基于内容的输出文件名
+    """
+    return hashlib.sha256(normalize_source(text).encode('utf-8')).hexdigest()
+
+
+def make_cache_key(text, fmt, endpoint):
+    """
+    计算渲染结果的缓存键
+
+    Args:
+        text: PlantUML代码
+        fmt: 输出格式，例如 png
+        endpoint: 渲染服务地址
+
+    Returns:
+        str: 十六进制的SHA-256摘要
+    """
+    digest = hashlib.sha256()
+    for part in (fmt, endpoint, normalize_source(text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    两级渲染缓存：内存LRU + 磁盘
+
+    线程安全；磁盘层按最近使用时间淘汰（命中时更新文件的修改时间），过期时间也从最近一次使用算起。
+    磁盘层的索引和总大小只在第一次写入时扫描一次目录，之后随写入、命中和删除更新。
+    超过 max_item_bytes 的结果只进入磁盘层，并以硬链接或文件复制的方式读写，不会整体读入内存。
+    """
+
+    def __init__(self, max_entries=256, max_memory_bytes=64 * 1024 * 1024,
+                 cache_dir=None, max_disk_bytes=512 * 1024 * 1024, max_age=7 * 24 * 3600,
+                 max_item_bytes=4 * 1024 * 1024):
+        """
+        Args:
+            max_entries: 内存层最多保留的条目数
+            max_memory_bytes: 内存层最多占用的字节数
+            cache_dir: 磁盘层目录，为空时禁用磁盘层
+            max_disk_bytes: 磁盘层最多占用的字节数
+            max_age: 磁盘条目自最近一次使用起的最长保留时间（秒）
+            max_item_bytes: 进入内存层的单个结果的最大字节数
+        """
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_item_bytes = min(max_item_bytes, max_memory_bytes)
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age = max_age
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        # 磁盘条目: 路径 -> (大小, 最近使用时间)，按最近使用时间从旧到新排列；首次使用时从目录扫描
+        self._disk_index: "Optional[OrderedDict[str, Tuple[int, float]]]" = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def get(self, key) -> Optional[bytes]:
+        """
+        按缓存键读取渲染结果，未命中时返回None
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return data
+
+        data = self._disk_read(self._disk_lookup(key))
+        with self._lock:
+            if data is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            self._memory_put(key, data)
+        return data
+
+    def get_file(self, key, path) -> Optional[str]:
+        """
+        命中时把渲染结果原子写入 path；path 内容已相同时跳过写入，
+        磁盘层的大结果以硬链接方式提供（不支持时复制）
+
+        Returns:
+            str: 未命中时返回None，命中时返回 output_files 中的写入结果
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+        if data is not None:
+            return write_if_changed(path, data)
+
+        entry = self._disk_lookup(key)
+        action = None
+        if entry is not None:
+            disk_path, size = entry
+            if size <= self.max_item_bytes:
+                data = self._disk_read(entry)
+                if data is not None:
+                    action = write_if_changed(path, data)
+            else:
+                try:
+                    action = link_or_copy(disk_path, path)
+                except OSError as e:
+                    logger.warning("读取磁盘缓存失败: %s: %s", disk_path, e)
+        with self._lock:
+            if action is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            if data is not None:
+                self._memory_put(key, data)
+        return action
+
+    def put(self, key, data):
+        """
+        写入渲染结果到内存层和磁盘层
+        """
+        with self._lock:
+            self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    def put_file(self, key, path):
+        """
+        把已写入文件的渲染结果加入缓存，大结果只复制到磁盘层
+        """
+        size = os.path.getsize(path)
+        if size <= self.max_item_bytes:
+            with open(path, 'rb') as f:
+                self.put(key, f.read())
+            return
+        if not self.cache_dir or size > self.max_disk_bytes:
+            return
+        disk_path = self._disk_path(key)
+        os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+        if self._copy_file(path, disk_path):
+            self._disk_added(disk_path, size)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        返回命中、未命中和淘汰次数等统计信息
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            stats["disk_bytes"] = self._disk_bytes
+        return stats
+
+    def clear(self):
+        """
+        清空内存层（磁盘层保持不变）
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def _memory_put(self, key, data):
+        # 调用方必须持有self._lock
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        if len(data) > self.max_item_bytes:
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _disk_lookup(self, key):
+        """返回未过期的磁盘条目 (路径, 大小)，不存在或已过期时返回None"""
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if time.time() - st.st_mtime > self.max_age:
+            self._disk_remove(path)
+            with self._lock:
+                self._stats["expired"] += 1
+            return None
+        self._disk_touch(path, st.st_size)
+        return path, st.st_size
+
+    def _disk_touch(self, path, size):
+        """记录一次磁盘命中：更新文件的修改时间（重启后按它重建顺序）并移到索引末尾"""
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            if self._disk_index is None:
+                return
+            old = self._disk_index.pop(path, None)
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._disk_index[path] = (size, now)
+
+    def _disk_read(self, entry):
+        if entry is None:
+            return None
+        path = entry[0]
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("读取磁盘缓存失败: %s: %s", path, e)
+            return None
+
+    def _copy_file(self, src, dst):
+        """以流式复制的方式原子写入 dst"""
+        tmp_path = temp_path_for(dst)
+        try:
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, dst)
+            return True
+        except OSError as e:
+            remove_quietly(tmp_path)
+            logger.warning("复制缓存文件失败: %s -> %s: %s", src, dst, e)
+            return False
+
+    def _disk_put(self, key, data):
+        if not self.cache_dir or len(data) > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+        except OSError as e:
+            logger.warning("写入磁盘缓存失败: %s: %s", path, e)
+            return
+        self._disk_added(path, len(data))
+
+    def _disk_load_index(self):
+        # 第一次写入时在锁外扫描一次目录，按修改时间（最近使用时间）从旧到新建立索引
+        if self._disk_index is not None:
+            return
+        entries = sorted(self._scan_entries())
+        with self._lock:
+            if self._disk_index is None:
+                self._disk_index = OrderedDict((path, (size, mtime)) for mtime, size, path in entries)
+                self._disk_bytes = sum(size for _, size, _ in entries)
+
+    def _disk_added(self, path, size):
+        self._disk_load_index()
+        with self._lock:
+            old = self._disk_index.pop(path, None)
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._disk_index[path] = (size, time.time())
+            self._disk_evict()
+
+    def _disk_remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            entry = self._disk_index.pop(path, None) if self._disk_index is not None else None
+            if entry is not None:
+                self._disk_bytes -= entry[0]
+
+    def _scan_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _disk_evict(self):
+        # 调用方必须持有self._lock；从最久未使用的条目开始删除过期条目和超出容量的条目
+        now = time.time()
+        while self._disk_index:
+            path, (size, used) = next(iter(self._disk_index.items()))
+            expired = now - used > self.max_age
+            if not expired and self._disk_bytes <= self.max_disk_bytes:
+                break
+            del self._disk_index[path]
+            self._disk_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._stats["expired" if expired else "evictions"] += 1
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 渲染指标
+
+进程内的直方图和计数器，记录渲染流水线各阶段的耗时、输出大小、缓存命中和错误。
+直方图同时维护累计分桶（用于Prometheus文本格式导出）和最近样本窗口（用于计算p50/p95/p99），
+内存占用固定，与请求数无关。
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 耗时分桶上限（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 大小分桶上限（字节）
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
+
+# 直方图定义: 名称 -> (分桶, 说明)
+HISTOGRAMS = {
+    "encode_seconds": (LATENCY_BUCKETS, "PlantUML源码编码耗时"),
+    "queue_wait_seconds": (LATENCY_BUCKETS, "等待批量并发名额或渲染线程的时间"),
+    "render_seconds": (LATENCY_BUCKETS, "渲染后端（网络或本地进程）的渲染耗时，不含缓存命中"),
+    "request_seconds": (LATENCY_BUCKETS, "单次生成UML图的总耗时"),
+    "output_bytes": (SIZE_BUCKETS, "每个输出文件的字节数"),
+}
+
+# 计数器说明
+COUNTERS = {
+    "requests_total": "生成UML图的请求数",
+    "cache_hits_total": "渲染缓存命中次数",
+    "cache_misses_total": "渲染缓存未命中次数",
+    "coalesced_total": "合并到相同在途渲染的次数",
+    "session_unchanged_total": "图表会话中语义未变化而跳过渲染的次数",
+    "bytes_written_total": "写出的输出文件字节数",
+    "errors_total": "按阶段和异常类型统计的错误数",
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """
+    累计分桶直方图，附带最近 window 个样本用于计算分位数
+    """
+
+    def __init__(self, buckets, window=2048):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._recent: "deque[float]" = deque(maxlen=window)
+
+    def observe(self, value):
+        """
+        记录一个样本
+        """
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._recent.append(value)
+
+    def percentiles(self, pcts=PERCENTILES) -> Dict[str, Optional[float]]:
+        """
+        按最近样本窗口计算分位数（最近秩法）
+        """
+        samples = sorted(self._recent)
+        result = {}
+        for pct in pcts:
+            if samples:
+                rank = min(len(samples), max(1, math.ceil(pct / 100 * len(samples)))) - 1
+                result[f"p{pct}"] = samples[rank]
+            else:
+                result[f"p{pct}"] = None
+        return result
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """
+        返回样本数、总和、均值、最值和分位数
+        """
+        result = {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+        }
+        result.update(self.percentiles())
+        return result
+
+
+class Metrics:
+    """
+    线程安全的指标注册表
+
+    直方图名称必须在 HISTOGRAMS 中定义；计数器可以带标签，例如 errors_total{stage, type}。
+    """
+
+    def __init__(self, window=2048):
+        """
+        Args:
+            window: 每个直方图用于计算分位数的最近样本数
+        """
+        self.window = window
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._histograms = {name: Histogram(buckets, window) for name, (buckets, _) in HISTOGRAMS.items()}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def observe(self, name, value):
+        """
+        向直方图记录一个样本
+        """
+        with self._lock:
+            self._histograms[name].observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        """
+        增加计数器
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        """
+        记录 with 代码块的耗时（秒），代码块抛出异常时同样记录
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def counter(self, name, **labels) -> float:
+        """
+        读取计数器的当前值
+        """
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        """
+        清空所有指标
+        """
+        with self._lock:
+            self.started = time.time()
+            self._histograms = {name: Histogram(buckets, self.window) for name, (buckets, _) in HISTOGRAMS.items()}
+            self._counters.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        返回所有指标的快照
+
+        Returns:
+            dict: 各直方图的统计和分位数、计数器、缓存命中率、按类型统计的错误数和每秒请求数
+        """
+        with self._lock:
+            histograms = {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+            counters = dict(self._counters)
+            uptime = time.time() - self.started
+
+        flat: Dict[str, float] = {}
+        errors: Dict[str, float] = {}
+        for (name, labels), value in counters.items():
+            if name == "errors_total":
+                error_type = dict(labels).get("type", "unknown")
+                errors[error_type] = errors.get(error_type, 0) + value
+            flat[name] = flat.get(name, 0) + value
+
+        hits = flat.get("cache_hits_total", 0)
+        lookups = hits + flat.get("cache_misses_total", 0)
+        return {
+            "uptime_seconds": round(uptime, 3),
+            "requests_per_second": flat.get("requests_total", 0) / uptime if uptime > 0 else 0.0,
+            "cache_hit_rate": hits / lookups if lookups else None,
+            "errors_by_type": errors,
+            "counters": flat,
+            "histograms": histograms,
+        }
+
+    def prometheus_text(self, prefix="uml_") -> str:
+        """
+        以Prometheus文本格式（0.0.4）导出所有指标
+
+        Args:
+            prefix: 指标名前缀
+
+        Returns:
+            str: Prometheus文本格式的指标
+        """
+        lines = []
+        with self._lock:
+            for name, histogram in self._histograms.items():
+                metric = prefix + name
+                lines.append(f"# HELP {metric} {HISTOGRAMS[name][1]}")
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{_format_number(bound)}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {_format_number(histogram.sum)}")
+                lines.append(f"{metric}_count {histogram.count}")
+
+            for name, help_text in COUNTERS.items():
+                metric = prefix + name
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                series = sorted((labels, value) for (counter, labels), value in self._counters.items() if counter == name)
+                if not series:
+                    lines.append(f"{metric} 0")
+                for labels, value in series:
+                    lines.append(f"{metric}{_format_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{_escape_label(value)}"' for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def start_http_exporter(metrics, port, host="127.0.0.1"):
+    """
+    在后台线程中提供 /metrics（Prometheus文本格式）和 /metrics.json
+
+    Args:
+        metrics: Metrics 实例
+        port: 监听端口，0 表示随机端口
+        host: 监听地址，默认只监听本机
+
+    Returns:
+        ThreadingHTTPServer: 已启动的HTTP服务，调用 shutdown() 停止
+    """
+    # 只有启用导出时才需要 http.server，避免拖慢服务器启动
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = metrics.prometheus_text().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="uml-metrics-exporter", daemon=True)
+    thread.start()
+    logger.info("Prometheus指标导出已启动: http://%s:%s/metrics", host, server.server_address[1])
+    return server
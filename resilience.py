@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 渲染请求的容错策略
+
+- RetryPolicy: 对5xx、429和连接错误做带抖动的指数退避重试，总耗时受截止时间限制
+- CircuitBreaker: 连续失败达到阈值后熔断，熔断期间直接失败，冷却后放行一次试探请求
+- LatencyTracker: 记录最近的成功耗时，用其p95决定何时发出对冲请求
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, Optional
+
+import httpx
+
+from plantuml_client import PlantUMLServerError
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """渲染服务处于熔断状态，请求未发出"""
+
+    def __init__(self, name, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"渲染服务 {name} 暂时不可用（熔断中），{retry_after:.1f} 秒后重试")
+
+
+def is_retryable(error) -> bool:
+    """
+    判断错误是否值得重试：5xx、429、超时和连接错误
+
+    4xx（例如PlantUML语法错误）和响应校验失败不会重试。
+    """
+    if isinstance(error, PlantUMLServerError):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, httpx.TransportError)
+
+
+class RetryPolicy:
+    """
+    带完全抖动（full jitter）的指数退避重试策略
+    """
+
+    def __init__(self, attempts=3, base_delay=0.2, max_delay=5.0, deadline=60.0):
+        """
+        Args:
+            attempts: 最多尝试次数（含第一次），1 表示不重试
+            base_delay: 第一次重试前的最大等待时间（秒）
+            max_delay: 单次等待时间的上限（秒）
+            deadline: 从第一次尝试开始计算的总时间上限（秒），超过后不再重试
+        """
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def delays(self) -> Iterator[float]:
+        """
+        依次返回每次重试前的等待时间
+        """
+        for retry in range(self.attempts - 1):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def should_retry(self, error, started, delay) -> bool:
+        """
+        判断失败后是否重试：错误可重试且等待后仍在截止时间之内
+        """
+        return is_retryable(error) and time.monotonic() - started + delay < self.deadline
+
+
+class CircuitBreaker:
+    """
+    线程安全的熔断器
+
+    closed: 正常放行；连续 failure_threshold 次失败后进入 open。
+    open: 直接抛出 CircuitOpenError；reset_timeout 秒后进入 half-open。
+    half-open: 只放行一个试探请求，成功则回到 closed，失败则重新 open。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        """
+        Args:
+            name: 渲染服务名称，用于错误信息
+            failure_threshold: 触发熔断的连续失败次数，0 表示不熔断
+            reset_timeout: 熔断后等待多久放行试探请求（秒）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probing = False
+
+    def available(self) -> bool:
+        """
+        判断现在是否会放行请求，不占用半开状态的试探名额
+        """
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            self._maybe_half_open()
+            return self._state == self.CLOSED or (self._state == self.HALF_OPEN and not self._probing)
+
+    def allow(self):
+        """
+        请求发出前调用，熔断期间抛出 CircuitOpenError
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self._stats["rejected"] += 1
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        """
+        记录一次成功（包括服务正常返回的4xx）
+        """
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("渲染服务已恢复: %s", self.name)
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """
+        放弃请求（例如被取消的对冲请求）时调用：没有结果可以记录，归还半开状态的试探名额，
+        否则节点会一直停留在半开状态而不再放行任何请求
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probing = False
+
+    def record_failure(self):
+        """
+        记录一次可重试的失败
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats["opened"] += 1
+                    logger.warning("渲染服务连续失败 %s 次，暂停使用 %.1f 秒: %s",
+                                   self._failures, self.reset_timeout, self.name)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, object]:
+        """
+        返回当前状态、连续失败次数、熔断次数和被拒绝的请求数
+        """
+        with self._lock:
+            self._maybe_half_open()
+            return {"state": self._state, "consecutive_failures": self._failures, **self._stats}
+
+
+class LatencyTracker:
+    """
+    记录最近 window 次成功请求的耗时，用于计算对冲请求的等待时间
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples: "deque[float]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct) -> Optional[float]:
+        """
+        返回最近耗时的分位数，样本不足 min_samples 时返回None
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 合并相同的并发调用（single-flight）
+
+同一个键同时只执行一次调用，其余并发调用等待这次调用完成并共享它的结果或异常。
+同步调用（线程）和异步调用（协程）共用同一张在途调用表，两者之间也会合并。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class CoalescedCallCancelled(RuntimeError):
+    """负责执行的调用被取消，等待它的其他调用收到此异常"""
+
+
+class SingleFlight:
+    """
+    按键合并在途调用
+
+    用法:
+        flights = SingleFlight()
+        result, shared = flights.do(key, lambda: render(...))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, Future] = {}
+
+    def _join(self, key) -> Tuple[Future, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = Future()
+            self._calls[key] = call
+            return call, True
+
+    def _finish(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        """
+        返回当前在途的调用数
+        """
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行 func，或等待同一个键上正在进行的调用
+
+        Args:
+            key: 合并调用的键
+            func: 无参数的函数
+
+        Returns:
+            tuple: (结果, 是否共享了其他调用的结果)
+
+        Raises:
+            Exception: func 抛出的异常会传递给所有等待者
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return call.result(), True
+        try:
+            result = func()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            self._finish(key)
+
+    async def do_async(self, key, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        do 的异步版本，func 返回可等待对象；等待者不会阻塞事件循环
+        """
+        call, leader = self._join(key)
+        if not leader:
+            # shield: 等待者被取消时不能连带取消共享的调用
+            return await asyncio.shield(asyncio.wrap_future(call)), True
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # 取消只影响发起者自己，其他等待者收到普通异常
+            call.set_exception(CoalescedCallCancelled("合并的渲染调用已被取消"))
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            self._finish(key)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 启动耗时分析
+
+python uml_mcp_server.py --profile-startup 会在子进程中使用 -X importtime 导入服务器模块，
+按顶层包汇总导入耗时，并测量从启动服务器进程到收到 initialize 和 tools/list 响应的时间。
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# MCP握手使用的协议版本
+PROTOCOL_VERSION = "2024-11-05"
+
+
+def import_times(server_path) -> List[Tuple[str, int, int, int]]:
+    """
+    在新的解释器中导入服务器模块并收集 -X importtime 的输出
+
+    Args:
+        server_path: uml_mcp_server.py 的路径
+
+    Returns:
+        list: (模块名, 嵌套深度, 自身耗时微秒, 累计耗时微秒)
+    """
+    directory, filename = os.path.split(server_path)
+    module = os.path.splitext(filename)[0]
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             f"import sys; sys.path.insert(0, {directory!r}); import {module}"],
+            cwd=cwd, env=_server_env(), capture_output=True, text=True, check=True,
+        )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def by_package(entries) -> Dict[str, int]:
+    """
+    按顶层包汇总自身导入耗时（微秒）
+    """
+    totals: Dict[str, int] = defaultdict(int)
+    for name, _, self_us, _ in entries:
+        totals[name.split(".")[0]] += self_us
+    return dict(totals)
+
+
+def measure_startup(server_path, env=None, timeout=60.0) -> Dict[str, float]:
+    """
+    启动服务器进程，通过stdio完成MCP握手并列出工具
+
+    Args:
+        server_path: uml_mcp_server.py 的路径
+        env: 额外的环境变量
+        timeout: 整个过程的最长时间（秒），超时后终止服务器进程
+
+    Returns:
+        dict: initialize_ms（启动到收到initialize响应）、tools_list_ms（启动到收到工具列表）和 tools（工具数量）
+    """
+    with tempfile.TemporaryDirectory() as cwd:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, server_path], cwd=cwd, env=_server_env(env),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        watchdog = threading.Timer(timeout, process.kill)
+        watchdog.start()
+        try:
+            _send(process, {
+                "jsonrpc": "2.0", "id": 1, "method": "initialize",
+                "params": {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "capabilities": {},
+                    "clientInfo": {"name": "uml-startup-profile", "version": "1.0"},
+                },
+            })
+            _receive(process)
+            initialize_ms = (time.perf_counter() - started) * 1000
+
+            _send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            _send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+            tools = _receive(process)["result"]["tools"]
+            tools_list_ms = (time.perf_counter() - started) * 1000
+        finally:
+            watchdog.cancel()
+            process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+    return {"initialize_ms": initialize_ms, "tools_list_ms": tools_list_ms, "tools": len(tools)}
+
+
+def _server_env(extra=None):
+    env = dict(os.environ)
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    env.update(extra or {})
+    return env
+
+
+def _send(process, message):
+    process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+    process.stdin.flush()
+
+
+def _receive(process):
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError("服务器进程在响应之前退出")
+    return json.loads(line)
+
+
+def main(server_path, top=15) -> int:
+    """
+    打印导入耗时分解和首次响应时间
+
+    Returns:
+        int: 进程退出码
+    """
+    entries = import_times(server_path)
+    total_us = sum(cumulative for _, depth, _, cumulative in entries if depth == 0)
+
+    print(f"导入耗时合计: {total_us / 1000:.1f} ms（{len(entries)} 个模块）")
+    print("\n按顶层包汇总（自身耗时）:")
+    packages = sorted(by_package(entries).items(), key=lambda item: item[1], reverse=True)
+    for package, self_us in packages[:top]:
+        print(f"  {package:<32} {self_us / 1000:8.1f} ms  {self_us * 100 / max(total_us, 1):5.1f}%")
+
+    print("\n累计耗时最多的模块:")
+    slowest = sorted(entries, key=lambda entry: entry[3], reverse=True)
+    for name, depth, self_us, cumulative_us in slowest[:top]:
+        print(f"  {name:<48} 累计 {cumulative_us / 1000:8.1f} ms  自身 {self_us / 1000:7.1f} ms")
+
+    startup = measure_startup(server_path)
+    print(f"\n启动到 initialize 响应: {startup['initialize_ms']:.1f} ms")
+    print(f"启动到 tools/list 响应: {startup['tools_list_ms']:.1f} ms（{startup['tools']} 个工具）")
+    return 0
@@ -0,0 +1,16 @@
+"""
+pytest 配置：仓库根目录下的模块是平铺的，测试直接导入；导入MCP服务器前关闭磁盘缓存，
+日志写到临时目录
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("UML_LOG_DIR", tempfile.mkdtemp(prefix="uml-mcp-test-logs-"))
+os.environ["UML_CACHE_DIR"] = ""
+os.environ.setdefault("PLANTUML_SERVER", "http://127.0.0.1:9/plantuml")
@@ -0,0 +1,72 @@
+"""
+图表会话：语义规范化、结构差异和会话表
+"""
+
+import os
+
+from diagram_sessions import SessionStore, analyze_source, semantic_digest, structure_diff
+
+MODEL = "@startuml\nclass User {\n  +name: String\n}\nclass Order\nUser --> Order : places\n@enduml"
+
+
+def test_whitespace_and_comments_do_not_change_digest():
+    cosmetic = ("@startuml\n' 说明\nclass   User {\n\t+name: String\n}\n\n/' 草稿\n'/\nclass Order\n"
+                "User --> Order : places\n@enduml\n")
+    assert semantic_digest(cosmetic) == semantic_digest(MODEL)
+    assert semantic_digest(MODEL.replace("places", "pays")) != semantic_digest(MODEL)
+
+
+def test_quoted_whitespace_is_significant():
+    assert semantic_digest('@startuml\nA -> B : "a  b"\n@enduml') != semantic_digest('@startuml\nA -> B : "a b"\n@enduml')
+
+
+def test_structure_diff_reports_added_removed_and_changed():
+    _, before = analyze_source(MODEL, "class")
+    edited = MODEL.replace("+name: String", "+name: String\n  +email: String").replace(
+        "class Order\n", "class Invoice\n").replace("User --> Order", "User --> Invoice")
+    _, after = analyze_source(edited, "class")
+    diff = structure_diff(before, after)
+    assert diff["classes"] == {"added": ["Invoice"], "removed": ["Order"], "changed": ["User"]}
+    assert diff["relations"]["added"] == ["User -> Invoice"]
+    assert diff["relations"]["removed"] == ["User -> Order"]
+
+
+def test_sequence_participants_come_from_messages():
+    _, structure = analyze_source("@startuml\nAlice -> Bob : hi\n@enduml", "sequence")
+    assert set(structure["participants"]) == {"Alice", "Bob"}
+
+
+def test_unnamed_diagrams_have_no_session(tmp_path):
+    assert SessionStore.key_for(str(tmp_path)) is None
+    assert SessionStore.key_for(str(tmp_path), "") is None
+    assert SessionStore.key_for(str(tmp_path), "sub/model") == os.path.join(str(tmp_path), "model")
+
+
+def test_session_revisions_and_reuse(tmp_path):
+    store = SessionStore(max_sessions=2)
+    key = SessionStore.key_for(str(tmp_path), "model")
+    image = tmp_path / "model.png"
+    image.write_bytes(b"png")
+    result = {"artifacts": [{"format": "png", "local_path": str(image)}]}
+
+    digest, structure = analyze_source(MODEL, "class")
+    assert store.reuse(key, digest, ["png"]) is None
+    assert store.record(key, digest, structure, result).revision == 1
+    session, artifacts = store.reuse(key, digest, ["png"])
+    assert session.revision == 1 and artifacts[0]["local_path"] == str(image)
+    assert store.reuse(key, digest, ["svg"]) is None
+
+    edited_digest, edited_structure = analyze_source(MODEL + "\nclass Item", "class")
+    assert store.record(key, edited_digest, edited_structure, result).revision == 2
+
+    image.unlink()
+    assert store.reuse(key, edited_digest, ["png"]) is None
+
+
+def test_session_store_evicts_least_recently_used(tmp_path):
+    store = SessionStore(max_sessions=2)
+    digest, structure = analyze_source(MODEL, "class")
+    for name in ("a", "b", "c"):
+        store.record(SessionStore.key_for(str(tmp_path), name), digest, structure, {"artifacts": []})
+    assert store.get(SessionStore.key_for(str(tmp_path), "a")) is None
+    assert store.stats()["evictions"] == 1
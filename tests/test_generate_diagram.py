@@ -0,0 +1,63 @@
+"""
+generate_diagram.py 的渲染：URL使用新的编码器（不带 ~1），服务返回的错误页面不会被写成图像
+"""
+
+import os
+
+import httpx
+import pytest
+
+import generate_diagram
+import plantuml_client
+from plantuml_codec import plantuml_decode
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(64)
+CODE = "@startuml\nA -> B : é\n@enduml"
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    """模拟渲染服务：requests 记录请求的URL，response 决定返回内容"""
+    renderer = {"requests": [], "response": lambda: httpx.Response(200, headers={"Content-Type": "image/png"},
+                                                                   content=PNG)}
+
+    def handler(request):
+        renderer["requests"].append(str(request.url))
+        return renderer["response"]()
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(plantuml_client, "get_client", lambda url: client)
+    return renderer
+
+
+def test_render_to_path_uses_raw_deflate_url(renderer, tmp_path):
+    path = str(tmp_path / "sub" / "diagram.png")
+    assert generate_diagram.render_to_path((CODE, path)) == (path, None)
+    with open(path, "rb") as f:
+        assert f.read() == PNG
+    encoded = renderer["requests"][0].rsplit("/", 1)[1]
+    assert renderer["requests"][0].startswith(f"{generate_diagram.PLANTUML_SERVER}/png/")
+    assert plantuml_decode(encoded) == CODE
+
+
+@pytest.mark.parametrize("status, content_type, body", [
+    (200, "text/html", b"<html>error</html>"),
+    (200, "image/png", b"<html>error</html>"),
+    (400, "image/png", PNG),
+])
+def test_render_to_path_never_saves_error_pages(renderer, tmp_path, status, content_type, body):
+    renderer["response"] = lambda: httpx.Response(status, headers={"Content-Type": content_type}, content=body)
+    path = str(tmp_path / "diagram.png")
+    output, error = generate_diagram.render_to_path((CODE, path))
+    assert output == path and error
+    assert os.listdir(tmp_path) == []
+
+
+def test_generate_uml_image_rejects_error_pages(renderer, tmp_path):
+    renderer["response"] = lambda: httpx.Response(200, headers={"Content-Type": "text/html"}, content=b"<html/>")
+    assert generate_diagram.generate_uml_image(CODE, str(tmp_path)) is None
+    assert os.listdir(tmp_path) == []
+
+    renderer["response"] = lambda: httpx.Response(200, headers={"Content-Type": "image/png"}, content=PNG)
+    result = generate_diagram.generate_uml_image(CODE, str(tmp_path))
+    assert "~1" not in result["url"] and os.path.getsize(result["local_path"]) == len(PNG)
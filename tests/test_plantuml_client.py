@@ -0,0 +1,111 @@
+"""
+流式下载：按块写入临时文件后原子重命名，状态码、Content-Type、文件头和大小上限校验失败时不留下任何文件
+"""
+
+import asyncio
+import os
+
+import httpx
+import pytest
+
+import plantuml_client
+from plantuml_client import PlantUMLServerError, fetch_to_file, fetch_to_file_async
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(200 * 1024)
+URL = "http://renderer/png/SyfFKj2rKt3CoKnELR1Io4ZDoSa70000"
+
+
+def respond(body=PNG, status=200, content_type="image/png", chunked=False, fail_after=None):
+    """构造模拟渲染服务的处理函数；chunked 时不发送 Content-Length，fail_after 个数据块后连接中断"""
+
+    def chunks():
+        for i, start in enumerate(range(0, len(body), 64 * 1024)):
+            if fail_after is not None and i == fail_after:
+                raise httpx.ReadError("connection reset")
+            yield body[start:start + 64 * 1024]
+
+    async def async_chunks():
+        for chunk in chunks():
+            yield chunk
+
+    def handler(request):
+        content = body
+        if chunked or fail_after is not None:
+            content = async_chunks() if handler.use_async else chunks()
+        return httpx.Response(status, headers={"Content-Type": content_type}, content=content)
+
+    handler.use_async = False
+    return handler
+
+
+@pytest.fixture(params=["sync", "async"])
+def fetch(request, monkeypatch):
+    """以同步或异步方式调用 fetch_to_file，请求发到 httpx.MockTransport"""
+    mode = request.param
+
+    def run(handler, path, **kwargs):
+        handler.use_async = mode == "async"
+        transport = httpx.MockTransport(handler)
+        if mode == "sync":
+            monkeypatch.setattr(plantuml_client, "get_client", lambda url: httpx.Client(transport=transport))
+            return fetch_to_file(URL, str(path), **kwargs)
+
+        async def main():
+            async with httpx.AsyncClient(transport=transport) as client:
+                monkeypatch.setattr(plantuml_client, "get_async_client", lambda url: client)
+                return await fetch_to_file_async(URL, str(path), **kwargs)
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_streams_to_file(fetch, tmp_path, chunked):
+    path = tmp_path / "out.png"
+    size, content_type = fetch(respond(chunked=chunked), path)
+    assert size == len(PNG) and content_type == "image/png"
+    assert path.read_bytes() == PNG
+    assert os.listdir(tmp_path) == ["out.png"]
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_rejects_results_over_the_size_cap(fetch, tmp_path, chunked):
+    with pytest.raises(ValueError, match="大小上限"):
+        fetch(respond(chunked=chunked), tmp_path / "out.png", max_bytes=len(PNG) - 1)
+    assert os.listdir(tmp_path) == []
+
+
+def test_check_chunk_counts_across_chunks():
+    limit = plantuml_client.MAX_RENDER_BYTES
+    assert plantuml_client._check_chunk(PNG[:1024], 0, "png", limit) == 1024
+    assert plantuml_client._check_chunk(b"x" * 1024, limit - 1024, "png", limit) == limit
+    with pytest.raises(ValueError, match="大小上限"):
+        plantuml_client._check_chunk(b"x" * 1025, limit - 1024, "png", limit)
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (b"<html>Bad Request</html>", "text/html"),
+    (b"<html>Bad Request</html>", "image/png"),
+    (b"", "image/png"),
+])
+def test_rejects_non_image_responses(fetch, tmp_path, body, content_type):
+    with pytest.raises(ValueError):
+        fetch(respond(body, content_type=content_type), tmp_path / "out.png")
+    assert os.listdir(tmp_path) == []
+
+
+def test_error_status_raises_server_error(fetch, tmp_path):
+    with pytest.raises(PlantUMLServerError) as error:
+        fetch(respond(b"syntax error", status=400, content_type="text/plain"), tmp_path / "out.png")
+    assert error.value.status_code == 400
+    assert os.listdir(tmp_path) == []
+
+
+def test_interrupted_download_leaves_existing_file(fetch, tmp_path):
+    path = tmp_path / "out.png"
+    path.write_bytes(b"previous")
+    with pytest.raises(httpx.ReadError):
+        fetch(respond(fail_after=2), path)
+    assert path.read_bytes() == b"previous"
+    assert os.listdir(tmp_path) == ["out.png"]
@@ -0,0 +1,57 @@
+"""
+PlantUML编码器：往返一致，并能解码旧实现（带zlib头、~1 前缀）的编码；前缀与格式不符时报错
+"""
+
+import base64
+import random
+import zlib
+
+import pytest
+
+from plantuml_codec import plantuml_decode, plantuml_encode
+
+ALPHABET = "abcxyzABC019 {}->:\n\t\"'类图序列é€😀"
+
+_STANDARD = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_PLANTUML = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_"
+
+
+def legacy_encode(text):
+    """旧实现：zlib.compress（带zlib头）+ PlantUML字母表的base64"""
+    return base64.b64encode(zlib.compress(text.encode("utf-8"))).translate(
+        bytes.maketrans(_STANDARD, _PLANTUML)).decode("ascii")
+
+
+def random_texts(count=300, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 2048))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text", ["", "@startuml\nclass A\n@enduml", "类图 é€😀\r\n" * 100])
+def test_round_trip(text):
+    encoded = plantuml_encode(text)
+    assert not encoded.startswith("~")
+    assert plantuml_decode(encoded) == text
+
+
+def test_round_trip_random():
+    for text in random_texts():
+        assert plantuml_decode(plantuml_encode(text)) == text
+
+
+def test_encoding_is_url_safe():
+    encoded = plantuml_encode("".join(random_texts(1)[0]))
+    assert set(encoded) <= set(_PLANTUML.decode("ascii"))
+
+
+def test_decodes_legacy_encoding():
+    for text in random_texts(50, seed=1):
+        assert plantuml_decode("~1" + legacy_encode(text)) == text
+
+
+@pytest.mark.parametrize("text", ["@startuml\nclass A\n@enduml", "类图 é€😀\r\n" * 100])
+def test_prefix_must_match_framing(text):
+    with pytest.raises(zlib.error):
+        plantuml_decode("~1" + plantuml_encode(text))
+    with pytest.raises(zlib.error):
+        plantuml_decode(legacy_encode(text))
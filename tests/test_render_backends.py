@@ -0,0 +1,86 @@
+"""
+本地渲染进程：picoweb 就绪之前其他线程看不到它，不会把渲染请求发到还没监听的端口
+"""
+
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from plantuml_codec import plantuml_encode
+from render_backends import LocalServerBackend
+
+# 代替 java -jar plantuml.jar -picoweb:端口:地址 的脚本：延迟一段时间后才开始监听
+FAKE_PICOWEB = textwrap.dedent("""
+    import sys, time
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = b"\\x89PNG\\r\\n\\x1a\\n" + bytes(16)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _, host_port = sys.argv[-1].split(":", 1)
+    port, host = host_port.split(":")
+    time.sleep(float(sys.argv[1]))
+    HTTPServer((host, int(port)), Handler).serve_forever()
+""")
+
+
+@pytest.fixture
+def local_backend(tmp_path):
+    script = tmp_path / "picoweb.py"
+    script.write_text(FAKE_PICOWEB)
+    jar = tmp_path / "plantuml.jar"
+    jar.write_bytes(b"")
+    backend = LocalServerBackend(str(jar), java=sys.executable, java_options=[str(script), "0.5"],
+                                 startup_timeout=10)
+    yield backend
+    backend.close()
+
+
+def test_not_visible_before_ready(local_backend):
+    thread = threading.Thread(target=local_backend.start)
+    thread.start()
+    time.sleep(0.2)
+    assert not local_backend.running and local_backend.port is None
+    thread.join()
+    assert local_backend.running and local_backend.starts == 1
+
+
+def test_concurrent_first_renders_wait_for_readiness(local_backend):
+    encoded = plantuml_encode("@startuml\nA -> B\n@enduml")
+    results, errors = [], []
+
+    def render():
+        try:
+            results.append(local_backend.render(encoded))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=render) for _ in range(4)]
+    for i, thread in enumerate(threads):
+        thread.start()
+        time.sleep(0.1 * (i > 0))
+    for thread in threads:
+        thread.join()
+    assert errors == [] and len(results) == 4
+    assert local_backend.starts == 1
+
+
+def test_failed_start_leaves_backend_stopped(tmp_path):
+    jar = tmp_path / "plantuml.jar"
+    jar.write_bytes(b"")
+    backend = LocalServerBackend(str(jar), java=sys.executable, java_options=["-c", "import sys; sys.exit(3)"])
+    with pytest.raises(RuntimeError, match="3"):
+        backend.start()
+    assert not backend.running and backend.port is None
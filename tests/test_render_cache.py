@@ -0,0 +1,76 @@
+"""
+渲染缓存的磁盘层：按最近使用时间淘汰，索引只在第一次写入时扫描目录
+"""
+
+import os
+import time
+
+import pytest
+
+from render_cache import RenderCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(max_entries=0, cache_dir=str(tmp_path), max_disk_bytes=3 * 100, max_item_bytes=0)
+
+
+def disk_path(cache, key):
+    return cache._disk_path(key)
+
+
+def test_disk_hits_protect_entries_from_eviction(cache):
+    for key in ("a", "b", "c"):
+        cache.put(key * 4, bytes(100))
+        time.sleep(0.01)
+    assert cache.get("aaaa") is not None
+    cache.put("dddd", bytes(100))
+    assert cache.get("bbbb") is None
+    assert all(cache.get(key) is not None for key in ("aaaa", "cccc", "dddd"))
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["disk_bytes"] == 300
+
+
+def test_disk_hit_updates_mtime(cache):
+    cache.put("aaaa", bytes(10))
+    path = disk_path(cache, "aaaa")
+    os.utime(path, (time.time() - 3600, time.time() - 3600))
+    assert cache.get("aaaa") is not None
+    assert time.time() - os.path.getmtime(path) < 60
+
+
+def test_directory_is_scanned_once(cache, monkeypatch):
+    scans = []
+    scan = cache._scan_entries
+    monkeypatch.setattr(cache, "_scan_entries", lambda: scans.append(1) or scan())
+    for i in range(10):
+        cache.put(f"{i:04d}", bytes(100))
+    assert len(scans) == 1
+    assert cache.stats()["disk_bytes"] == 300
+    assert sum(len(files) for _, _, files in os.walk(cache.cache_dir)) == 3
+
+
+def test_index_is_rebuilt_from_mtimes(tmp_path):
+    first = RenderCache(max_entries=0, cache_dir=str(tmp_path), max_disk_bytes=300, max_item_bytes=0)
+    for key in ("aaaa", "bbbb", "cccc"):
+        first.put(key, bytes(100))
+    now = time.time()
+    for age, key in ((30, "aaaa"), (10, "bbbb"), (20, "cccc")):
+        os.utime(disk_path(first, key), (now - age, now - age))
+
+    second = RenderCache(max_entries=0, cache_dir=str(tmp_path), max_disk_bytes=300, max_item_bytes=0)
+    second.put("dddd", bytes(100))
+    assert second.get("aaaa") is None
+    second.put("eeee", bytes(100))
+    assert second.get("cccc") is None
+    assert second.get("bbbb") is not None
+
+
+def test_expired_entries_are_removed(tmp_path):
+    cache = RenderCache(max_entries=0, cache_dir=str(tmp_path), max_age=60, max_item_bytes=0)
+    cache.put("aaaa", bytes(10))
+    path = disk_path(cache, "aaaa")
+    os.utime(path, (time.time() - 120, time.time() - 120))
+    assert cache.get("aaaa") is None
+    assert not os.path.exists(path)
+    assert cache.stats()["expired"] == 1 and cache.stats()["disk_bytes"] == 0
@@ -0,0 +1,139 @@
+"""
+重试策略和熔断器
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from plantuml_client import PlantUMLServerError
+from render_backends import HttpBackend
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable
+
+
+def test_retry_delays_are_bounded_exponential():
+    policy = RetryPolicy(attempts=5, base_delay=0.1, max_delay=0.3)
+    delays = list(policy.delays())
+    assert len(delays) == 4
+    for retry, delay in enumerate(delays):
+        assert 0 <= delay <= min(0.3, 0.1 * 2 ** retry)
+
+
+def test_single_attempt_never_retries():
+    assert list(RetryPolicy(attempts=1).delays()) == []
+    assert list(RetryPolicy(attempts=0).delays()) == []
+
+
+def test_only_transient_errors_are_retried():
+    policy = RetryPolicy(deadline=10)
+    started = time.monotonic()
+    assert policy.should_retry(httpx.ConnectError("refused"), started, 0.1)
+    assert not policy.should_retry(ValueError("bad input"), started, 0.1)
+    assert not is_retryable(ValueError("bad input"))
+
+
+def test_server_errors_are_retried_client_errors_are_not():
+    assert is_retryable(PlantUMLServerError(503, "unavailable"))
+    assert not is_retryable(PlantUMLServerError(400, "syntax error"))
+
+
+def test_no_retry_past_deadline():
+    policy = RetryPolicy(deadline=1.0)
+    assert not policy.should_retry(httpx.ConnectError("refused"), time.monotonic() - 0.95, 0.1)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("stub", failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("stub", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_one_probe():
+    breaker = CircuitBreaker("stub", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.available()
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+
+
+def test_released_probe_can_be_taken_again():
+    breaker = CircuitBreaker("stub", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.allow()
+    assert not breaker.available()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.available()
+    breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("stub", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_zero_threshold_disables_breaker():
+    breaker = CircuitBreaker("stub", failure_threshold=0)
+    for _ in range(10):
+        breaker.record_failure()
+        breaker.allow()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def half_open(node):
+    node.breaker.record_failure()
+    time.sleep(node.breaker.reset_timeout + 0.01)
+    assert node.breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_select_claims_only_the_probe_it_uses():
+    backend = HttpBackend(["http://a", "http://b", "http://c"], failure_threshold=1, reset_timeout=0.05)
+    for node in backend.nodes:
+        half_open(node)
+    chosen = backend._select()
+    assert [node.breaker.available() for node in backend.nodes if node is not chosen] == [True, True]
+    assert not chosen.breaker.available()
+
+
+def test_cancelled_hedge_to_half_open_node_releases_probe():
+    backend = HttpBackend("http://primary", failure_threshold=1, reset_timeout=0.05, hedge_delay=0.02,
+                          hedge_server="http://hedge")
+    hedge = backend.hedge_node
+    half_open(hedge)
+
+    async def attempt(url):
+        await asyncio.sleep(0.1 if url == "http://primary" else 5)
+        return url
+
+    assert asyncio.run(backend._call_async(attempt)) == "http://primary"
+    assert backend.stats()["hedged"] == 1
+    assert hedge.outstanding == 0
+    assert hedge.breaker.state == CircuitBreaker.HALF_OPEN and hedge.breaker.available()
@@ -0,0 +1,162 @@
+"""
+合并在途调用：同一个键同时只执行一次，结果和异常共享给所有等待者，等待者被取消不影响共享的调用
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import CoalescedCallCancelled, SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def render():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "result"
+
+    with ThreadPoolExecutor(8) as pool:
+        leader = pool.submit(flights.do, "key", render)
+        started.wait()
+        waiters = [pool.submit(flights.do, "key", render) for _ in range(7)]
+        results = [leader.result()] + [waiter.result() for waiter in waiters]
+    assert len(calls) == 1
+    assert results[0] == ("result", False)
+    assert results[1:] == [("result", True)] * 7
+    assert flights.in_flight() == 0
+
+
+def test_concurrent_coroutines_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def render():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flights.do_async("key", render) for _ in range(8)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {result for result, _ in results} == {"result"}
+
+
+def test_different_keys_are_not_merged():
+    flights = SingleFlight()
+
+    async def render(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        return await asyncio.gather(*(flights.do_async(key, lambda key=key: render(key)) for key in "ab"))
+
+    assert asyncio.run(run()) == [("a", False), ("b", False)]
+
+
+def test_failure_reaches_every_waiter():
+    flights = SingleFlight()
+
+    async def render():
+        await asyncio.sleep(0.05)
+        raise ValueError("渲染失败")
+
+    async def run():
+        return await asyncio.gather(*(flights.do_async("key", render) for _ in range(4)), return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flights.in_flight() == 0
+
+
+def test_failure_reaches_waiting_threads():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def render():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("渲染失败")
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flights.do, "key", render)
+        started.wait()
+        waiter = pool.submit(flights.do, "key", render)
+        for future in (leader, waiter):
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def render():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def run():
+        leader = asyncio.create_task(flights.do_async("key", render))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flights.do_async("key", render))
+        other = asyncio.create_task(flights.do_async("key", render))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader, await other
+
+    assert asyncio.run(run()) == (("result", False), ("result", True))
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_fails_waiters_without_cancelling_them():
+    flights = SingleFlight()
+
+    async def render():
+        await asyncio.sleep(1)
+
+    async def run():
+        leader = asyncio.create_task(flights.do_async("key", render))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flights.do_async("key", render))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(CoalescedCallCancelled):
+            await waiter
+        assert leader.cancelled()
+
+    asyncio.run(run())
+    assert flights.in_flight() == 0
+
+
+def test_slot_is_cleared_after_the_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def render():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        first = await flights.do_async("key", render)
+        assert flights.in_flight() == 0
+        return first, await flights.do_async("key", render)
+
+    assert asyncio.run(run()) == ((1, False), (2, False))
+    with pytest.raises(ValueError):
+        flights.do("key", lambda: int("x"))
+    assert flights.in_flight() == 0
+    assert flights.do("key", lambda: 3) == (3, False)
@@ -0,0 +1,194 @@
+"""
+本地语法预检查：合法的图表没有误报，错误报告在正确的行号，类型不符只是警告
+"""
+
+import pytest
+
+from uml_lint import ERROR, WARNING, UMLSyntaxError, check, lint
+
+# 语法预检查的样例：合法的图表不能报告错误
+LINT_VALID = {
+    "class": """@startuml
+title 用户与订单
+skinparam classAttributeIconSize 0
+package shop {
+  abstract class Base<T> {
+    {abstract} +id(): T
+  }
+  class User {
+    -String name
+    +login()
+  }
+  interface Repository
+  enum Status {
+    NEW
+    PAID
+  }
+}
+note right of User
+  包含 { 和 -> 的说明文字
+end note
+Base <|-- User
+User "1" *-- "many" Order : places >
+User ..> Repository
+Repository <|.. SqlRepository
+Order -up-> Status
+Order o-- Item
+@enduml""",
+    "sequence": """@startuml
+autonumber
+actor 用户 as U
+participant "Web 应用" as Web
+participant Auth
+database DB
+U -> Web : 登录请求
+Web -> Auth ++ : 校验
+Auth -[#red]> DB : 查询
+DB --> Auth
+alt 成功
+  Auth -->> Web : token
+else 失败
+  Auth ->x Web
+end
+return 完成
+Web ->o U
+@enduml""",
+    "activity": """@startuml
+start
+:读取配置 {name} -> 值;
+if (配置有效?) then (是)
+  :渲染图表;
+else (否)
+  :报告错误;
+  stop
+endif
+while (还有图表?)
+  :处理下一个;
+endwhile
+fork
+  :写入缓存;
+fork again
+  :写入文件;
+end fork
+stop
+@enduml""",
+    "usecase": """@startuml
+left to right direction
+actor 用户
+rectangle 系统 {
+  usecase "生成图表" as UC1
+  (查看历史)
+}
+用户 --> UC1
+用户 --> (查看历史)
+UC1 .> (查看历史) : include
+@enduml""",
+    "state": """@startuml
+[*] --> 空闲
+state 渲染中 {
+  [*] --> 编码
+  编码 --> 请求
+}
+空闲 --> 渲染中 : 收到请求
+渲染中 --> [*]
+@enduml""",
+    "component": """@startuml
+component [MCP 服务器] as Server
+interface HTTP
+node 渲染节点 {
+  component PlantUML
+}
+Server -( HTTP
+HTTP - PlantUML
+Server ..> PlantUML : 渲染
+@enduml""",
+    "deployment": """@startuml
+node 服务器 {
+  artifact uml_mcp_server.py
+}
+cloud 互联网
+database 缓存
+服务器 --> 互联网
+服务器 -down-> 缓存
+@enduml""",
+    "object": """@startuml
+object user1 {
+  name = "张三"
+}
+object order1
+map 配置 {
+  port => 8080
+}
+user1 --> order1
+@enduml""",
+}
+
+# 有错误的图表: (请求的图表类型, 代码, 第一个错误的行号)
+LINT_INVALID = [
+    ("class", "@startuml\nclass User {\n  +name\n@enduml", 2),
+    ("class", "@startuml\nclass User\n}\n@enduml", 3),
+    ("class", "@startuml\nclass A\nA <-<- B\n@enduml", 3),
+    ("class", "@startuml\nclass A\nA -->[x]> B\n@enduml", 3),
+    ("sequence", "@startuml\nAlice ->-> Bob : hi\n@enduml", 2),
+    ("state", "@startuml\nnote left of A\n  没有结束的说明\n@enduml", 2),
+    ("class", "@startuml\nclass A\n@enduml\n@enduml", 4),
+    ("class", "@startuml\nclass A\n@startuml\nclass B\n@enduml", 3),
+]
+
+# 其他必须没有错误的写法：以声明关键字开头的隐式参与者、单行浮动说明、rnote/hnote 块、棒棒糖接口、
+# 带标签的旧版活动图箭头（-->[yes]）以及方向和样式组合的箭头（-down[#red]->）
+LINT_VALID_CASES = [
+    ("sequence", "@startuml\nState -> Store: save\n@enduml"),
+    ("sequence", "@startuml\nNode -> Cloud: ping\n@enduml"),
+    ("sequence", "@startuml\nComponent -> Registry: register\n@enduml"),
+    ("class", '@startuml\nclass A\nnote "说明" as N1\nN1 .. A\n@enduml'),
+    ("sequence", "@startuml\nA -> B\nrnote over A\n  说明\nendrnote\nhnote over B\n  说明\nendhnote\n@enduml"),
+    ("component", "@startuml\ncomponent A\nA ()- B\nA -() C\n@enduml"),
+    ("class", "@startuml\nclass A\nA ()- B\n@enduml"),
+    ("activity", '@startuml\n(*) --> "A"\n"A" -->[label] "B"\n"B" -->[yes] (*)\n@enduml'),
+    ("activity", '@startuml\n(*) --> "A"\nif "ok?" then\n  -->[yes] "B"\nelse\n  -->[no] "C"\nendif\n@enduml'),
+    ("class", "@startuml\nclass A\nclass B\nA -down[#red]-> B\nA -[#blue]up-> B\nA -left[#red,dashed]-> B\n@enduml"),
+]
+
+# 与请求的图表类型不符：只报告警告，不阻止渲染
+LINT_TYPE_MISMATCH = [
+    ("sequence", "@startuml\nclass User\nclass Order\nUser --> Order\n@enduml", 2),
+    ("class", "@startuml\nstart\n:步骤;\nstop\n@enduml", 2),
+    ("activity", "@startuml\nparticipant A\nA -> B\n@enduml", 2),
+]
+
+
+def _errors(issues):
+    return [issue for issue in issues if issue["severity"] == ERROR]
+
+
+@pytest.mark.parametrize("diagram_type", sorted(LINT_VALID))
+def test_valid_diagram_has_no_errors(diagram_type):
+    assert _errors(lint(LINT_VALID[diagram_type], diagram_type)) == []
+
+
+@pytest.mark.parametrize("diagram_type, code", LINT_VALID_CASES)
+def test_valid_case_has_no_issues(diagram_type, code):
+    assert lint(code, diagram_type) == []
+
+
+@pytest.mark.parametrize("diagram_type, code, line", LINT_INVALID)
+def test_invalid_diagram_reports_first_error_line(diagram_type, code, line):
+    errors = _errors(lint(code, diagram_type))
+    assert errors and errors[0]["line"] == line
+    with pytest.raises(UMLSyntaxError):
+        check(code, diagram_type)
+
+
+@pytest.mark.parametrize("diagram_type, code, line", LINT_TYPE_MISMATCH)
+def test_type_mismatch_is_only_a_warning(diagram_type, code, line):
+    issues = lint(code, diagram_type)
+    assert _errors(issues) == []
+    assert [(issue["line"], issue["severity"]) for issue in issues if "不符" in issue["message"]] == [(line, WARNING)]
+    check(code, diagram_type)
+
+
+def test_undeclared_participant_is_a_warning():
+    issues = lint("@startuml\nparticipant Alice\nparticipant Bob\nAlice -> Bobb : hi\n@enduml", "sequence")
+    assert [(issue["line"], issue["severity"]) for issue in issues] == [(4, WARNING)]
+    assert "Bobb" in issues[0]["message"]
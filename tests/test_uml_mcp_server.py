@@ -0,0 +1,146 @@
+"""
+MCP工具（使用不发出网络请求的渲染后端）
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import uml_mcp_server as server
+from render_backends import FallbackBackend, RenderBackend
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(16)
+
+
+class FakeBackend(RenderBackend):
+    """记录渲染次数的渲染后端；unavailable 时模拟服务不可用，latency 模拟渲染耗时（秒）"""
+
+    def __init__(self, endpoint="fake", unavailable=False, latency=0.0):
+        self.name = endpoint
+        self.endpoint = endpoint
+        self.unavailable = unavailable
+        self.latency = latency
+        self.renders = 0
+        self._lock = threading.Lock()
+
+    def render(self, encoded, fmt="png", source=None):
+        if self.unavailable:
+            raise OSError("unavailable")
+        time.sleep(self.latency)
+        with self._lock:
+            self.renders += 1
+        return PNG + source.encode("utf-8")
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(server, "_render_backend", backend)
+    server.render_cache.clear()
+    return backend
+
+
+def sequence(*lines):
+    return "@startuml\n" + "\n".join(lines) + "\n@enduml"
+
+
+def test_concurrent_renders_overlap(backend, tmp_path):
+    backend.latency = 0.3
+    calls = 8
+
+    async def run():
+        return await asyncio.gather(*(server.generate_uml("sequence", sequence(f"A -> B : {i}"), str(tmp_path))
+                                      for i in range(calls)))
+
+    start = time.perf_counter()
+    results = [json.loads(text) for text in asyncio.run(run())]
+    elapsed = time.perf_counter() - start
+    assert not any(result.get("error") for result in results) and backend.renders == calls
+    assert elapsed < calls * backend.latency / 3
+
+
+def test_identical_concurrent_renders_reach_backend_once(backend, tmp_path):
+    backend.latency = 0.2
+
+    async def run():
+        return await asyncio.gather(*(server.generate_uml_image_async(sequence("A -> B"), "sequence", str(tmp_path))
+                                      for _ in range(6)))
+
+    results = asyncio.run(run())
+    assert not any(result.get("error") for result in results)
+    assert backend.renders == 1
+
+
+def test_batch_items_with_same_name_do_not_overwrite(backend, tmp_path):
+    items = [
+        {"diagram_type": "sequence", "code": sequence("A -> B"), "name": "m"},
+        {"diagram_type": "sequence", "code": sequence("A -> C"), "name": "m"},
+        {"diagram_type": "sequence", "code": sequence("A -> B"), "name": "other"},
+    ]
+    batch = json.loads(asyncio.run(server.generate_uml_batch(items, str(tmp_path))))
+    paths = [result["local_path"] for result in batch["results"]]
+    assert batch["failed"] == 0 and len(set(paths)) == 3
+    assert [result.get("name_collision", False) for result in batch["results"]] == [True, True, False]
+    assert os.path.basename(paths[2]) == "other.png"
+    for item, path in zip(items, paths):
+        with open(path, "rb") as f:
+            assert f.read().endswith(item["code"].encode("utf-8"))
+    assert backend.renders == 2
+
+
+def test_unnamed_diagrams_do_not_share_a_session(backend, tmp_path):
+    first = json.loads(asyncio.run(server.generate_uml("sequence", sequence("A -> B"), str(tmp_path))))
+    second = json.loads(asyncio.run(server.generate_uml("sequence", sequence("C -> D"), str(tmp_path))))
+    for result in (first, second):
+        assert result["session"]["key"] is None and result["session"]["diff"] is None
+    assert first["local_path"] != second["local_path"]
+
+
+def test_named_session_reuses_cosmetic_edits(backend, tmp_path):
+    code = sequence("A -> B : hi")
+    first = json.loads(asyncio.run(server.generate_uml("sequence", code, str(tmp_path), name="s")))
+    second = json.loads(asyncio.run(server.generate_uml("sequence", code.replace("A -> B", "' note\nA  ->  B"),
+                                                        str(tmp_path), name="s")))
+    assert second["session"]["unchanged"] and second["session"]["revision"] == first["session"]["revision"]
+    third = json.loads(asyncio.run(server.generate_uml("sequence", sequence("A -> B : hi", "B -> C"),
+                                                       str(tmp_path), name="s")))
+    assert third["session"]["revision"] == first["session"]["revision"] + 1
+    assert third["session"]["diff"]["participants"]["added"] == ["C"]
+    assert backend.renders == 2
+
+
+@pytest.mark.parametrize("render", ["sync", "async"])
+def test_fallback_render_is_cached_under_serving_backend(monkeypatch, tmp_path, render):
+    primary = FakeBackend("primary", unavailable=True)
+    fallback = FakeBackend("fallback")
+    monkeypatch.setattr(server, "_render_backend", FallbackBackend(primary, fallback))
+    server.render_cache.clear()
+    code = sequence("A -> B")
+    if render == "sync":
+        result = server.generate_uml_image(code, "sequence", str(tmp_path))
+    else:
+        result = asyncio.run(server.generate_uml_image_async(code, "sequence", str(tmp_path)))
+    assert not result.get("error")
+    assert server.render_cache.get(server.make_cache_key(code, "png", "primary")) is None
+    assert server.render_cache.get(server.make_cache_key(code, "png", "fallback")) is not None
+
+
+@pytest.mark.parametrize("line", ["State -> Store : save", "Node -> Cloud : push", "Component -> Registry : pull"])
+def test_keyword_prefixed_participants_are_rendered(backend, tmp_path, line):
+    result = json.loads(asyncio.run(server.generate_uml("sequence", sequence(line), str(tmp_path))))
+    assert not result.get("error") and backend.renders == 1
+
+
+def test_urls_carry_raw_deflate_without_legacy_prefix(backend, tmp_path):
+    from plantuml_codec import plantuml_decode
+    from render_backends import HttpBackend
+
+    code = sequence("A -> B")
+    result = server.generate_uml_image(code, "sequence", str(tmp_path))
+    encoded = result["url"].rsplit("/", 1)[1]
+    assert plantuml_decode(encoded) == code
+    assert HttpBackend("http://renderer").url_for(encoded) == f"http://renderer/png/{encoded}"
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+UML-MCP-Server: 本地PlantUML语法预检查
+
+在发出渲染请求之前逐行检查明显的错误，避免把注定失败的图表发给渲染服务：
+@startuml/@enduml 是否配对、{} 是否平衡、箭头形式是否合法、时序图中的参与者是否声明，
+以及代码内容与请求的图表类型是否明显不符。
+
+检查只基于逐行的正则匹配，宁可漏报也不误报：error 会阻止渲染，warning 只随结果返回。
+"""
+
+import re
+from typing import Dict, List, Optional
+
+ERROR = "error"
+WARNING = "warning"
+
+# 箭头两端的装饰（左端、右端），包括 IE 表示法的基数符号和组件图的接口符号
+# 组件图和类图的棒棒糖接口写作 ()- 和 -()
+_ARROW_HEAD = r"(?:<\|?|<<|\*|o|#|x|\}|\+|\^|//?|\\\\?|\|o|\|\||\}o|\}\||\(\)|0?\)|\(0?)?"
+_ARROW_TAIL = r"(?:\|?>>?|>o|>x|\*|o|#|x|\{|\+|\^|//?|\\\\?|o\||\|\||o\{|\|\{|\(\)|\(0?|0?\))?"
+# 箭头主体：线条、颜色或样式 [..]、方向（可以紧跟样式，例如 -down[#red]->）和组件图的接口符号
+_ARROW_BODY = (r"[-.=~]+(?:\[[^\]]*\])?"
+               r"(?:(?:left|right|up|down|le|ri|do|l|r|u|d|\(0\)|\(0|0\)|\(|\)|0)(?:\[[^\]]*\])?[-.=~]+)?"
+               r"(?:\[[^\]]*\])?[-.=~]*")
+# 旧版活动图的箭头可以在末尾带标签，例如 -->[yes]
+_ARROW_LABEL = r"(?:\[[^\]]*\])?"
+ARROW = re.compile(_ARROW_HEAD + _ARROW_BODY + _ARROW_TAIL + _ARROW_LABEL + r"$")
+
+_ENDPOINT = r"(?:\"[^\"]+\"|\(\s*[^)]+\)|\[[^\]]+\]|:[^:]+:|[\w.$@]+)"
+_NAME = r"(?:\"[^\"]+\"|[\w.$@]+)"
+
+# 两端之间用空白分隔的记号，由箭头符号组成时必须是合法的箭头
+_SPACED_RELATION = re.compile(
+    r"^" + _ENDPOINT + r"\s+(?:\"[^\"]*\"\s+)?(?P<token>\S+)\s+(?:\"[^\"]*\"\s+)?" + _ENDPOINT + r"(?:\s|:|$)")
+_ARROW_LIKE = re.compile(r"^[<>|*o#x{}+^/\\()0]*[-.=~][-.=~<>|*o#x{}+^/\\()0\[\]\w]*$")
+
+# 时序图的消息：参与者 箭头 参与者 [: 文本]
+_MESSAGE = re.compile(
+    r"^(?P<left>" + _NAME + r")\s*(?P<arrow>" + _ARROW_HEAD + r"[-.=]+(?:\[[^\]]*\])?[-.=]*" + _ARROW_TAIL + r")"
+    r"\s*(?P<right>" + _NAME + r")\s*(?:[+-]{2}|\*\*|!!)?\s*(?::.*)?$")
+_PARTICIPANT = re.compile(
+    r"^(?:participant|actor|boundary|control|entity|database|collections|queue|create(?:\s+\w+)?)\s+"
+    r"(?P<name>" + _NAME + r")(?:\s+as\s+(?P<alias>" + _NAME + r"))?", re.IGNORECASE)
+
+# 多行块: 开始 -> 结束，块内是自由文本，不做检查；所有开始模式合并为一个正则，按分组名找到结束模式
+# 单行的 note "文本" as N1 不是多行块
+_BLOCKS = {
+    "note": (r"[rh]?note\b(?!.*:)(?!\s+\"[^\"]*\"\s+as\s)", r"^end\s?[rh]?note$"),
+    "legend": (r"legend\b", r"^end\s?legend$"),
+    "header": (r"header$", r"^end\s?header$"),
+    "footer": (r"footer$", r"^end\s?footer$"),
+    "title": (r"title$", r"^end\s?title$"),
+    "style": (r"<style>", r"</style>$"),
+}
+_BLOCK_START = re.compile("|".join(f"(?P<{name}>{start})" for name, (start, _) in _BLOCKS.items()), re.IGNORECASE)
+_BLOCK_END = {name: re.compile(end, re.IGNORECASE) for name, (_, end) in _BLOCKS.items()}
+
+# 只会出现在某一类图中的语句，分组名的前缀是图表类型；
+# *_declaration 的关键字之后是箭头时（例如时序图中隐式的参与者 State -> Store）不算
+_SIGNALS = {
+    "sequence_declaration": r"(?:participant|boundary|control|collections|queue)\s",
+    "sequence_lifeline": r"(?:autonumber|activate|deactivate|destroy)\b",
+    "sequence_group": r"(?:alt|opt|loop|par|critical)\b",
+    "class_declaration": r"(?:abstract\s+class|class|enum|annotation|struct)\s",
+    "activity_keyword": r"(?:start|stop|endif|endwhile|end fork|detach|kill)$",
+    "activity_control": r"(?:if\s*\(.*\)\s*then|while\s*\(|fork$|repeat$)",
+    "usecase_declaration": r"usecase\s",
+    "state_declaration": r"state\s",
+    "component_declaration": r"component\s",
+    "deployment_declaration": r"(?:node|cloud|artifact|storage)\s",
+    "object_declaration": r"(?:object|map)\s",
+}
+_SIGNAL = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _SIGNALS.items()), re.IGNORECASE)
+
+# 请求的图表类型 -> 可以同时出现的图表类型
+COMPATIBLE_TYPES = {
+    "class": {"class", "object"},
+    "object": {"object", "class"},
+    "sequence": {"sequence"},
+    "activity": {"activity"},
+    "usecase": {"usecase"},
+    "state": {"state"},
+    "component": {"component", "deployment", "usecase"},
+    "deployment": {"deployment", "component", "usecase"},
+}
+
+
+class UMLSyntaxError(ValueError):
+    """预检查发现了会导致渲染失败的错误"""
+
+    def __init__(self, issues):
+        self.issues = issues
+        errors = [issue for issue in issues if issue["severity"] == ERROR]
+        super().__init__("PlantUML语法检查失败: " + "; ".join(format_issue(issue) for issue in errors))
+
+
+def format_issue(issue) -> str:
+    """
+    格式化为 "第N行: 说明"
+    """
+    return f"第{issue['line']}行: {issue['message']}"
+
+
+def _issue(issues, line, severity, message):
+    issues.append({"line": line, "severity": severity, "message": message})
+
+
+def lint(code, diagram_type=None) -> List[Dict[str, object]]:
+    """
+    检查PlantUML代码
+
+    Args:
+        code: 补全了 @startuml/@enduml 的PlantUML代码
+        diagram_type: 请求的图表类型，None 表示不检查类型是否相符
+
+    Returns:
+        list: 问题列表，每项包含 line（从1开始的行号）、severity（error 或 warning）和 message
+    """
+    issues: List[Dict[str, object]] = []
+    started: Optional[int] = None
+    ended = False
+    braces: List[int] = []
+    block_end = None
+    block_line = 0
+    in_comment = False
+    preprocessed = False
+    statements = []
+    signals: Dict[str, int] = {}
+
+    for number, raw in enumerate(code.splitlines(), 1):
+        line = raw.strip()
+        if in_comment:
+            if "'/" in line:
+                in_comment = False
+                line = line[line.index("'/") + 2:].strip()
+            else:
+                continue
+        if line.startswith("/'"):
+            if "'/" not in line[2:]:
+                in_comment = True
+            continue
+        if not line or line.startswith("'"):
+            continue
+
+        if line.startswith("@startuml"):
+            if started is not None and not ended:
+                _issue(issues, number, ERROR, f"第{started}行的 @startuml 缺少对应的 @enduml")
+            elif ended:
+                _issue(issues, number, WARNING, "只会渲染第一个 @startuml ... @enduml 图")
+            started, ended = number, False
+            continue
+        if line.startswith("@enduml"):
+            if started is None or ended:
+                _issue(issues, number, ERROR, "@enduml 之前没有 @startuml")
+            ended = True
+            continue
+        if started is None or ended:
+            continue
+
+        if block_end is not None:
+            if block_end.search(line):
+                block_end = None
+            continue
+        block = _BLOCK_START.match(line)
+        if block is not None:
+            block_end, block_line = _BLOCK_END[block.lastgroup], number
+            continue
+        if line.startswith("!"):
+            # 预处理指令（!include、!define 等）可能引入声明，参与者检查不再可靠
+            preprocessed = True
+            continue
+        if line.startswith(":"):
+            # 活动图的动作文本可以包含任意字符
+            continue
+
+        if line.startswith("}"):
+            if braces:
+                braces.pop()
+            else:
+                _issue(issues, number, ERROR, "多余的 }，没有对应的 {")
+        if line.endswith("{") and not line.startswith("}"):
+            braces.append(number)
+
+        signal = _SIGNAL.match(line)
+        if signal is not None and not _is_implicit_name(signal, line):
+            signals.setdefault(signal.lastgroup.split("_", 1)[0], number)
+        elif "[*]" in line:
+            signals.setdefault("state", number)
+
+        relation = _SPACED_RELATION.match(line)
+        if relation and _ARROW_LIKE.match(relation.group("token")) and not ARROW.match(relation.group("token")):
+            _issue(issues, number, ERROR, f"无法识别的箭头: {relation.group('token')}")
+        statements.append((number, line))
+
+    if started is None:
+        _issue(issues, 1, ERROR, "缺少 @startuml")
+    elif not ended:
+        _issue(issues, started, ERROR, "@startuml 缺少对应的 @enduml")
+    if block_end is not None:
+        _issue(issues, block_line, ERROR, "多行块没有结束（例如缺少 end note）")
+    for number in braces:
+        _issue(issues, number, ERROR, "{ 没有对应的 }")
+
+    if diagram_type in COMPATIBLE_TYPES and signals:
+        compatible = COMPATIBLE_TYPES[diagram_type]
+        if not compatible & signals.keys():
+            # 类型判断只基于关键字，可能误判，只作为警告
+            kind, number = min(signals.items(), key=lambda item: item[1])
+            _issue(issues, number, WARNING, f"代码看起来是 {kind} 图，与请求的 {diagram_type} 图类型不符")
+
+    if (diagram_type == "sequence" or "sequence" in signals) and not preprocessed:
+        _check_participants(statements, issues)
+
+    issues.sort(key=lambda issue: issue["line"])
+    return issues
+
+
+def _is_implicit_name(signal, line) -> bool:
+    """
+    声明关键字之后没有名称、或紧跟着箭头时，关键字只是隐式参与者或元素的名称（State -> Store）
+    """
+    if not signal.lastgroup.endswith("_declaration"):
+        return False
+    rest = line[signal.end():].split(None, 1)
+    return not rest or bool(_ARROW_LIKE.match(rest[0]))
+
+
+def _check_participants(statements, issues):
+    """
+    时序图显式声明了参与者时，报告消息中未声明的参与者
+    """
+    declared = set()
+    messages = []
+    for number, line in statements:
+        participant = _PARTICIPANT.match(line)
+        if participant:
+            declared.add(participant.group("name").strip('"'))
+            if participant.group("alias"):
+                declared.add(participant.group("alias").strip('"'))
+            continue
+        message = _MESSAGE.match(line)
+        if message:
+            messages.append((number, message.group("left").strip('"'), message.group("right").strip('"')))
+    if not declared:
+        return
+    reported = set()
+    for number, *names in messages:
+        for name in names:
+            if name not in declared and name not in reported:
+                reported.add(name)
+                _issue(issues, number, WARNING, f"参与者 {name} 没有声明，PlantUML会自动创建它，请确认不是拼写错误")
+
+
+def check(code, diagram_type=None) -> List[Dict[str, object]]:
+    """
+    检查PlantUML代码，有错误时抛出 UMLSyntaxError
+
+    Returns:
+        list: 只包含警告的问题列表
+
+    Raises:
+        UMLSyntaxError: 发现会导致渲染失败的错误
+    """
+    issues = lint(code, diagram_type)
+    if any(issue["severity"] == ERROR for issue in issues):
+        raise UMLSyntaxError(issues)
+    return issues
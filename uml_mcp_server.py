@@ -3,54 +3,56 @@
 UML-MCP-Server: UML图制作工具的MCP服务器实现 (修复版)
 """
 
-import base64
+import asyncio
 import json
 import os
 import sys
-import zlib  # Utilisation du module zlib standard au lieu de zlib3
-import requests
+import time
 import logging
-import datetime
-from typing import Any, Dict, List, Optional, Tuple, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 
-from mcp.server.fastmcp import FastMCP, Context
+# --profile-startup 需要在导入FastMCP之前处理，才能统计完整的导入耗时
+if __name__ == "__main__" and "--profile-startup" in sys.argv[1:]:
+    from startup_profile import main as profile_startup
+    sys.exit(profile_startup(os.path.abspath(__file__)))
+
+from mcp.server.fastmcp import FastMCP
+from plantuml_codec import plantuml_encode
+from output_files import UNCHANGED, WRITTEN, link_or_copy
+from render_metrics import Metrics, start_http_exporter
+from render_cache import RenderCache, make_cache_key, normalize_source, source_digest
+from logging_setup import SourcePreview, create_handlers, start_queued_logging
+from single_flight import SingleFlight
+from diagram_sessions import SessionStore, analyze_source, structure_diff
+from uml_lint import UMLSyntaxError, check as check_syntax
 
 # 配置日志记录
 def setup_logging():
-    """配置日志记录器"""
-    # 创建logs目录
-    log_dir = "logs"
-    os.makedirs(log_dir, exist_ok=True)
+    """
+    配置日志记录器
     
-    # 生成日志文件名，包含日期
-    current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-    log_file = os.path.join(log_dir, f"uml_mcp_server_{current_date}.log")
+    日志经由队列交给后台线程写入 logs/uml_mcp_server.log（按大小轮转）和控制台，
+    记录日志不会阻塞工具调用。
+    """
+    level = getattr(logging, os.environ.get("UML_LOG_LEVEL", "INFO").upper(), logging.INFO)
+    handlers = create_handlers(
+        os.environ.get("UML_LOG_DIR", "logs"),
+        max_bytes=int(os.environ.get("UML_LOG_MAX_MB", "10")) * 1024 * 1024,
+        backup_count=int(os.environ.get("UML_LOG_BACKUPS", "5")),
+        level=level,
+    )
+    start_queued_logging(handlers, level=level)
+    # httpx/httpcore 在 INFO 级别记录每个请求的完整URL，其中包含编码后的整个图表源码
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
     
-    # 配置根日志记录器
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    
-    # 创建文件处理器
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-    
-    # 创建控制台处理器
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
-    # 创建格式化器
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-    
-    # 添加处理器到日志记录器
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    logging.info("日志系统初始化完成")
+    logger.info("日志系统初始化完成")
     return logger
 
 # 初始化日志记录器
@@ -65,7 +67,96 @@ UML_TYPES = [
     "class", "sequence", "activity", "usecase", 
     "state", "component", "deployment", "object"
 ]
-logger.debug(f"支持的UML图类型: {', '.join(UML_TYPES)}")
+logger.debug("支持的UML图类型: %s", ', '.join(UML_TYPES))
+
+# 支持的输出格式，同时也是文件扩展名
+OUTPUT_FORMATS = ["png", "svg", "txt", "eps"]
+
+# PlantUML渲染服务地址
+PLANTUML_SERVER = os.environ.get("PLANTUML_SERVER", "http://www.plantuml.com/plantuml").rstrip("/")
+
+# 参与负载均衡的渲染服务地址（逗号分隔），默认只使用 PLANTUML_SERVER；返回的图片URL始终使用 PLANTUML_SERVER
+PLANTUML_SERVERS = [server.strip().rstrip("/") for server in os.environ.get("PLANTUML_SERVERS", "").split(",")
+                    if server.strip()] or [PLANTUML_SERVER]
+
+# 渲染后端: http（PlantUML服务）或 local（常驻的本地 plantuml.jar 进程池，默认每个CPU核一个进程）
+# 后端和HTTP客户端在第一次渲染时才导入和创建，服务器启动时不加载
+_render_backend = None
+_render_backend_lock = threading.Lock()
+
+
+def get_render_backend():
+    """
+    获取渲染后端，首次调用时按环境变量创建
+
+    Returns:
+        RenderBackend: 渲染后端
+    """
+    global _render_backend
+    if _render_backend is None:
+        with _render_backend_lock:
+            if _render_backend is None:
+                from render_backends import create_backend
+                from resilience import RetryPolicy
+                hedge_delay = os.environ.get("UML_HEDGE_DELAY", "")
+                http_options = {
+                    "retry": RetryPolicy(
+                        attempts=int(os.environ.get("UML_RETRY_ATTEMPTS", "3")),
+                        base_delay=float(os.environ.get("UML_RETRY_BASE_DELAY", "0.2")),
+                        max_delay=float(os.environ.get("UML_RETRY_MAX_DELAY", "5")),
+                        deadline=float(os.environ.get("UML_RENDER_DEADLINE", "60")),
+                    ),
+                    "failure_threshold": int(os.environ.get("UML_BREAKER_THRESHOLD", "5")),
+                    "reset_timeout": float(os.environ.get("UML_BREAKER_RESET", "30")),
+                    "hedge_delay": float(hedge_delay) if hedge_delay else None,
+                    "hedge_server": os.environ.get("UML_HEDGE_SERVER") or None,
+                    "balance": os.environ.get("UML_BALANCE", "least-outstanding").lower(),
+                    "post_threshold": int(os.environ.get("UML_POST_THRESHOLD", "4000")),
+                }
+                _render_backend = create_backend(
+                    os.environ.get("UML_RENDER_BACKEND", "http").lower(),
+                    PLANTUML_SERVERS,
+                    jar_path=os.environ.get("PLANTUML_JAR"),
+                    java=os.environ.get("UML_JAVA", "java"),
+                    fallback=os.environ.get("UML_LOCAL_FALLBACK", "1").lower() in ("1", "true", "yes"),
+                    workers=int(os.environ.get("UML_LOCAL_WORKERS", "0")),
+                    job_timeout=float(os.environ.get("UML_LOCAL_JOB_TIMEOUT", "60")),
+                    http_options=http_options,
+                )
+                logger.info("渲染后端已创建: %s", _render_backend.name)
+    return _render_backend
+
+
+def __getattr__(name):
+    # 兼容直接读取模块属性 render_backend 的调用方
+    if name == "render_backend":
+        return get_render_backend()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# generate_uml_batch 默认的最大并发渲染数
+BATCH_MAX_CONCURRENCY = int(os.environ.get("UML_BATCH_MAX_CONCURRENCY", "8"))
+
+# 渲染缓存，UML_CACHE_DIR 设为空字符串时禁用磁盘缓存
+render_cache = RenderCache(
+    max_entries=int(os.environ.get("UML_CACHE_MAX_ENTRIES", "256")),
+    cache_dir=os.environ.get("UML_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "uml-mcp-server")),
+    max_disk_bytes=int(os.environ.get("UML_CACHE_MAX_DISK_MB", "512")) * 1024 * 1024,
+    max_age=int(os.environ.get("UML_CACHE_MAX_AGE", str(7 * 24 * 3600))),
+)
+
+# 相同的在途渲染只发起一次，键为渲染缓存键（规范化源码 + 输出格式 + 渲染端点）
+render_flights = SingleFlight()
+
+# 渲染前在本地检查明显的语法错误，设置 UML_LINT=0 关闭
+LINT_ENABLED = os.environ.get("UML_LINT", "1").lower() in ("1", "true", "yes")
+
+# 图表会话：同一输出目录下同名图表的连续修改，语义未变化时跳过渲染
+diagram_sessions = SessionStore(max_sessions=int(os.environ.get("UML_MAX_SESSIONS", "256")))
+
+# 渲染指标，通过 uml://metrics 资源查看；设置 UML_METRICS_PORT 时同时提供Prometheus抓取端点
+metrics = Metrics(window=int(os.environ.get("UML_METRICS_WINDOW", "2048")))
+METRICS_PORT = os.environ.get("UML_METRICS_PORT", "")
 
 # 类图示例
 CLASS_EXAMPLES = {
@@ -149,210 +240,400 @@ Cart --> Customer: Order Confirmation
 }
 logger.debug("UML示例加载完成")
 
-def plantuml_encode(text):
+def check_formats(formats):
     """
-    将PlantUML文本编码为URL安全的字符串
+    校验并规范化输出格式列表，未提供时只输出PNG
     
-    参考: https://plantuml.com/text-encoding
+    Raises:
+        ValueError: 包含不支持的输出格式
     """
-    logger.debug("开始PlantUML编码")
-    # 使用官方推荐的编码方式
-    compressed = zlib.compress(text.encode('utf-8'))
-    
-    # 标准base64的字符映射: ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/
-    # PlantUML使用的字符映射: 0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_
-    
-    # 首先使用标准base64编码
-    standard_b64 = base64.b64encode(compressed).decode('ascii')
-    
-    # 然后转换为PlantUML的编码
-    result = ""
-    for c in standard_b64:
-        if c == 'A': result += '0'
-        elif c == 'B': result += '1'
-        elif c == 'C': result += '2'
-        elif c == 'D': result += '3'
-        elif c == 'E': result += '4'
-        elif c == 'F': result += '5'
-        elif c == 'G': result += '6'
-        elif c == 'H': result += '7'
-        elif c == 'I': result += '8'
-        elif c == 'J': result += '9'
-        elif c == 'K': result += 'A'
-        elif c == 'L': result += 'B'
-        elif c == 'M': result += 'C'
-        elif c == 'N': result += 'D'
-        elif c == 'O': result += 'E'
-        elif c == 'P': result += 'F'
-        elif c == 'Q': result += 'G'
-        elif c == 'R': result += 'H'
-        elif c == 'S': result += 'I'
-        elif c == 'T': result += 'J'
-        elif c == 'U': result += 'K'
-        elif c == 'V': result += 'L'
-        elif c == 'W': result += 'M'
-        elif c == 'X': result += 'N'
-        elif c == 'Y': result += 'O'
-        elif c == 'Z': result += 'P'
-        elif c == 'a': result += 'Q'
-        elif c == 'b': result += 'R'
-        elif c == 'c': result += 'S'
-        elif c == 'd': result += 'T'
-        elif c == 'e': result += 'U'
-        elif c == 'f': result += 'V'
-        elif c == 'g': result += 'W'
-        elif c == 'h': result += 'X'
-        elif c == 'i': result += 'Y'
-        elif c == 'j': result += 'Z'
-        elif c == 'k': result += 'a'
-        elif c == 'l': result += 'b'
-        elif c == 'm': result += 'c'
-        elif c == 'n': result += 'd'
-        elif c == 'o': result += 'e'
-        elif c == 'p': result += 'f'
-        elif c == 'q': result += 'g'
-        elif c == 'r': result += 'h'
-        elif c == 's': result += 'i'
-        elif c == 't': result += 'j'
-        elif c == 'u': result += 'k'
-        elif c == 'v': result += 'l'
-        elif c == 'w': result += 'm'
-        elif c == 'x': result += 'n'
-        elif c == 'y': result += 'o'
-        elif c == 'z': result += 'p'
-        elif c == '0': result += 'q'
-        elif c == '1': result += 'r'
-        elif c == '2': result += 's'
-        elif c == '3': result += 't'
-        elif c == '4': result += 'u'
-        elif c == '5': result += 'v'
-        elif c == '6': result += 'w'
-        elif c == '7': result += 'x'
-        elif c == '8': result += 'y'
-        elif c == '9': result += 'z'
-        elif c == '+': result += '-'
-        elif c == '/': result += '_'
-        elif c == '=': pass  # 忽略填充字符
-        else: result += c
-    
-    logger.debug("PlantUML编码完成")
+    if not formats:
+        return ["png"]
+    result = []
+    for fmt in formats:
+        fmt = fmt.lower()
+        if fmt not in OUTPUT_FORMATS:
+            error_msg = f"不支持的输出格式: {fmt}。支持的格式: {', '.join(OUTPUT_FORMATS)}"
+            logger.error(error_msg)
+            metrics.increment("errors_total", stage="validate", type="ValueError")
+            raise ValueError(error_msg)
+        if fmt not in result:
+            result.append(fmt)
     return result
 
-def generate_uml_image(uml_code, diagram_type=None, output_dir=None):
+def _prepare_render(uml_code, diagram_type, output_dir, name=None):
+    """
+    编码UML代码，确保输出目录存在并计算输出文件路径（不含扩展名）
+    
+    Returns:
+        tuple: (encoded, file_base)
+    """
+    # 编码UML代码
+    with metrics.timer("encode_seconds"):
+        encoded = plantuml_encode(uml_code)
+    
+    # 确保输出目录存在
+    os.makedirs(output_dir, exist_ok=True)
+    logger.debug("使用输出目录: %s", output_dir)
+    
+    # 生成文件名：基于规范化源码的内容摘要，不同的图表不会互相覆盖
+    if name:
+        filename = os.path.basename(name)
+    else:
+        filename = f"{diagram_type or 'uml'}_{source_digest(uml_code)[:16]}"
+    
+    return encoded, os.path.join(output_dir, filename)
+
+def _public_url(encoded, fmt):
+    """构建可访问的PlantUML URL（原始Deflate编码，不加 ~1 前缀）"""
+    return f"{PLANTUML_SERVER}/{fmt}/{encoded}"
+
+def _artifact(fmt, encoded, file_path, size, cached, write, started, coalesced=False):
+    """构建单个输出格式的结果"""
+    logger.info("UML图生成成功，保存到: %s (%s)", file_path, write)
+    metrics.observe("output_bytes", size)
+    if write != UNCHANGED:
+        metrics.increment("bytes_written_total", size)
+    return {
+        "format": fmt,
+        "url": _public_url(encoded, fmt),
+        "local_path": file_path,
+        "size": size,
+        "render_ms": round((time.perf_counter() - started) * 1000, 2),
+        "cached": cached,
+        "coalesced": coalesced,
+        "write": write
+    }
+
+def _artifact_error(fmt, encoded, error, started):
+    """构建单个输出格式的错误结果"""
+    logger.error("生成%s格式时出错: %s", fmt, error)
+    metrics.increment("errors_total", stage="render", type=type(error).__name__)
+    return {
+        "format": fmt,
+        "url": _public_url(encoded, fmt),
+        "local_path": None,
+        "size": 0,
+        "render_ms": round((time.perf_counter() - started) * 1000, 2),
+        "cached": False,
+        "coalesced": False,
+        "error": str(error)
+    }
+
+def _served_cache_key(render_backend, uml_code, fmt, cache_key):
+    """渲染缓存键按实际完成渲染的后端计算：回退到备用后端的结果不能缓存在主后端的键下"""
+    from render_backends import served_endpoint
+    endpoint = served_endpoint.get()
+    if endpoint is None or endpoint == render_backend.endpoint:
+        return cache_key
+    return make_cache_key(uml_code, fmt, endpoint)
+
+def _render_once(render_backend, uml_code, encoded, fmt, file_path, cache_key):
+    """通过渲染后端渲染到文件并写入渲染缓存，返回文件路径；大型图表由后端改用POST提交源码"""
+    from render_backends import served_endpoint
+    served_endpoint.set(None)
+    with metrics.timer("render_seconds"):
+        render_backend.render_to_file(encoded, fmt, file_path, source=uml_code)
+    render_cache.put_file(_served_cache_key(render_backend, uml_code, fmt, cache_key), file_path)
+    return file_path
+
+async def _render_once_async(render_backend, uml_code, encoded, fmt, file_path, cache_key):
+    """_render_once 的异步版本"""
+    from render_backends import served_endpoint
+    served_endpoint.set(None)
+    with metrics.timer("render_seconds"):
+        await render_backend.render_to_file_async(encoded, fmt, file_path, source=uml_code)
+    await asyncio.to_thread(render_cache.put_file, _served_cache_key(render_backend, uml_code, fmt, cache_key),
+                            file_path)
+    return file_path
+
+def _render_artifact(uml_code, encoded, file_base, fmt):
+    """
+    渲染单个输出格式并保存到文件，优先使用渲染缓存
+    
+    渲染结果流式写入临时文件后原子重命名，不会整体读入内存；
+    命中缓存且已有文件内容相同时跳过写入。相同的并发渲染只有一个真正调用渲染后端，
+    其余调用等待它完成后链接或复制它的输出文件，失败时共享同一个错误。
+    """
+    started = time.perf_counter()
+    try:
+        render_backend = get_render_backend()
+        cache_key = make_cache_key(uml_code, fmt, render_backend.endpoint)
+        file_path = f"{file_base}.{fmt}"
+        write = render_cache.get_file(cache_key, file_path)
+        cached = write is not None
+        coalesced = False
+        
+        if cached:
+            logger.debug("渲染缓存命中: %s", cache_key)
+            metrics.increment("cache_hits_total")
+        else:
+            logger.debug("通过%s渲染后端获取%s", render_backend.name, fmt)
+            metrics.increment("cache_misses_total")
+            rendered_path, coalesced = render_flights.do(
+                cache_key, lambda: _render_once(render_backend, uml_code, encoded, fmt, file_path, cache_key))
+            if coalesced:
+                logger.debug("合并到相同的在途渲染: %s", cache_key)
+                metrics.increment("coalesced_total")
+                write = link_or_copy(rendered_path, file_path)
+            else:
+                write = WRITTEN
+        
+        size = os.path.getsize(file_path)
+        return _artifact(fmt, encoded, file_path, size, cached, write, started, coalesced)
+    except Exception as e:
+        return _artifact_error(fmt, encoded, e, started)
+
+async def _render_artifact_async(uml_code, encoded, file_base, fmt):
+    """_render_artifact 的异步版本"""
+    started = time.perf_counter()
+    try:
+        render_backend = get_render_backend()
+        cache_key = make_cache_key(uml_code, fmt, render_backend.endpoint)
+        file_path = f"{file_base}.{fmt}"
+        write = await asyncio.to_thread(render_cache.get_file, cache_key, file_path)
+        cached = write is not None
+        coalesced = False
+        
+        if cached:
+            logger.debug("渲染缓存命中: %s", cache_key)
+            metrics.increment("cache_hits_total")
+        else:
+            logger.debug("通过%s渲染后端获取%s", render_backend.name, fmt)
+            metrics.increment("cache_misses_total")
+            rendered_path, coalesced = await render_flights.do_async(
+                cache_key, lambda: _render_once_async(render_backend, uml_code, encoded, fmt, file_path, cache_key))
+            if coalesced:
+                logger.debug("合并到相同的在途渲染: %s", cache_key)
+                metrics.increment("coalesced_total")
+                write = await asyncio.to_thread(link_or_copy, rendered_path, file_path)
+            else:
+                write = WRITTEN
+        
+        size = await asyncio.to_thread(os.path.getsize, file_path)
+        return _artifact(fmt, encoded, file_path, size, cached, write, started, coalesced)
+    except Exception as e:
+        return _artifact_error(fmt, encoded, e, started)
+
+def _build_result(uml_code, encoded, artifacts):
+    """汇总各输出格式的结果，顶层字段对应第一个输出格式"""
+    primary = artifacts[0]
+    errors = [a for a in artifacts if a.get("error")]
+    result = {
+        "code": uml_code,
+        "url": primary["url"],
+        "encoded": encoded,
+        "local_path": primary["local_path"],
+        "cached": not errors and all(a["cached"] for a in artifacts),
+        "artifacts": artifacts
+    }
+    if errors:
+        logger.error("UML代码: \n%s", SourcePreview(uml_code))
+        if len(artifacts) == 1:
+            result["error"] = primary["error"]
+        else:
+            result["error"] = "; ".join(f"{a['format']}: {a['error']}" for a in errors)
+    return result
+
+def _render_error(uml_code, error, encoded=None):
+    """记录渲染错误并构建错误结果，即使出错也返回代码"""
+    logger.error("生成UML图时出错: %s", error)
+    metrics.increment("errors_total", stage="prepare", type=type(error).__name__)
+    logger.error("UML代码: \n%s", SourcePreview(uml_code))
+    
+    return {
+        "code": uml_code,
+        "url": None,
+        "encoded": encoded,
+        "local_path": None,
+        "cached": False,
+        "error": str(error)
+    }
+
+def _lint_error(uml_code, error):
+    """记录语法预检查发现的错误并构建错误结果，不发出渲染请求"""
+    logger.warning("%s", error)
+    metrics.increment("errors_total", stage="lint", type=type(error).__name__)
+    logger.debug("UML代码: \n%s", SourcePreview(uml_code))
+    
+    return {
+        "code": uml_code,
+        "url": None,
+        "encoded": None,
+        "local_path": None,
+        "cached": False,
+        "error": str(error),
+        "lint": error.issues
+    }
+
+def _check_output_dir(output_dir):
+    """检查输出目录是否提供"""
+    if not output_dir:
+        error_msg = "必须提供输出目录（output_dir）"
+        logger.error(error_msg)
+        metrics.increment("errors_total", stage="validate", type="ValueError")
+        raise ValueError(error_msg)
+
+def generate_uml_image(uml_code, diagram_type=None, output_dir=None, name=None, formats=None):
     """
     生成UML图的URL和代码，并保存到本地
     
+    源码只编码一次；请求多个输出格式时各格式并发渲染。
+    
     Args:
         uml_code: PlantUML代码
         diagram_type: UML图类型，用于生成文件名
         output_dir: 输出目录路径，必须显式提供
+        name: 文件名（不含扩展名），未提供时根据图表类型和编码生成
+        formats: 输出格式列表 (png, svg, txt, eps)，默认只输出png
     
     Returns:
         dict: 包含以下键值对:
             - code: 原始PlantUML代码
-            - url: 可访问的PlantUML URL
+            - url: 第一个输出格式的PlantUML URL
             - encoded: 编码后的字符串
-            - local_path: 本地保存的文件路径
+            - local_path: 第一个输出格式的本地文件路径
+            - cached: 结果是否全部来自渲染缓存
+            - artifacts: 每个输出格式的URL、本地路径、大小(字节)、渲染耗时(毫秒)和写入方式
+              (written、linked、copied，文件内容未变化时为 unchanged)
     """
-    # 检查输出目录是否提供
-    if not output_dir:
-        error_msg = "必须提供输出目录（output_dir）"
-        logger.error(error_msg)
-        raise ValueError(error_msg)
-    
-    logger.info(f"开始生成UML图: {diagram_type if diagram_type else 'unknown'}, 输出目录: {output_dir}")
+    _check_output_dir(output_dir)
+    formats = check_formats(formats)
+    logger.info("开始生成UML图: %s, 格式: %s, 输出目录: %s", diagram_type if diagram_type else 'unknown', ', '.join(formats), output_dir)
+    metrics.increment("requests_total")
     
-    try:
-        # 编码UML代码
-        encoded = plantuml_encode(uml_code)
+    with metrics.timer("request_seconds"):
+        try:
+            encoded, file_base = _prepare_render(uml_code, diagram_type, output_dir, name)
+        except Exception as e:
+            return _render_error(uml_code, e)
         
-        # 构建URL，添加~1前缀
-        url = f"http://www.plantuml.com/plantuml/png/~1{encoded}"
-        logger.debug(f"生成的PlantUML URL: {url}")
-        
-        # 确保输出目录存在
-        os.makedirs(output_dir, exist_ok=True)
-        logger.debug(f"使用输出目录: {output_dir}")
-        
-        # 生成文件名
-        if diagram_type:
-            filename = f"{diagram_type}_{encoded[:10]}"
+        if len(formats) == 1:
+            artifacts = [_render_artifact(uml_code, encoded, file_base, formats[0])]
         else:
-            filename = f"uml_{encoded[:10]}"
-        
-        # 构建完整的文件路径
-        file_path = os.path.join(output_dir, f"{filename}.png")
-        logger.debug(f"图片将保存到: {file_path}")
-        
-        # 发送请求获取图片
-        logger.debug("发送HTTP请求获取图片")
-        response = requests.get(url, timeout=30)
-        
-        # 检查响应状态码
-        if response.status_code != 200:
-            logger.error(f"PlantUML服务返回错误: {response.status_code}")
-            logger.error(f"响应内容: {response.text}")
-            raise requests.RequestException(f"PlantUML服务错误: {response.status_code}")
-        
-        # 检查响应内容是否为图像
-        content_type = response.headers.get('Content-Type', '')
-        if 'image' not in content_type:
-            logger.error(f"响应不是图像，Content-Type: {content_type}")
-            logger.error(f"响应内容: {response.text}")
-            raise ValueError("未收到有效的图像")
-        
-        # 保存到文件
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
-        
-        logger.info(f"UML图生成成功，保存到: {file_path}")
-        
-        # 返回结果
-        return {
-            "code": uml_code,
-            "url": url,
-            "encoded": encoded,
-            "local_path": file_path
-        }
+            submitted = time.perf_counter()
+            
+            def render(fmt):
+                metrics.observe("queue_wait_seconds", time.perf_counter() - submitted)
+                return _render_artifact(uml_code, encoded, file_base, fmt)
+            
+            with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+                artifacts = list(executor.map(render, formats))
+        return _build_result(uml_code, encoded, artifacts)
+
+async def generate_uml_image_async(uml_code, diagram_type=None, output_dir=None, name=None, formats=None):
+    """
+    generate_uml_image 的异步版本
     
-    except Exception as e:
-        logger.error(f"生成UML图时出错: {str(e)}")
-        logger.error(f"UML代码: \n{uml_code}")
+    网络请求使用异步HTTP客户端流式下载，编码、缓存和文件读写在线程池中执行，
+    因此多个渲染可以在同一个服务进程中并发进行。参数和返回值与 generate_uml_image 相同。
+    """
+    _check_output_dir(output_dir)
+    formats = check_formats(formats)
+    logger.info("开始生成UML图: %s, 格式: %s, 输出目录: %s", diagram_type if diagram_type else 'unknown', ', '.join(formats), output_dir)
+    metrics.increment("requests_total")
+    
+    with metrics.timer("request_seconds"):
+        try:
+            encoded, file_base = await asyncio.to_thread(
+                _prepare_render, uml_code, diagram_type, output_dir, name)
+        except Exception as e:
+            return _render_error(uml_code, e)
         
-        # 即使出错也返回URL和代码
-        return {
-            "code": uml_code,
-            "url": url if 'url' in locals() else None,
-            "encoded": encoded if 'encoded' in locals() else None,
-            "local_path": None,
-            "error": str(e)
-        }
-
-@mcp.tool()
-def generate_uml(diagram_type: str, code: str, output_dir: str) -> str:
-    """生成UML图并返回代码、URL和本地路径。
+        artifacts = await asyncio.gather(
+            *(_render_artifact_async(uml_code, encoded, file_base, fmt) for fmt in formats))
+        return _build_result(uml_code, encoded, list(artifacts))
 
+async def generate_in_session(code, diagram_type=None, output_dir=None, name=None, formats=None):
+    """
+    在图表会话中生成UML图
+    
+    渲染前先在本地做语法预检查，发现错误时直接返回带行号的错误，不发出渲染请求。
+    会话由输出目录和 name 确定。源码与会话上一版本只有空白或注释不同、且请求的格式都已渲染时，
+    直接返回上一版本的结果，不编码也不渲染。没有 name 时无法区分同类型的不同图表，每次调用都是
+    新的会话：总是渲染，也不返回结构差异。
+    
     Args:
-        diagram_type: UML图类型 (class, sequence, activity, usecase, state, component, deployment, object)
-        code: 完整的PlantUML代码
+        code: 补全了 @startuml/@enduml 的PlantUML代码
+        diagram_type: UML图类型
         output_dir: 输出目录路径，必须显式提供
-
+        name: 会话名，同时作为输出文件名（不含扩展名）
+        formats: 输出格式列表，默认只输出png
+    
     Returns:
-        包含PlantUML代码、URL和本地路径的JSON字符串
+        dict: generate_uml_image 的结果，另含 session: 会话键（key，没有 name 时为None）、版本号（revision，语义变化时加一）、
+              是否跳过了渲染（unchanged）以及与上一版本的结构差异（diff，会话的第一个版本为None）。
+              跳过渲染时 url 和 encoded 对应上一版本的源码。语法预检查的警告放在 lint 中，
+              发现错误时只返回 error 和 lint
     """
-    # 检查输出目录是否提供
-    if not output_dir:
-        error_msg = "必须提供输出目录（output_dir）"
-        logger.error(error_msg)
-        raise ValueError(error_msg)
+    _check_output_dir(output_dir)
+    formats = check_formats(formats)
+    warnings = []
+    if LINT_ENABLED:
+        try:
+            warnings = check_syntax(code, diagram_type)
+        except UMLSyntaxError as e:
+            return _lint_error(code, e)
+    key = SessionStore.key_for(output_dir, name)
+    if key is None:
+        result = await generate_uml_image_async(code, diagram_type, output_dir, name, formats)
+        result["session"] = {"key": None, "revision": 0 if result.get("error") else 1, "unchanged": False,
+                             "diff": None}
+        if warnings:
+            result["lint"] = warnings
+        return result
+    digest, structure = await asyncio.to_thread(analyze_source, code, diagram_type)
+    
+    reused = diagram_sessions.reuse(key, digest, formats)
+    if reused is not None:
+        session, previous_artifacts = reused
+        logger.info("图表语义未变化，复用上一版本: %s (版本 %s)", key, session.revision)
+        metrics.increment("requests_total")
+        metrics.increment("session_unchanged_total")
+        artifacts = [dict(artifact, cached=True, coalesced=False, write=UNCHANGED, render_ms=0.0)
+                     for artifact in previous_artifacts]
+        result = _build_result(code, session.result["encoded"], artifacts)
+        result["session"] = {"key": key, "revision": session.revision, "unchanged": True,
+                             "diff": structure_diff(session.structure, structure)}
+        if warnings:
+            result["lint"] = warnings
+        return result
+    
+    previous = diagram_sessions.get(key)
+    result = await generate_uml_image_async(code, diagram_type, output_dir, name, formats)
+    if result.get("error"):
+        revision = previous.revision if previous else 0
+    else:
+        revision = diagram_sessions.record(key, digest, structure, result).revision
+    result["session"] = {"key": key, "revision": revision, "unchanged": False,
+                         "diff": structure_diff(previous.structure, structure) if previous else None}
+    if warnings:
+        result["lint"] = warnings
+    return result
+
+def prepare_uml_code(diagram_type, code, output_dir):
+    """
+    校验generate_uml的参数并补全 @startuml/@enduml 标记
+    
+    Args:
+        diagram_type: UML图类型
+        code: PlantUML代码
+        output_dir: 输出目录路径
     
-    logger.info(f"调用generate_uml工具: 类型={diagram_type}, 代码长度={len(code)}, 输出目录={output_dir}")
+    Returns:
+        tuple: (小写的图表类型, 补全后的PlantUML代码)
+    
+    Raises:
+        ValueError: 未提供输出目录或图表类型不受支持
+    """
+    _check_output_dir(output_dir)
     
     # 验证图表类型
     diagram_type = diagram_type.lower()
     if diagram_type not in UML_TYPES:
         error_msg = f"不支持的UML图类型: {diagram_type}。支持的类型: {', '.join(UML_TYPES)}"
         logger.error(error_msg)
+        metrics.increment("errors_total", stage="validate", type="ValueError")
         raise ValueError(error_msg)
     
     # 确保代码包含 @startuml 和 @enduml
@@ -363,140 +644,271 @@ def generate_uml(diagram_type: str, code: str, output_dir: str) -> str:
         logger.debug("添加缺失的@enduml标记")
         code = f"{code}\n@enduml"
     
-    logger.debug(f"生成的UML代码:\n{code}")
+    logger.debug("生成的UML代码:\n%s", SourcePreview(code))
+    return diagram_type, code
+
+@mcp.tool()
+async def generate_uml(diagram_type: str, code: str, output_dir: str, formats: Optional[List[str]] = None,
+                       name: Optional[str] = None) -> str:
+    """生成UML图并返回代码、URL和本地路径。
+
+    同一输出目录下同名的多次调用视为同一个图表的连续修改：只改动空白或注释时直接返回
+    上一次的结果，否则重新渲染并返回与上一次的结构差异。未提供name时每次都重新渲染。
+
+    Args:
+        diagram_type: UML图类型 (class, sequence, activity, usecase, state, component, deployment, object)
+        code: 完整的PlantUML代码
+        output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）
+
+    Returns:
+        包含PlantUML代码、URL、本地路径、每个输出格式的大小和渲染耗时以及会话版本和结构差异的JSON字符串
+    """
+    logger.info("调用generate_uml工具: 类型=%s, 代码长度=%s, 输出目录=%s", diagram_type, len(code), output_dir)
+    diagram_type, code = prepare_uml_code(diagram_type, code, output_dir)
+    formats = check_formats(formats)
     
     # 生成URL、代码和本地路径
-    result = generate_uml_image(code, diagram_type, output_dir)
+    result = await generate_in_session(code, diagram_type, output_dir, name, formats)
     
     # 返回JSON字符串
-    logger.debug(f"generate_uml工具执行完成，生成URL: {result.get('url')}")
+    logger.debug("generate_uml工具执行完成，生成URL: %s", result.get('url'))
     return json.dumps(result, ensure_ascii=False, indent=2)
 
 @mcp.tool()
-def generate_class_diagram(code: str, output_dir: str) -> str:
+async def generate_uml_batch(items: List[Dict[str, str]], output_dir: str, max_concurrency: int = BATCH_MAX_CONCURRENCY,
+                             formats: Optional[List[str]] = None) -> str:
+    """批量生成多个UML图，按输入顺序返回每一项的结果。
+
+    相同的PlantUML代码只渲染一次，其余图表并发渲染。单项失败不影响其他项。
+    多个项使用同一个name但代码不同时，这些项的文件名加上内容摘要（结果中 name_collision 为true），
+    不会互相覆盖。
+
+    Args:
+        items: 图表列表，每项包含 diagram_type、code 和可选的 name（输出文件名，不含扩展名）
+        output_dir: 输出目录路径，必须显式提供
+        max_concurrency: 最大并发渲染数
+        formats: 每个图表的输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+
+    Returns:
+        包含每一项结果以及成功、失败数量的JSON字符串
+    """
+    _check_output_dir(output_dir)
+    formats = check_formats(formats)
+    logger.info("调用generate_uml_batch工具: 图表数量=%s, 输出目录=%s", len(items), output_dir)
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    groups: Dict[str, List[Tuple[int, str, str, Optional[str]]]] = {}
+    
+    # 复用generate_uml的校验，并按规范化后的代码去重
+    for index, item in enumerate(items):
+        name = item.get("name")
+        try:
+            diagram_type, code = prepare_uml_code(item.get("diagram_type", ""), item.get("code", ""), output_dir)
+            if LINT_ENABLED:
+                check_syntax(code, diagram_type)
+        except UMLSyntaxError as e:
+            results[index] = dict(_lint_error(code, e), index=index, name=name)
+            continue
+        except ValueError as e:
+            results[index] = {"index": index, "name": name, "local_path": None, "error": str(e)}
+            continue
+        groups.setdefault(normalize_source(code), []).append((index, diagram_type, code, name))
+    
+    # 同名但源码不同的项改用带内容摘要的文件名，避免后完成的项覆盖先完成的项
+    sources_by_name: Dict[str, set] = {}
+    for source, members in groups.items():
+        for _, _, _, name in members:
+            if name:
+                sources_by_name.setdefault(os.path.basename(name), set()).add(source)
+    collisions = {name for name, sources in sources_by_name.items() if len(sources) > 1}
+    if collisions:
+        logger.warning("批量生成中以下名称对应不同的图表，输出文件名加上内容摘要: %s", sorted(collisions))
+    
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def render_group(members):
+        # 组内第一项负责渲染，其余项命中渲染缓存后只写出文件
+        leader = members[0][0]
+        for index, diagram_type, code, name in members:
+            collided = bool(name) and os.path.basename(name) in collisions
+            file_name = f"{name}_{source_digest(code)[:16]}" if collided else name
+            queued = time.perf_counter()
+            async with semaphore:
+                metrics.observe("queue_wait_seconds", time.perf_counter() - queued)
+                result = await generate_uml_image_async(code, diagram_type, output_dir, file_name, formats)
+            result["index"] = index
+            result["name"] = name
+            if collided:
+                result["name_collision"] = True
+            if index != leader:
+                result["duplicate_of"] = leader
+            results[index] = result
+    
+    await asyncio.gather(*(render_group(members) for members in groups.values()))
+    
+    failed = sum(1 for result in results if result.get("error"))
+    logger.info("generate_uml_batch工具执行完成: 渲染%s个唯一图表, 失败%s个", len(groups), failed)
+    return json.dumps({
+        "results": results,
+        "unique": len(groups),
+        "succeeded": len(results) - failed,
+        "failed": failed
+    }, ensure_ascii=False, indent=2)
+
+@mcp.tool()
+async def generate_class_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                 name: Optional[str] = None) -> str:
     """生成类图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML类图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_class_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("class", code, output_dir)
+    logger.info("调用generate_class_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("class", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_sequence_diagram(code: str, output_dir: str) -> str:
+async def generate_sequence_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                    name: Optional[str] = None) -> str:
     """生成序列图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML序列图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_sequence_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("sequence", code, output_dir)
+    logger.info("调用generate_sequence_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("sequence", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_activity_diagram(code: str, output_dir: str) -> str:
+async def generate_activity_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                    name: Optional[str] = None) -> str:
     """生成活动图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML活动图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_activity_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("activity", code, output_dir)
+    logger.info("调用generate_activity_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("activity", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_usecase_diagram(code: str, output_dir: str) -> str:
+async def generate_usecase_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                   name: Optional[str] = None) -> str:
     """生成用例图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML用例图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_usecase_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("usecase", code, output_dir)
+    logger.info("调用generate_usecase_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("usecase", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_state_diagram(code: str, output_dir: str) -> str:
+async def generate_state_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                 name: Optional[str] = None) -> str:
     """生成状态图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML状态图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_state_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("state", code, output_dir)
+    logger.info("调用generate_state_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("state", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_component_diagram(code: str, output_dir: str) -> str:
+async def generate_component_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                     name: Optional[str] = None) -> str:
     """生成组件图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML组件图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_component_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("component", code, output_dir)
+    logger.info("调用generate_component_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("component", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_deployment_diagram(code: str, output_dir: str) -> str:
+async def generate_deployment_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                      name: Optional[str] = None) -> str:
     """生成部署图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML部署图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_deployment_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("deployment", code, output_dir)
+    logger.info("调用generate_deployment_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("deployment", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_object_diagram(code: str, output_dir: str) -> str:
+async def generate_object_diagram(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                  name: Optional[str] = None) -> str:
     """生成对象图并返回代码和URL。
 
     Args:
         code: 完整的PlantUML对象图代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码和URL的JSON字符串
     """
-    logger.info(f"调用generate_object_diagram工具: 代码长度={len(code)}...")
-    return generate_uml("object", code, output_dir)
+    logger.info("调用generate_object_diagram工具: 代码长度=%s...", len(code))
+    return await generate_uml("object", code, output_dir, formats, name)
 
 @mcp.tool()
-def generate_uml_from_code(code: str, output_dir: str) -> str:
+async def generate_uml_from_code(code: str, output_dir: str, formats: Optional[List[str]] = None,
+                                 name: Optional[str] = None) -> str:
     """从PlantUML代码生成UML图并返回URL和本地路径。
 
     Args:
         code: 完整的PlantUML代码
         output_dir: 输出目录路径，必须显式提供
+        formats: 输出格式列表 (png, svg, txt, eps)，默认 ["png"]
+        name: 图表名，同时作为输出文件名（不含扩展名）；同名图表的重复调用只在语义变化时重新渲染
 
     Returns:
         包含PlantUML代码、URL和本地路径的JSON字符串
     """
     logger.info("调用generate_uml_from_code工具")
-    logger.debug(f"PlantUML代码长度: {len(code)} 字符")
+    logger.debug("PlantUML代码长度: %s 字符", len(code))
     
     # 确保代码包含@startuml和@enduml
     if "@startuml" not in code:
@@ -507,10 +919,10 @@ def generate_uml_from_code(code: str, output_dir: str) -> str:
         code = f"{code}\n@enduml"
     
     # 生成URL、代码和本地路径
-    result = generate_uml_image(code, output_dir=output_dir)
+    result = await generate_in_session(code, output_dir=output_dir, name=name, formats=formats)
     
     # 返回JSON字符串
-    logger.debug(f"generate_uml_from_code工具执行完成，生成URL: {result.get('url')}")
+    logger.debug("generate_uml_from_code工具执行完成，生成URL: %s", result.get('url'))
     return json.dumps(result, ensure_ascii=False, indent=2)
 
 @mcp.resource("uml://types")
@@ -535,6 +947,26 @@ def get_uml_types() -> str:
         }
     })
 
+@mcp.resource("uml://metrics")
+def get_metrics() -> str:
+    """获取渲染指标。
+
+    Returns:
+        各阶段耗时（编码、排队、渲染、总耗时）和输出大小的直方图（含p50/p95/p99）、
+        缓存命中率、按类型统计的错误数、渲染缓存和图表会话统计以及渲染后端统计（重试、对冲、熔断状态）的JSON字符串
+    """
+    snapshot = metrics.snapshot()
+    snapshot["render_cache"] = render_cache.stats()
+    snapshot["sessions"] = diagram_sessions.stats()
+    if _render_backend is not None and hasattr(_render_backend, "stats"):
+        snapshot["render_backend"] = _render_backend.stats()
+    return json.dumps(snapshot, ensure_ascii=False, indent=2)
+
+@mcp.resource("uml://metrics/prometheus")
+def get_metrics_prometheus() -> str:
+    """以Prometheus文本格式获取渲染指标。"""
+    return metrics.prometheus_text()
+
 @mcp.prompt()
 def create_class_diagram() -> str:
     """创建类图的提示模板。"""
@@ -581,9 +1013,11 @@ def create_sequence_diagram() -> str:
 if __name__ == "__main__":
     # 初始化并运行服务器
     logger.info("启动UML-MCP服务器")
+    if METRICS_PORT:
+        start_http_exporter(metrics, int(METRICS_PORT))
     try:
         mcp.run(transport='stdio')
     except Exception as e:
-        logger.critical(f"服务器运行出错: {str(e)}", exc_info=True)
+        logger.critical("服务器运行出错: %s", e, exc_info=True)
     finally:
         logger.info("服务器已关闭") 
\ No newline at end of file